@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import os
+import re
 from abc import ABCMeta
 import logging
 from ConfigParser import SafeConfigParser
@@ -235,6 +236,9 @@ class LibraryConfig(TmapsConfig):
         self.modules_home = '~/jtlibrary/modules'
         self.formats_home = '~/tmformats'
         self.storage_home = '/storage/filesystem'
+        self.batch_store = 'sqlite'
+        self.batch_duration = '01:00:00'
+        self.batch_memory = 3800
         self._resource = None
         self.read()
 
@@ -294,6 +298,58 @@ class LibraryConfig(TmapsConfig):
             )
         self._config.set(self._section, 'storage_home', str(value))
 
+    @property
+    def batch_store(self):
+        '''str: storage backend for job descriptions of workflow steps
+        (options: ``{"sqlite", "json"}``, default: ``"sqlite"``)
+        '''
+        return self._config.get(self._section, 'batch_store')
+
+    @batch_store.setter
+    def batch_store(self, value):
+        if value not in {'sqlite', 'json'}:
+            raise ValueError(
+                'Configuration parameter "batch_store" must be either '
+                '"sqlite" or "json".'
+            )
+        self._config.set(self._section, 'batch_store', str(value))
+
+    @property
+    def batch_duration(self):
+        '''str: targeted duration of jobs in the format ``"HH:MM:SS"`` when
+        the batch size of a workflow step is determined automatically
+        (default: ``"01:00:00"``)
+        '''
+        return self._config.get(self._section, 'batch_duration')
+
+    @batch_duration.setter
+    def batch_duration(self, value):
+        if not isinstance(value, basestring):
+            raise TypeError(
+                'Configuration parameter "batch_duration" must have type str.'
+            )
+        if not re.search(r'^\d+:\d{2}:\d{2}$', value):
+            raise ValueError(
+                'Configuration parameter "batch_duration" must have format '
+                '"HH:MM:SS".'
+            )
+        self._config.set(self._section, 'batch_duration', str(value))
+
+    @property
+    def batch_memory(self):
+        '''int: maximal memory in megabytes jobs may use when the batch size
+        of a workflow step is determined automatically (default: ``3800``)
+        '''
+        return self._config.getint(self._section, 'batch_memory')
+
+    @batch_memory.setter
+    def batch_memory(self, value):
+        if not isinstance(value, int):
+            raise TypeError(
+                'Configuration parameter "batch_memory" must have type int.'
+            )
+        self._config.set(self._section, 'batch_memory', str(value))
+
     @property
     def formats_home(self):
         '''str: absolute path to the root directory of local copy of
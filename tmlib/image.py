@@ -18,9 +18,6 @@ import numpy as np
 import scipy.ndimage as ndi
 import cv2
 import mahotas as mh
-import skimage.measure
-import skimage.color
-import skimage.draw
 import shapely.geometry
 from geoalchemy2.shape import to_shape
 from abc import ABCMeta
@@ -693,6 +690,100 @@ class ChannelImage(Image):
         return cv2.imencode('.tif', self.array)[1]
 
 
+class LabelIndex(object):
+
+    '''Index of the objects of a 2D labeled pixels array.
+
+    The index is computed once in linear time and provides constant time
+    lookups of the bounding box, the size and the border status of each
+    object.
+    '''
+
+    __slots__ = ('labels', 'counts', '_bboxes', '_border', '_interior')
+
+    def __init__(self, array):
+        '''
+        Parameters
+        ----------
+        array: numpy.ndarray[numpy.int32]
+            2D labeled pixels array
+        '''
+        if array.ndim != 2:
+            raise ValueError('Argument "array" must be two dimensional.')
+        #: numpy.ndarray[numpy.int64]: number of pixels per label
+        self.counts = np.bincount(array.ravel())
+        #: numpy.ndarray[numpy.int64]: sorted unique non-zero labels
+        self.labels = np.flatnonzero(self.counts[1:]) + 1
+        self._bboxes = ndi.find_objects(array)
+        # Pixels on the outermost rows and columns of the image. Corners
+        # must be counted only once.
+        edges = np.concatenate([
+            array[0, :], array[-1, :], array[1:-1, 0], array[1:-1, -1]
+        ])
+        edge_counts = np.bincount(edges, minlength=self.counts.shape[0])
+        self._border = edge_counts > 0
+        self._border[0] = False
+        self._interior = (self.counts - edge_counts) > 0
+        self._interior[0] = False
+
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __setstate__(self, state):
+        for k, v in state.iteritems():
+            setattr(self, k, v)
+
+    def __len__(self):
+        return self.labels.shape[0]
+
+    def __contains__(self, label):
+        return 0 < label < self.counts.shape[0] and self.counts[label] > 0
+
+    def bbox(self, label):
+        '''Gets the bounding box of an object.
+
+        Parameters
+        ----------
+        label: int
+            label of the object
+
+        Returns
+        -------
+        Tuple[int]
+            first row, last row + 1, first column and last column + 1
+        '''
+        rows, cols = self._bboxes[label - 1]
+        return (rows.start, rows.stop, cols.start, cols.stop)
+
+    def is_border(self, label):
+        '''Determines whether an object touches the border of the image.
+
+        Parameters
+        ----------
+        label: int
+            label of the object
+
+        Returns
+        -------
+        bool
+        '''
+        return bool(self._border[label])
+
+    @property
+    def border_labels(self):
+        '''numpy.ndarray[numpy.int64]: labels of objects that touch the
+        border of the image
+        '''
+        return np.flatnonzero(self._border)
+
+    @property
+    def interior_labels(self):
+        '''numpy.ndarray[numpy.int64]: labels of objects that have at least
+        one pixel that doesn't lie on the border of the image
+        '''
+        return np.flatnonzero(self._interior)
+
+
 class SegmentationImage(Image):
 
     '''Class for a segmentation image: a labeled image where each segmented
@@ -737,6 +828,46 @@ class SegmentationImage(Image):
             raise ValueError('Argument "array" must have numpy.int32 data type.')
         self._array = value
 
+    @staticmethod
+    def fill_polygons(array, polygons, y_offset, x_offset):
+        '''Rasterizes polygons into an existing pixels array.
+
+        Parameters
+        ----------
+        array: numpy.ndarray[numpy.int32]
+            C-contiguous 2D pixels array that should be filled in place
+        polygons: Tuple[Union[int, geoalchemy2.elements.WKBElement]]
+            label and geometry for each segmented object
+        y_offset: int
+            global vertical offset that needs to be subtracted from
+            y-coordinates
+        x_offset: int
+            global horizontal offset that needs to be subtracted from
+            x-coordinates
+
+        Returns
+        -------
+        numpy.ndarray[numpy.int32]
+            filled pixels array
+
+        Note
+        ----
+        Pixels on the contour are considered part of the object, consistent
+        with the contours obtained upon
+        :meth:`extract_polygons <tmlib.image.SegmentationImage.extract_polygons>`.
+        '''
+        if not array.flags.c_contiguous:
+            # OpenCV would silently operate on a copy.
+            raise ValueError('Argument "array" must be C-contiguous.')
+        for label, geometry in polygons:
+            poly = to_shape(geometry)
+            coordinates = np.array(poly.exterior.coords).astype(np.int32)
+            coordinates[:, 1] *= -1
+            coordinates[:, 0] -= x_offset
+            coordinates[:, 1] -= y_offset
+            cv2.fillPoly(array, [coordinates.reshape(-1, 1, 2)], int(label))
+        return array
+
     @classmethod
     def create_from_polygons(cls, polygons, y_offset, x_offset, dimensions,
             metadata=None):
@@ -762,20 +893,16 @@ class SegmentationImage(Image):
         -------
         tmlib.image.SegmentationImage
             created image
+
+        See also
+        --------
+        :meth:`tmlib.image.SegmentationImage.fill_polygons`
         '''
         array = np.zeros(dimensions, dtype=np.int32)
-        for label, geometry in polygons:
-            poly = to_shape(geometry)
-            coordinates = np.array(poly.exterior.coords).astype(int)
-            x, y = np.split(coordinates, 2, axis=1)
-            y *= -1
-            x -= x_offset
-            y -= y_offset
-            y, x = skimage.draw.polygon(y, x, dimensions)
-            array[y, x] = label
+        cls.fill_polygons(array, polygons, y_offset, x_offset)
         return cls(array, metadata)
 
-    def extract_polygons(self, y_offset, x_offset):
+    def extract_polygons(self, y_offset, x_offset, index=None):
         '''Creates a polygon representation for each segmented object.
         The coordinates of the polygon contours are relative to the global map,
         i.e. an offset is added to the :class:`Site <tmlib.models.site.Site>`.
@@ -787,13 +914,17 @@ class SegmentationImage(Image):
             *y*-coordinates (*y*-axis is inverted)
         x_offset: int
             global horizontal offset that needs to be added to *x*-coordinates
+        index: tmlib.image.LabelIndex, optional
+            precomputed index of objects in the image; will be computed if
+            not provided (default: ``None``)
 
         Returns
         -------
         Generator[Tuple[Union[int, shapely.geometry.polygon.Polygon]]]
             label and geometry for each segmented object
         '''
-        bboxes = mh.labeled.bbox(self.array)
+        if index is None:
+            index = LabelIndex(self.array)
         # We set border pixels to zero to get closed contours for
         # border objects. This may cause problems for very small objects
         # at the border, because they may get lost.
@@ -804,8 +935,8 @@ class SegmentationImage(Image):
         plane[:, 0] = 0
         plane[:, -1] = 0
 
-        for label in np.unique(plane[plane > 0]):
-            bbox = bboxes[label]
+        for label in index.interior_labels:
+            bbox = index.bbox(label)
             obj_im = self._get_bbox_image(plane, bbox)
             logger.debug('find contour for object #%d', label)
             # We could do this for all objects at once, but doing it on the
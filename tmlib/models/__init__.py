@@ -128,6 +128,13 @@ and `modify <https://docs.citusdata.com/en/latest/dist_tables/dml.html>`_ them.
 # This would, however, result in poorer performance for processing a single
 # experiment on the cluster.
 
+# NOTE: All model modules are imported here, since relationships between
+# models are declared by class name and are only resolved once the mappers
+# get configured upon the first query. The package is imported by every job
+# of a workflow, however. Model modules must therefore not import libraries
+# such as pandas, OpenCV or scikit-learn at module level, but only within
+# the functions that require them.
+
 from tmlib.models.base import MainModel, ExperimentModel
 from tmlib.models.utils import MainSession, ExperimentSession
 from tmlib.models.user import User
@@ -43,7 +43,6 @@ from tmlib.models.base import (
 from tmlib.models.utils import ExperimentConnection, ExperimentSession
 from tmlib.models.utils import remove_location_upon_delete
 from tmlib.errors import RegexError, DataError
-from tmlib.image import PyramidTile
 from tmlib.utils import autocreate_directory_property, create_directory
 
 logger = logging.getLogger(__name__)
@@ -723,6 +722,7 @@ class ChannelLayer(ExperimentModel, IdMixIn):
         extracted_pixels = image.extract(
             y_offset, y_end-y_offset, x_offset, x_end-x_offset
         ).array
+        from tmlib.image import PyramidTile
         tile = PyramidTile(extracted_pixels)
         if n_top is not None:
             tile = tile.pad_with_background(n_top, 'top')
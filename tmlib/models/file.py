@@ -25,9 +25,6 @@ from cached_property import cached_property
 
 from tmlib.utils import assert_type
 from tmlib.utils import notimplemented
-from tmlib.image import ChannelImage
-from tmlib.image import IllumstatsImage
-from tmlib.image import IllumstatsContainer
 from tmlib.metadata import ChannelImageMetadata
 from tmlib.metadata import IllumstatsImageMetadata
 from tmlib.readers import DatasetReader
@@ -327,6 +324,7 @@ class ChannelImageFile(FileModel, DateMixIn):
         tmlib.image.ChannelImage
             image stored in the file
         '''
+        from tmlib.image import ChannelImage
         metadata = ChannelImageMetadata(
             channel_id=self.channel_id,
             site_id=self.site_id,
@@ -425,6 +423,8 @@ class IllumstatsFile(FileModel, DateMixIn):
         Illumstats
             illumination statistics images
         '''
+        from tmlib.image import IllumstatsImage
+        from tmlib.image import IllumstatsContainer
         logger.debug(
             'get data from illumination statistics file: %s', self.location
         )
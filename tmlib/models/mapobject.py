@@ -19,7 +19,6 @@ import csv
 import logging
 import random
 import collections
-import pandas as pd
 from cStringIO import StringIO
 from sqlalchemy import func, case
 from geoalchemy2 import Geometry
@@ -256,6 +255,7 @@ class MapobjectType(ExperimentModel, IdMixIn):
         pandas.DataFrame[numpy.float]
             feature values for each mapobject
         '''
+        import pandas as pd
         session = Session.object_session(self)
 
         features = session.query(Feature.id, Feature.name).\
@@ -313,6 +313,7 @@ class MapobjectType(ExperimentModel, IdMixIn):
         pandas.DataFrame[numpy.float]
             label values for each mapobject
         '''
+        import pandas as pd
         session = Session.object_session(self)
 
         labels = session.query(ToolResult.id, ToolResult.name).\
@@ -363,6 +364,7 @@ class MapobjectType(ExperimentModel, IdMixIn):
             ``True`` if the mapobject touches the border of the site and
             ``False`` otherwise
         '''
+        import pandas as pd
         session = Session.object_session(self)
         site_geometry = self.get_site_geometry(site_id)
 
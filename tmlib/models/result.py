@@ -17,19 +17,23 @@ import logging
 from cStringIO import StringIO
 import csv
 import numpy as np
-import pandas as pd
 from sqlalchemy import (
     Integer, BigInteger, Column, String, ForeignKey, UniqueConstraint,
     PrimaryKeyConstraint, ForeignKeyConstraint
 )
 from sqlalchemy.dialects.postgresql import HSTORE, JSON
-from sqlalchemy.orm import relationship, backref, Session
+from sqlalchemy.orm import relationship, backref, Session, object_session
+from sqlalchemy.event import listens_for
 
 from tmlib.models.base import ExperimentModel, IdMixIn
 from tmlib.models.feature import FeatureValues
+from tmlib.models.utils import delete_location
 
 logger = logging.getLogger(__name__)
 
+#: str: key of model files of deleted tool results in the session's info
+_DELETED_MODEL_FILES = 'deleted_model_files'
+
 
 class ToolResult(ExperimentModel, IdMixIn):
 
@@ -96,6 +100,7 @@ class ToolResult(ExperimentModel, IdMixIn):
         **extra_attributes: dict, optional
             additional tool-specific attributes that be need to be saved
         '''
+        import pandas as pd
         self.tool_name = tool_name
         self.submission_id = submission_id
         self.mapobject_type_id = mapobject_type_id
@@ -137,6 +142,39 @@ class ToolResult(ExperimentModel, IdMixIn):
         )
 
 
+@listens_for(ToolResult, 'after_delete', propagate=True)
+def _collect_model_file(mapper, connection, target):
+    # Classifier tools reference the file of a cached model in the attributes
+    # of the result (see tmlib.tools.base.Classifier.store_model). A model
+    # may be shared between results and is only removed together with the
+    # last one that references it. The file is removed once the transaction
+    # has been committed, since the row would persist upon rollback.
+    # Files of results that are deleted in bulk or via cascades in the
+    # database are removed by the tools instead.
+    attributes = target.attributes or dict()
+    filename = attributes.get('model_file')
+    if filename is None:
+        return
+    table = ToolResult.__table__
+    query = table.count().\
+        where(table.c.attributes['model_file'].astext == filename)
+    n_references = connection.execute(query).scalar()
+    if n_references == 0:
+        session = object_session(target)
+        session.info.setdefault(_DELETED_MODEL_FILES, set()).add(filename)
+
+
+@listens_for(Session, 'after_commit')
+def _remove_model_files(session):
+    for filename in session.info.pop(_DELETED_MODEL_FILES, set()):
+        delete_location(filename)
+
+
+@listens_for(Session, 'after_rollback')
+def _keep_model_files(session):
+    session.info.pop(_DELETED_MODEL_FILES, None)
+
+
 class ScalarToolResult(ToolResult):
 
     '''Tool result that assigns each
@@ -20,7 +20,6 @@ from io import BytesIO
 from struct import pack
 import psycopg2
 import numpy as np
-import pandas as pd
 from sqlalchemy import (
     Column, String, Integer, BigInteger, Boolean, ForeignKey, Index,
     PrimaryKeyConstraint
@@ -29,7 +28,6 @@ from sqlalchemy.dialects.postgresql import BYTEA
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.ext.hybrid import hybrid_property
 
-from tmlib.image import PyramidTile
 from tmlib.metadata import PyramidTileMetadata
 from tmlib.models.base import DistributedExperimentModel
 
@@ -98,6 +96,7 @@ class ChannelLayerTile(DistributedExperimentModel):
     def pixels(self):
         '''tmlib.image.PyramidTile: pixel data and metadata'''
         # TODO: consider creating a custom SQLAlchemy column type
+        from tmlib.image import PyramidTile
         metadata = PyramidTileMetadata(
             z=self.z, y=self.y, x=self.x,
             channel_layer_id=self.channel_layer_id
@@ -17,17 +17,19 @@ import os
 import shutil
 import random
 import logging
+import select
 import inspect
 import collections
 from copy import copy
+from cStringIO import StringIO
 from threading import Thread
 from itertools import chain
 
-import pandas as pd
 import sqlalchemy
 import sqlalchemy.orm
 import sqlalchemy.pool
 import sqlalchemy.exc
+import sqlalchemy.dialects.postgresql
 from sqlalchemy.engine.url import make_url
 from sqlalchemy_utils.functions import quote
 from sqlalchemy.event import listens_for
@@ -109,6 +111,17 @@ def create_db_engine(db_uri, cache=True):
     return engine
 
 
+def dispose_db_engines():
+    '''Closes pooled connections of all cached database engines of the
+    current Python process. This must be done before the process is forked,
+    since database connections must not be shared between processes.
+    Connections will be reestablished on demand.
+    '''
+    for engine in DATABASE_ENGINES.itervalues():
+        logger.debug('dispose database engine for process %d', os.getpid())
+        engine.dispose()
+
+
 def create_db_tables(engine):
     '''Creates all tables in the *public* schema.
 
@@ -484,6 +497,68 @@ class _SQLAlchemy_Session(object):
             raise
         return instance
 
+    def get_or_create_many(self, model, rows):
+        '''Gets the IDs of multiple instances of a model class if they
+        already exist or creates them otherwise.
+
+        Parameters
+        ----------
+        model: type
+            an implementation of :class:`tmlib.models.base.MainModel` or
+            :class:`tmlib.models.base.ExperimentModel`
+        rows: List[dict]
+            column names and values for each instance; all rows must provide
+            values for the same columns
+
+        Returns
+        -------
+        List[int]
+            ID of each instance in the order of `rows`
+
+        Note
+        ----
+        In contrast to
+        :meth:`get_or_create <tmlib.models.utils._SQLAlchemy_Session.get_or_create>`
+        all instances are handled with a single ``INSERT ... ON CONFLICT DO
+        NOTHING RETURNING`` statement followed by a single ``SELECT`` for
+        rows that already existed. The approach relies on a uniqueness
+        constraint that covers the provided columns. Since ``NULL`` values
+        are never considered equal, provided values must not be ``None``.
+        '''
+        if len(rows) == 0:
+            return []
+        columns = sorted(rows[0].keys())
+        keys = [tuple(r[c] for c in columns) for r in rows]
+        table = model.__table__
+        stmt = sqlalchemy.dialects.postgresql.insert(table).\
+            values(rows).\
+            on_conflict_do_nothing().\
+            returning(table.c.id, *[table.c[c] for c in columns])
+        ids = {
+            tuple(r[1:]): r[0] for r in self._session.execute(stmt)
+        }
+        missing = [k for k in keys if k not in ids]
+        if missing:
+            logger.debug(
+                'found %d existing instances of %s', len(missing),
+                model.__name__
+            )
+            records = self._session.query(
+                    model.id, *[getattr(model, c) for c in columns]
+                ).\
+                filter(
+                    sqlalchemy.tuple_(
+                        *[getattr(model, c) for c in columns]
+                    ).in_(missing)
+                ).\
+                all()
+            ids.update({tuple(r[1:]): r[0] for r in records})
+        if not self._session.autocommit:
+            self._session.commit()
+        else:
+            self._session.flush()
+        return [ids[k] for k in keys]
+
     def drop_table(self, model):
         '''Drops a database table for the given `model`. It also removes
         locations on disk in case `model` is derived from
@@ -575,6 +650,44 @@ class _SQLAlchemy_Session(object):
         with connection.connection.cursor() as c:
             cls._bulk_ingest(c, instances)
 
+    def bulk_ingest_records(self, cls, records):
+        '''Ingests multiple records of a distributed model class in bulk
+        without instantiating the model class.
+
+        Parameters
+        ----------
+        cls: type
+            distributed model class derived from
+            :class:`DistributedExperimentModel <tmlib.models.base.DistributedExperimentModel>`
+        records: pandas.DataFrame
+            records with one column for each column of the table; values
+            must already be in the text representation expected by the
+            database, e.g. *WKT* for geometries, and ``None`` for ``NULL``
+
+        Note
+        ----
+        This avoids the overhead of creating a Python object for each record
+        when large numbers of records can be generated directly in
+        vectorized form.
+        '''
+        if records.empty:
+            return
+        if not issubclass(cls, DistributedExperimentModel):
+            raise TypeError(
+                'Bulk ingestion is only supported for models of type "%s"' %
+                DistributedExperimentModel.__name__
+            )
+        f = StringIO()
+        records.to_csv(f, sep=';', header=False, index=False, na_rep='')
+        f.seek(0)
+        connection = self._session.get_bind()
+        with connection.connection.cursor() as c:
+            c.copy_from(
+                f, cls.__table__.name, sep=';', columns=tuple(records.columns),
+                null=''
+            )
+        f.close()
+
     def add(self, instance):
         '''Adds an instance of a model class.
 
@@ -831,6 +944,74 @@ class _Connection(object):
         self._cursor.close()
         self._connection.close()
 
+    def listen(self, channel):
+        '''Registers the connection as listener on a notification channel.
+
+        Parameters
+        ----------
+        channel: str
+            name of the channel
+
+        Warning
+        -------
+        Requires the connection to be in autocommit mode.
+        '''
+        logger.debug('listen on channel "%s"', channel)
+        self._cursor.execute('LISTEN {channel}'.format(
+            channel=quote(self._engine, channel)
+        ))
+
+    def unlisten(self, channel):
+        '''Removes the connection as listener from a notification channel.
+
+        Parameters
+        ----------
+        channel: str
+            name of the channel
+        '''
+        logger.debug('unlisten on channel "%s"', channel)
+        self._cursor.execute('UNLISTEN {channel}'.format(
+            channel=quote(self._engine, channel)
+        ))
+
+    def notify(self, channel, payload=''):
+        '''Sends a notification to all listeners on a channel.
+
+        Parameters
+        ----------
+        channel: str
+            name of the channel
+        payload: str, optional
+            message (default: ``""``)
+        '''
+        logger.debug('notify channel "%s"', channel)
+        self._cursor.execute('SELECT pg_notify(%s, %s)', (channel, payload))
+
+    def wait_for_notifications(self, timeout):
+        '''Waits until notifications arrive on any channel the connection
+        listens on.
+
+        Parameters
+        ----------
+        timeout: float
+            maximal number of seconds to wait
+
+        Returns
+        -------
+        List[psycopg2.extensions.Notify]
+            received notifications (empty in case `timeout` expired)
+        '''
+        if not self._connection.notifies:
+            readable, writable, error = select.select(
+                [self._connection], [], [], timeout
+            )
+            if not readable:
+                return []
+            self._connection.poll()
+        notifications = list(self._connection.notifies)
+        del self._connection.notifies[:]
+        return notifications
+
     def __getattr__(self, attr):
         if hasattr(self._cursor, attr):
             return getattr(self._cursor, attr)
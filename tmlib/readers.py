@@ -22,11 +22,7 @@ import json
 import ruamel.yaml
 import traceback
 import lxml.etree
-import cv2
-import bioformats
-import javabridge
 import numpy as np
-import pandas as pd
 from abc import ABCMeta
 from abc import abstractmethod
 
@@ -209,6 +205,7 @@ class DatatableReader(Reader):
         super(TablesReader, self).__init__(filename)
 
     def __enter__(self):
+        import pandas as pd
         logger.debug('open file: %s', self.filename)
         self._stream = pd.HDFStore(self.filename, 'r')
         return self
@@ -529,6 +526,11 @@ class JavaBridge(object):
     -------
     Once the JVM is killed it cannot be started again within the same Python
     session.
+
+    Note
+    ----
+    `javabridge` and `bioformats` are imported upon use, since importing
+    them is slow and most processes don't require them.
     '''
 
     def __init__(self, active=True):
@@ -538,11 +540,14 @@ class JavaBridge(object):
         # NOTE: updated "loci_tools.jar" file to latest schema:
         # http://downloads.openmicroscopy.org/bio-formats/5.1.3
         if self.active:
+            import bioformats
+            import javabridge
             javabridge.start_vm(class_path=bioformats.JARS, run_headless=True)
         return self
 
     def __exit__(self, except_type, except_value, except_trace):
         if self.active:
+            import javabridge
             javabridge.kill_vm()
 
 
@@ -571,14 +576,17 @@ class BFImageReader(object):
 
     @same_docstring_as(Reader.__init__)
     def __init__(self, filename):
+        import bioformats
         bioformats.init_logger()
         self.filename = filename
 
     def __enter__(self):
+        import bioformats
         self._reader = bioformats.ImageReader(self.filename, perform_init=True)
         return self
 
     def __exit__(self, except_type, except_value, except_trace):
+        import javabridge
         self._reader.close()
         if except_type is javabridge.JavaException:
             raise NotSupportedError('File format is not supported.')
@@ -644,6 +652,7 @@ class BFOmeXmlReader(object):
 
     @same_docstring_as(Reader.__init__)
     def __init__(self, filename):
+        import bioformats
         bioformats.init_logger()
         self.filename = filename
 
@@ -651,6 +660,7 @@ class BFOmeXmlReader(object):
         return self
 
     def __exit__(self, except_type, except_value, except_trace):
+        import javabridge
         if except_type is javabridge.JavaException:
             raise NotSupportedError('File format is not supported.')
         if except_value:
@@ -661,6 +671,7 @@ class BFOmeXmlReader(object):
                 sys.stdout.write(tb)
 
     def read(self):
+        import bioformats
         return bioformats.get_omexml_metadata(self.filename)
 
 
@@ -711,4 +722,5 @@ class ImageReader(Reader):
         #   arr = np.array(content)
         #   return cv2.imdecode(arr, cv2.IMREAD_UNCHANGED)
         # However, this is way slower than reading via OpenCV directly!
+        import cv2
         return cv2.imread(self.filename, cv2.IMREAD_UNCHANGED)
@@ -0,0 +1,29 @@
+import numpy as np
+from geoalchemy2.shape import from_shape
+
+from tmlib.image import SegmentationImage
+
+
+def _create_label_image():
+    array = np.zeros((50, 60), dtype=np.int32)
+    array[5:15, 5:20] = 1
+    y, x = np.ogrid[:50, :60]
+    array[(y - 30) ** 2 + (x - 40) ** 2 <= 36] = 2
+    array[35:45, 8:12] = 3
+    return array
+
+
+def test_create_from_polygons_round_trip():
+    array = _create_label_image()
+    y_offset, x_offset = 100, 200
+    polygons = [
+        (label, from_shape(poly))
+        for label, poly in SegmentationImage(array).extract_polygons(
+            y_offset, x_offset
+        )
+    ]
+    assert [label for label, poly in polygons] == [1, 2, 3]
+    image = SegmentationImage.create_from_polygons(
+        polygons, y_offset, x_offset, array.shape
+    )
+    np.testing.assert_array_equal(image.array, array)
@@ -25,7 +25,10 @@ in the database. The client can stream the result provided via
 interactive an responsive manner.
 
 Custom tools can be added by implementing :class:`Tool <tmlib.tools.base.Tool>`
-and import the derived class in :mod:`tmlib.tools`.
+in a module of :mod:`tmlib.tools` and adding the name of the derived class and
+the module to ``TOOL_MODULES``. Modules are only imported once the
+corresponding tool gets requested, since tools depend on libraries that are
+slow to import.
 
 Consider the following example for a new tool named ``Foo``.
 It implements the abstract method
@@ -67,15 +70,21 @@ additional method ``bar`` (which does nothing):
 .. note:: Each tool also requires a client-side representation.
 '''
 import logging
+import importlib
 
 from tmlib.version import __version__
-from tmlib.tools.classification import Classification
-from tmlib.tools.clustering import Clustering
-from tmlib.tools.heatmap import Heatmap
-from tmlib.tools.base import _register
+from tmlib.errors import RegistryError
 
 logger = logging.getLogger(__name__)
 
+#: Dict[str, str]: name of the module that implements each tool
+TOOL_MODULES = {
+    'Aggregation': 'aggregation',
+    'Classification': 'classification',
+    'Clustering': 'clustering',
+    'Heatmap': 'heatmap'
+}
+
 
 def get_tool_class(name):
     '''Gets the tool-specific implementation of
@@ -92,6 +101,13 @@ def get_tool_class(name):
         tool class
     '''
     logger.debug('get tool class "%s"', name)
+    if name not in TOOL_MODULES:
+        raise RegistryError('Tool "%s" is not registered.' % name)
+    module_name = '%s.%s' % (__name__, TOOL_MODULES[name])
+    importlib.import_module(module_name)
+    # Once the module has been loaded, the tool class is available in the
+    # register
+    from tmlib.tools.base import _register
     try:
         return _register[name]
     except KeyError:
@@ -107,4 +123,4 @@ def get_available_tools():
         names of available tools
     '''
     logger.debug('get available tools')
-    return _register.keys()
+    return TOOL_MODULES.keys()
@@ -34,10 +34,248 @@ class Aggregation(Tool):
         fall within larger mapobjects of a different type.
     '''
 
+    __options__ = {
+        'statistics': ['mean', 'std', 'min', 'max', 'sum', 'median']
+    }
+
+    #: Dict[str, str]: SQL aggregate expression for each statistic
+    _STATISTICS = {
+        'mean': 'avg({value})',
+        'std': 'stddev_samp({value})',
+        'min': 'min({value})',
+        'max': 'max({value})',
+        'sum': 'sum({value})',
+        'median': 'percentile_cont(0.5) WITHIN GROUP (ORDER BY {value})'
+    }
+
     @same_docstring_as(Tool.__init__)
-    def __init__(self, experiment_id):
-        super(Aggregation, self).__init__(experiment_id)
+    def __init__(self, experiment_id, cores=1):
+        super(Aggregation, self).__init__(experiment_id, cores)
+
+    def _get_segmentation_layers(self, session, parent_type_id, child_type_id):
+        # Children are aggregated per time point. Parents of static types
+        # (e.g. "Sites") only have a single layer that applies to all time
+        # points. Only the first z-plane is considered.
+        parent_layers = session.query(tm.SegmentationLayer).\
+            filter_by(mapobject_type_id=parent_type_id).\
+            order_by(tm.SegmentationLayer.zplane).\
+            all()
+        child_layers = session.query(tm.SegmentationLayer).\
+            filter_by(mapobject_type_id=child_type_id).\
+            order_by(tm.SegmentationLayer.zplane).\
+            all()
+        layers = dict()
+        for child_layer in child_layers:
+            if child_layer.tpoint in layers:
+                continue
+            for parent_layer in parent_layers:
+                if parent_layer.tpoint in {child_layer.tpoint, None}:
+                    layers[child_layer.tpoint] = (
+                        parent_layer.id, child_layer.id
+                    )
+                    break
+        return layers
+
+    def _build_aggregate_expressions(self, child_features, statistics):
+        expressions = list()
+        for feature_id, name in child_features:
+            value = "(c.values -> '{id}')::double precision".format(
+                id=feature_id
+            )
+            for stat in statistics:
+                expressions.append(
+                    '{agg}::text'.format(
+                        agg=self._STATISTICS[stat].format(value=value)
+                    )
+                )
+        # Parents without any children get a count of zero.
+        expressions.append('coalesce(count(c.mapobject_id), 0)::text')
+        return expressions
+
+    def aggregate_partition(self, partition_key, layers, keys, expressions):
+        '''Aggregates feature values of child mapobjects for all parent
+        mapobjects of a given partition and stores the result as
+        :class:`FeatureValues <tmlib.models.feature.FeatureValues>` of the
+        parent mapobjects.
+
+        Parameters
+        ----------
+        partition_key: int
+            value of the distribution column shared by parent and child
+            mapobjects, i.e. the ID of the corresponding
+            :class:`Site <tmlib.models.site.Site>`
+        layers: Dict[int, Tuple[int]]
+            IDs of parent and child
+            :class:`SegmentationLayer <tmlib.models.mapobject.SegmentationLayer>`
+            for each time point
+        keys: List[str]
+            ID of each aggregate :class:`Feature <tmlib.models.feature.Feature>`
+        expressions: List[str]
+            SQL aggregate expression for each feature in `keys`
+
+        Note
+        ----
+        Parent and child segmentations as well as feature values of a
+        partition are colocated on the same shard. The spatial join and the
+        aggregation are therefore performed directly on the worker node
+        without any data being transferred.
+        '''
+        with tm.utils.ExperimentConnection(self.experiment_id) as connection:
+            host, port, segmentation_shard = connection.locate_partition(
+                tm.MapobjectSegmentation, partition_key
+            )
+            host, port, feature_values_shard = connection.locate_partition(
+                tm.FeatureValues, partition_key
+            )
+        worker_connection = tm.utils.ExperimentWorkerConnection(
+            self.experiment_id, host, port
+        )
+        with worker_connection as connection:
+            for tpoint, (parent_layer_id, child_layer_id) in layers.iteritems():
+                logger.debug(
+                    'aggregate values of partition %d for time point %d',
+                    partition_key, tpoint
+                )
+                # Children are assigned to the parent that contains their
+                # centroid, such that each child is counted exactly once.
+                # Parents without children are included as well, conditions
+                # on children must therefore be part of the join.
+                connection.execute('''
+                    INSERT INTO feature_values_{fv_shard} AS v (
+                        partition_key, mapobject_id, tpoint, values
+                    )
+                    SELECT
+                        p.partition_key, p.mapobject_id, %(tpoint)s,
+                        hstore(%(keys)s::text[], ARRAY[{expressions}])
+                    FROM mapobject_segmentations_{seg_shard} AS p
+                    LEFT JOIN mapobject_segmentations_{seg_shard} AS s
+                    ON s.partition_key = p.partition_key
+                    AND s.segmentation_layer_id = %(child_layer_id)s
+                    AND ST_Contains(p.geom_polygon, s.geom_centroid)
+                    LEFT JOIN feature_values_{fv_shard} AS c
+                    ON c.mapobject_id = s.mapobject_id
+                    AND c.partition_key = s.partition_key
+                    AND c.tpoint = %(tpoint)s
+                    WHERE p.partition_key = %(partition_key)s
+                    AND p.segmentation_layer_id = %(parent_layer_id)s
+                    GROUP BY p.partition_key, p.mapobject_id
+                    ON CONFLICT ON CONSTRAINT feature_values_pkey_{fv_shard}
+                    DO UPDATE
+                    SET values = v.values || EXCLUDED.values
+                '''.format(
+                    fv_shard=feature_values_shard,
+                    seg_shard=segmentation_shard,
+                    expressions=', '.join(expressions)
+                ), {
+                    'keys': keys,
+                    'partition_key': partition_key,
+                    'parent_layer_id': parent_layer_id,
+                    'child_layer_id': child_layer_id,
+                    'tpoint': tpoint
+                })
 
-    @same_docstring_as(Tool.process_request)
     def process_request(self, submission_id, payload):
-        pass
+        '''Processes a client tool request, where the `payload` is expected to
+        have the following form::
+
+            {
+                "choosen_object_type": str,
+                "selected_features": [str, ...],
+                "options": {
+                    "parent_object_type": str,
+                    "statistics": [str, ...]
+                }
+            }
+
+        Values of the selected features of the chosen (child) objects are
+        aggregated for each parent object and stored as features of the
+        parent objects with ``is_aggregate=True``. Features are named
+        ``"{child}_{feature}_{statistic}"``. In addition, the number of
+        children is stored as ``"{child}_count"``.
+
+        Parameters
+        ----------
+        submission_id: int
+            ID of the corresponding job submission
+        payload: dict
+            description of the tool job
+
+        Raises
+        ------
+        ValueError
+            when parent objects are not colocated with child objects, which
+            is the case for static types "Plates" and "Wells", or when a
+            selected feature doesn't exist for the child objects
+        '''
+        child_type_name = payload['chosen_object_type']
+        feature_names = payload['selected_features']
+        parent_type_name = payload['options']['parent_object_type']
+        statistics = payload['options']['statistics']
+
+        for stat in statistics:
+            if stat not in self.__options__['statistics']:
+                raise ValueError('Unknown statistic "%s".' % stat)
+
+        logger.info(
+            'aggregate features of "%s" objects for "%s" objects',
+            child_type_name, parent_type_name
+        )
+        with tm.utils.ExperimentSession(self.experiment_id) as session:
+            parent_type = session.query(tm.MapobjectType).\
+                filter_by(name=parent_type_name).\
+                one()
+            if parent_type.ref_type in {tm.Plate.__name__, tm.Well.__name__}:
+                raise ValueError(
+                    'Objects of type "%s" are not partitioned by site and '
+                    'can therefore not be used as parents.' % parent_type_name
+                )
+            child_type = session.query(tm.MapobjectType).\
+                filter_by(name=child_type_name).\
+                one()
+            child_features = session.query(tm.Feature.id, tm.Feature.name).\
+                filter(
+                    tm.Feature.mapobject_type_id == child_type.id,
+                    tm.Feature.name.in_(feature_names)
+                ).\
+                all()
+            if len(child_features) != len(set(feature_names)):
+                missing = set(feature_names) - {f.name for f in child_features}
+                raise ValueError(
+                    'Objects of type "%s" don\'t have features: "%s"'
+                    % (child_type_name, '", "'.join(sorted(missing)))
+                )
+            layers = self._get_segmentation_layers(
+                session, parent_type.id, child_type.id
+            )
+            parent_type_id = parent_type.id
+            partitions = session.query(tm.Mapobject.partition_key).\
+                filter_by(mapobject_type_id=parent_type_id).\
+                distinct().\
+                all()
+            partition_keys = [p.partition_key for p in partitions]
+
+        expressions = self._build_aggregate_expressions(
+            child_features, statistics
+        )
+        names = [
+            '%s_%s_%s' % (child_type_name, name, stat)
+            for feature_id, name in child_features for stat in statistics
+        ]
+        names.append('%s_count' % child_type_name)
+        logger.info('create %d aggregate features', len(names))
+        keys = list()
+        with tm.utils.ExperimentSession(self.experiment_id) as session:
+            for name in names:
+                feature = session.get_or_create(
+                    tm.Feature, name=name, mapobject_type_id=parent_type_id,
+                    is_aggregate=True
+                )
+                keys.append(str(feature.id))
+
+        def aggregate(partition_keys):
+            for pk in partition_keys:
+                self.aggregate_partition(pk, layers, keys, expressions)
+            return partition_keys
+
+        logger.info('aggregate values for %d partitions', len(partition_keys))
+        tm.utils.parallelize_query(aggregate, partition_keys)
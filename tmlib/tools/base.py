@@ -14,7 +14,10 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 '''Base classes for data analysis tools.'''
+import os
 import re
+import time
+import hashlib
 import logging
 import inspect
 import importlib
@@ -22,19 +25,25 @@ import simplejson
 import numpy as np
 import pandas as pd
 import collections
+from cStringIO import StringIO
+from Queue import Queue
+from threading import Thread
 from abc import ABCMeta
 from abc import abstractmethod
 from abc import abstractproperty
 from sqlalchemy import func
 from sqlalchemy.dialects.postgresql import FLOAT
-from psycopg2.extras import execute_values
 from psycopg2.sql import SQL, Identifier
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import SGDClassifier
 from sklearn.svm import SVC
 from sklearn.preprocessing import RobustScaler
-from sklearn.model_selection import GridSearchCV, KFold
-from sklearn.cluster import KMeans
+from sklearn.base import clone
+from sklearn.externals import joblib
+from sklearn.model_selection import (
+    GridSearchCV, RandomizedSearchCV, ParameterGrid, KFold
+)
+from sklearn.cluster import KMeans, MiniBatchKMeans
 
 
 from tmlib import cfg
@@ -42,11 +51,18 @@ import tmlib.models as tm
 from tmlib.config import DEFAULT_LIB, IMPLEMENTED_LIBS
 from tmlib.utils import (
     same_docstring_as, autocreate_directory_property, assert_type,
-    create_partitions
+    create_partitions, create_directory
 )
 
 logger = logging.getLogger(__name__)
 
+#: float: percentage of table blocks that is used to estimate the number of
+#: mapobjects of a type
+_ESTIMATE_SAMPLE_PERCENT = 1.0
+
+#: int: maximal number of attempts to sample enough mapobjects at random
+_MAX_SAMPLE_ATTEMPTS = 3
+
 _register = {}
 
 
@@ -95,14 +111,18 @@ class Tool(object):
 
     __abstract__ = True
 
-    def __init__(self, experiment_id):
+    def __init__(self, experiment_id, cores=1):
         '''
         Parameters
         ----------
         experiment_id: int
             ID of the experiment for which the tool request is made
+        cores: int, optional
+            number of CPU cores that were allocated for the tool job and
+            may be used for processing the request (default: ``1``)
         '''
         self.experiment_id = experiment_id
+        self.cores = cores
 
     def load_feature_values(self, mapobject_type_name, feature_names,
             mapobject_ids=None):
@@ -259,17 +279,83 @@ class Tool(object):
         -------
         Tuple[int]
             IDs of selected mapobject
+
+        Note
+        ----
+        Unless there are only a few of them, mapobjects are sampled via
+        ``TABLESAMPLE BERNOULLI`` rather than by sorting them all in random
+        order. The sampling rate is derived from an estimate of the number of
+        mapobjects, which is based on a ``TABLESAMPLE SYSTEM`` sample. When
+        the sample has less than `n` mapobjects, because the estimate was too
+        high, the rate is increased based on the size of the sample and
+        mapobjects are sampled again. Only the sampled mapobjects are
+        sorted in random order to select `n` of them.
         '''
         with tm.utils.ExperimentSession(self.experiment_id) as session:
             mapobject_type = session.query(tm.MapobjectType.id).\
                 filter_by(name=mapobject_type_name).\
                 one()
-            mapobjects = session.query(tm.Mapobject.id).\
-                filter_by(mapobject_type_id=mapobject_type.id).\
-                order_by(func.random()).\
-                limit(n).\
-                all()
-            return [m.id for m in mapobjects]
+        with tm.utils.ExperimentConnection(self.experiment_id) as connection:
+            # Estimate the number of objects from a sample of table blocks
+            # rather than counting all objects of the type. Objects of a type
+            # are stored together, such that the estimate may be far off.
+            connection.execute('''
+                SELECT count(*) AS n_objects FROM mapobjects
+                TABLESAMPLE SYSTEM (%(percent)s)
+                WHERE mapobject_type_id = %(mapobject_type_id)s
+            ''', {
+                'percent': _ESTIMATE_SAMPLE_PERCENT,
+                'mapobject_type_id': mapobject_type.id
+            })
+            n_objects = (
+                connection.fetchone().n_objects *
+                100.0 / _ESTIMATE_SAMPLE_PERCENT
+            )
+            for i in xrange(_MAX_SAMPLE_ATTEMPTS):
+                if n_objects == 0:
+                    break
+                # Oversample a bit to compensate for the variance of the
+                # estimate and of the Bernoulli sampling method.
+                percent = 110.0 * n / n_objects
+                if percent >= 100.0:
+                    break
+                logger.debug(
+                    'sample %.2f percent of approximately %d objects',
+                    percent, n_objects
+                )
+                connection.execute('''
+                    SELECT id FROM (
+                        SELECT id FROM mapobjects
+                        TABLESAMPLE BERNOULLI (%(percent)s)
+                        WHERE mapobject_type_id = %(mapobject_type_id)s
+                    ) AS sample
+                    ORDER BY random()
+                    LIMIT %(n)s
+                ''', {
+                    'percent': percent,
+                    'mapobject_type_id': mapobject_type.id,
+                    'n': n
+                })
+                records = connection.fetchall()
+                if len(records) == n:
+                    return [r.id for r in records]
+                logger.debug(
+                    'sample only has %d objects, sample again', len(records)
+                )
+                n_objects = len(records) * 100.0 / percent
+            # There are only a few objects (or too few for the estimate)
+            # and they can be shuffled as a whole.
+            logger.debug('select objects in random order')
+            connection.execute('''
+                SELECT id FROM mapobjects
+                WHERE mapobject_type_id = %(mapobject_type_id)s
+                ORDER BY random()
+                LIMIT %(n)s
+            ''', {
+                'mapobject_type_id': mapobject_type.id,
+                'n': n
+            })
+            return [r.id for r in connection.fetchall()]
 
     def partition_mapobjects(self, mapobject_type_name, n):
         '''Splits mapobjects into partitions of size `n`.
@@ -289,7 +375,8 @@ class Tool(object):
 
         Note
         ----
-        Mapobjects are ordered by ID.
+        Mapobjects are ordered by partition key and ID, such that objects
+        of a partition end up in as few shards as possible.
         '''
         with tm.utils.ExperimentSession(self.experiment_id) as session:
             mapobject_type = session.query(tm.MapobjectType.id).\
@@ -297,10 +384,66 @@ class Tool(object):
                 one()
             mapobjects = session.query(tm.Mapobject.id).\
                 filter_by(mapobject_type_id=mapobject_type.id).\
-                order_by(tm.Mapobject.id).\
+                order_by(tm.Mapobject.partition_key, tm.Mapobject.id).\
                 all()
             return create_partitions([m.id for m in mapobjects], n)
 
+    def iterate_feature_values(self, mapobject_type_name, feature_names,
+            partitions):
+        '''Loads feature values partition by partition. Values of the next
+        partition are loaded in a background thread while the current one is
+        being processed by the caller.
+
+        Parameters
+        ----------
+        mapobject_type_name: str
+            name of the selected
+            :class:`MapobjectType <tmlib.models.mapobject.MapobjectType>`
+        feature_names: List[str]
+            name of each selected
+            :class:`Feature <tmlib.models.feature.Feature>`
+        partitions: List[List[int]]
+            IDs of mapobjects for each partition, e.g. as returned by
+            :meth:`partition_mapobjects <tmlib.tools.base.Tool.partition_mapobjects>`
+
+        Returns
+        -------
+        Generator[pandas.DataFrame]
+            feature values for each partition
+
+        See also
+        --------
+        :meth:`tmlib.tools.base.Tool.load_feature_values`
+        '''
+        # Only a single partition is held in the queue, which limits memory
+        # consumption to at most two partitions at a time.
+        queue = Queue(maxsize=1)
+
+        def load():
+            try:
+                for mapobject_ids in partitions:
+                    queue.put(
+                        self.load_feature_values(
+                            mapobject_type_name, feature_names, mapobject_ids
+                        )
+                    )
+            except Exception as error:
+                queue.put(error)
+            queue.put(None)
+
+        thread = Thread(target=load)
+        thread.daemon = True
+        thread.start()
+        while True:
+            item = queue.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                thread.join()
+                raise item
+            yield item
+        thread.join()
+
     def identify_features_with_null_values(self, feature_data):
         '''Identifies features with NULL values (including NaNs).
 
@@ -338,8 +481,7 @@ class Tool(object):
         :class:`tmlib.models.result.LabelValues`
         '''
         logger.info('save label values for result %d', result_id)
-        mapobject_ids = data.index.levels[0].tolist()
-        tpoints = data.index.levels[1]
+        mapobject_ids = data.index.get_level_values('mapobject_id').unique()
         with tm.utils.ExperimentConnection(self.experiment_id) as connection:
             connection.execute('''
                 SELECT id FROM mapobject_types
@@ -357,57 +499,80 @@ class Tool(object):
                 GROUP BY partition_key
             ''', {
                 'mapobject_type_id': mapobject_type_id,
-                'mapobject_ids': mapobject_ids
+                'mapobject_ids': mapobject_ids.tolist()
             })
             records = connection.fetchall()
 
-        # Grouping mapobject IDs per partition_key allows us
-        # to target individual shards of the label_values table directly
-        # on the worker nodes with full SQL support, including multi-row
-        # insert/update statements.
-        for tpoint in tpoints:
-            for partition_key, mapobject_ids in records:
-                with tm.utils.ExperimentConnection(self.experiment_id) as conn:
-                    host, port, shard_id = conn.locate_partition(
-                        tm.LabelValues, partition_key
-                    )
-                worker_connection = tm.utils.ExperimentWorkerConnection(
-                    self.experiment_id, host, port
+            # Several partitions may be placed on the same shard. Grouping
+            # them allows us to merge all values of a shard in one go.
+            shards = collections.defaultdict(list)
+            for partition_key, ids in records:
+                host, port, shard_id = connection.locate_partition(
+                    tm.LabelValues, partition_key
                 )
-                with worker_connection as connection:
-                    logger.debug(
-                        'upsert label values for partition %d', partition_key
+                shards[(host, port, shard_id)].append(
+                    pd.Series(partition_key, index=ids)
+                )
+
+        # Grouping mapobject IDs per shard allows us to target individual
+        # shards of the label_values table directly on the worker nodes with
+        # full SQL support. Values are first copied into a temporary table and
+        # then merged into the shard with a single upsert statement.
+        index = data.index.get_level_values('mapobject_id')
+        for (host, port, shard_id), partitions in shards.iteritems():
+            partition_keys = pd.concat(partitions)
+            subset = data[index.isin(partition_keys.index)]
+            if subset.empty:
+                continue
+            # Rows are formatted in bulk rather than one by one to keep the
+            # Python overhead independent of the number of mapobjects.
+            values = pd.Series(np.round(subset.values, 6)).astype(str)
+            payload = pd.DataFrame({
+                'partition_key': partition_keys.reindex(
+                    subset.index.get_level_values('mapobject_id')
+                ).values,
+                'mapobject_id': subset.index.get_level_values('mapobject_id'),
+                'tpoint': subset.index.get_level_values('tpoint'),
+                'values': ('%d=>' % result_id) + values.values
+            })
+            columns = ('partition_key', 'mapobject_id', 'tpoint', 'values')
+            f = StringIO()
+            payload.to_csv(
+                f, sep=';', columns=columns, header=False, index=False
+            )
+            f.seek(0)
+            worker_connection = tm.utils.ExperimentWorkerConnection(
+                self.experiment_id, host, port
+            )
+            with worker_connection as connection:
+                logger.debug(
+                    'upsert %d label values for shard %d',
+                    payload.shape[0], shard_id
+                )
+                tmp_table = 'label_values_tmp_{shard}'.format(shard=shard_id)
+                connection.execute('''
+                    CREATE TEMP TABLE {tmp_table} (
+                        partition_key integer, mapobject_id bigint,
+                        tpoint integer, values hstore
                     )
-                    sql = '''
-                        INSERT INTO label_values_{shard} AS v (
-                            partition_key, mapobject_id, values, tpoint
-                        )
-                        VALUES %s
-                        ON CONFLICT ON CONSTRAINT label_values_pkey_{shard}
-                        DO UPDATE
-                        SET values = v.values || EXCLUDED.values
-                    '''.format(shard=shard_id)
-                    template = '''
-                        (
-                            %(partition_key)s, %(mapobject_id)s,
-                            %(values)s, %(tpoint)s
-                        )
-                    '''
-                    args = [
-                        {
-                            'values': {
-                                str(result_id):
-                                    str(np.round(data.ix[(mid, tpoint)], 6))
-                            },
-                            'mapobject_id': mid,
-                            'partition_key': partition_key,
-                            'tpoint': tpoint
-                        }
-                        for mid in mapobject_ids
-                    ]
-                    execute_values(
-                        connection, sql, args, template=template, page_size=500
+                '''.format(tmp_table=tmp_table))
+                connection.copy_from(
+                    f, tmp_table, sep=';', columns=columns, null=''
+                )
+                connection.execute('''
+                    INSERT INTO label_values_{shard} AS v (
+                        partition_key, mapobject_id, values, tpoint
                     )
+                    SELECT partition_key, mapobject_id, values, tpoint
+                    FROM {tmp_table}
+                    ON CONFLICT ON CONSTRAINT label_values_pkey_{shard}
+                    DO UPDATE
+                    SET values = v.values || EXCLUDED.values
+                '''.format(shard=shard_id, tmp_table=tmp_table))
+                connection.execute('''
+                    DROP TABLE {tmp_table}
+                '''.format(tmp_table=tmp_table))
+            f.close()
 
     def register_result(self, submission_id, mapobject_type_name,
             result_type, **result_attributes):
@@ -495,11 +660,138 @@ class Classifier(Tool):
 
     __abstract__ = True
 
+    #: int: time in seconds since its last use after which a cached model
+    #: that is not referenced by a tool result is evicted; this protects
+    #: models that have just been trained and are not yet referenced
+    MODEL_CACHE_GRACE_PERIOD = 24 * 60 * 60
+
     @same_docstring_as(Tool.__init__)
-    def __init__(self, experiment_id):
-        super(Classifier, self).__init__(experiment_id)
+    def __init__(self, experiment_id, cores=1):
+        super(Classifier, self).__init__(experiment_id, cores)
+        self._model_cache_dir = None
+
+    @property
+    def _model_cache_location(self):
+        if self._model_cache_dir is None:
+            with tm.utils.ExperimentSession(self.experiment_id) as session:
+                experiment = session.query(tm.Experiment).\
+                    get(self.experiment_id)
+                location = os.path.join(experiment.tools_location, 'models')
+            create_directory(location)
+            self._model_cache_dir = location
+        return self._model_cache_dir
+
+    def _get_cached_model_file(self, key):
+        return os.path.join(self._model_cache_location, '%s.pkl' % key)
+
+    def build_model_key(self, mapobject_type_name, feature_names, labels,
+            **options):
+        '''Builds a key that uniquely identifies a trained model.
+
+        Parameters
+        ----------
+        mapobject_type_name: str
+            name of the selected
+            :class:`MapobjectType <tmlib.models.mapobject.MapobjectType>`
+        feature_names: List[str]
+            name of each selected
+            :class:`Feature <tmlib.models.feature.Feature>`
+        labels: Dict[int, int]
+            mapping of :class:`Mapobject <tmlib.models.mapobject.Mapobject>`
+            ID to assigned label
+        **options: dict, optional
+            additional training options, e.g. classification method
+
+        Returns
+        -------
+        str
+            hex digest
+        '''
+        key = simplejson.dumps({
+            'mapobject_type_name': mapobject_type_name,
+            'feature_names': sorted(feature_names),
+            'labels': sorted(labels.items()),
+            'options': options
+        }, sort_keys=True)
+        return hashlib.sha1(key).hexdigest()
+
+    def load_cached_model(self, key):
+        '''Loads a previously trained model from the cache.
+
+        Parameters
+        ----------
+        key: str
+            key of the model
+            (see :meth:`build_model_key <tmlib.tools.base.Classifier.build_model_key>`)
+
+        Returns
+        -------
+        Tuple[sklearn.base.BaseEstimator] or None
+            trained classifier and scaler or ``None`` if no model has been
+            cached for `key`
+
+        Note
+        ----
+        Feature values are not part of the key. Labels refer to mapobject
+        IDs, however, which change when objects are recomputed, such that
+        models trained on outdated feature values won't be reused.
+        '''
+        filename = self._get_cached_model_file(key)
+        if not os.path.exists(filename):
+            return None
+        logger.info('load cached model "%s"', key)
+        # Mark the model as recently used.
+        os.utime(filename, None)
+        return joblib.load(filename)
 
-    def train_supervised(self, feature_data, labels, method, n_fold_cv):
+    def cache_model(self, key, model, scaler=None):
+        '''Caches a trained model for reuse by subsequent requests.
+
+        Parameters
+        ----------
+        key: str
+            key of the model
+            (see :meth:`build_model_key <tmlib.tools.base.Classifier.build_model_key>`)
+        model: sklearn.base.BaseEstimator
+            model fitted on training data
+        scaler: sklearn.preprocessing.data.RobustScaler, optional
+            scaler fitted on training data
+        '''
+        filename = self._get_cached_model_file(key)
+        logger.info('cache model "%s"', key)
+        joblib.dump((model, scaler), filename)
+        self._evict_cached_models()
+
+    def _evict_cached_models(self):
+        # Models that are referenced by a tool result are required for
+        # predictions and only removed together with the result. Models of
+        # results that have been deleted without removing the model, e.g. in
+        # bulk or via cascades in the database, are evicted as well.
+        with tm.utils.ExperimentSession(self.experiment_id) as session:
+            referenced = session.query(
+                    tm.ToolResult.attributes['model_file'].astext
+                ).\
+                all()
+            referenced = {r[0] for r in referenced}
+        location = self._model_cache_location
+        filenames = [
+            os.path.join(location, f) for f in os.listdir(location)
+            if f.endswith('.pkl')
+        ]
+        last_use = time.time() - self.MODEL_CACHE_GRACE_PERIOD
+        evicted = [
+            f for f in filenames
+            if f not in referenced and os.path.getmtime(f) < last_use
+        ]
+        if not evicted:
+            return
+        logger.info('evict %d cached models', len(evicted))
+        for filename in evicted:
+            logger.debug('remove cached model: %s', filename)
+            os.remove(filename)
+
+    def train_supervised(self, feature_data, labels, method, n_fold_cv,
+            search='grid', time_budget=None):
         '''Trains a classifier for mapobjects based on `feature_data` and
         known labels.
 
@@ -514,16 +806,32 @@ class Classifier(Tool):
             method to use for classification
         n_fold_cv: int
             number of crossvalidation iterations (*n*-fold)
+        search: str, optional
+            strategy for searching the hyper-parameter space; either
+            ``"grid"`` for an exhaustive search or ``"randomized"`` for
+            sampling a subset of parameter combinations (default: ``"grid"``)
+        time_budget: int, optional
+            time in seconds that may be spent on a ``"randomized"`` search;
+            the number of sampled parameter combinations is derived from the
+            time it takes to fit a single model (default: ``None``)
 
         Returns
         -------
         Tuple[sklearn.base.BaseEstimator]
             trained supervised classifier and scaler
+
+        Note
+        ----
+        The search is parallelized over the
+        :attr:`cores <tmlib.tools.base.Tool.cores>` allocated for the job.
+        The final model is refitted on all training data with the best
+        parameters using all cores if the estimator supports it.
         '''
 
         classifiers = {
             'randomforest': {
-                # NOTE: RF could be parallelized.
+                # NOTE: Trees are only grown in parallel for the final model,
+                # since the search itself is already parallelized.
                 'cls': RandomForestClassifier(n_jobs=1),
                 # No scaling required for decision trees.
                 'scaler': None,
@@ -577,11 +885,54 @@ class Classifier(Tool):
             scaler.fit(X)
             X = scaler.transform(X)
         clf = classifiers[method]['cls']
+        search_space = classifiers[method]['search_space']
         folds = KFold(n_splits=n_fold_cv)
-        # TODO: Second, finer grid search
-        model = GridSearchCV(clf, classifiers[method]['search_space'], cv=folds)
+        logger.debug('search hyper-parameters using %d cores', self.cores)
+        if search == 'grid':
+            # TODO: Second, finer grid search
+            model = GridSearchCV(
+                clf, search_space, cv=folds, n_jobs=self.cores, refit=False
+            )
+        elif search == 'randomized':
+            n_iter = self._estimate_search_iterations(
+                clf, X, y, search_space, n_fold_cv, time_budget
+            )
+            model = RandomizedSearchCV(
+                clf, search_space, n_iter=n_iter, cv=folds,
+                n_jobs=self.cores, refit=False
+            )
+        else:
+            raise ValueError('Unknown search strategy "%s".' % search)
         model.fit(X, y)
-        return (model, scaler)
+        logger.info(
+            'best parameters: %s (score: %.3f)',
+            model.best_params_, model.best_score_
+        )
+        estimator = clone(clf).set_params(**model.best_params_)
+        if 'n_jobs' in estimator.get_params():
+            estimator.set_params(n_jobs=self.cores)
+        estimator.fit(X, y)
+        return (estimator, scaler)
+
+    def _estimate_search_iterations(self, clf, X, y, search_space, n_fold_cv,
+            time_budget):
+        n_candidates = len(ParameterGrid(search_space))
+        if time_budget is None:
+            return min(10, n_candidates)
+        # Fit the estimator with default parameters on the fraction of
+        # samples used per crossvalidation fold to estimate how many
+        # candidates can be evaluated within the time budget.
+        n = int(len(y) * (n_fold_cv - 1) / float(n_fold_cv))
+        start = time.time()
+        clone(clf).fit(X[:n], y[:n])
+        duration = max(time.time() - start, 10**-3)
+        n_iter = int(time_budget * self.cores / (duration * n_fold_cv))
+        n_iter = max(1, min(n_iter, n_candidates))
+        logger.info(
+            'sample %d of %d parameter combinations to stay within time '
+            'budget of %d seconds', n_iter, n_candidates, time_budget
+        )
+        return n_iter
 
     def train_unsupervised(self, feature_data, k, method):
         '''Trains a classifier that groups mapobjects into `k` classes based
@@ -618,6 +969,53 @@ class Classifier(Tool):
         model.fit(X)
         return (model, scaler)
 
+    def train_unsupervised_incremental(self, feature_data_batches, k,
+            method, scaler=None):
+        '''Trains a classifier that groups mapobjects into `k` classes based
+        on batches of `feature_data`, one batch at a time.
+
+        Parameters
+        ----------
+        feature_data_batches: Iterable[pandas.DataFrame]
+            feature values that should be used to train the classifier
+        k: int
+            number of classes
+        method: str
+            model to use for clustering
+        scaler: sklearn.preprocessing.data.RobustScaler, optional
+            scaler fitted on a representative subset of the data to rescale
+            each batch the same way
+
+        Returns
+        -------
+        sklearn.base.BaseEstimator
+            trained unsupervised classifier
+
+        Note
+        ----
+        In contrast to
+        :meth:`train_unsupervised <tmlib.tools.base.Classifier.train_unsupervised>`
+        the entire dataset is used for training, but never more than a
+        single batch is held in memory.
+        '''
+        classifiers = {
+            'minibatchkmeans': {
+                'cls': MiniBatchKMeans
+            }
+        }
+        logger.info(
+            'train "%s" classifier for %d classes incrementally', method, k
+        )
+        clf = classifiers[method]['cls']
+        model = clf(n_clusters=k)
+        for i, feature_data in enumerate(feature_data_batches):
+            logger.debug('fit batch #%d', i)
+            X = feature_data
+            if scaler is not None:
+                X = scaler.transform(X)
+            model.partial_fit(X)
+        return model
+
     def predict(self, feature_data, model, scaler=None):
         '''Predicts class labels for mapobjects based on `feature_values` using
         pre-trained `model`.
@@ -643,3 +1041,136 @@ class Classifier(Tool):
             X = scaler.transform(X)
         predictions = model.predict(X)
         return pd.Series(predictions, index=feature_data.index)
+
+    def store_model(self, result_id, feature_names, model_key):
+        '''Stores a reference to a trained model together with a tool result,
+        such that labels can later be predicted for additional mapobjects
+        without retraining the model.
+
+        Parameters
+        ----------
+        result_id: int
+            ID of a registerd
+            :class:`ToolResult <tmlib.models.result.ToolResult>`
+        feature_names: List[str]
+            name of each :class:`Feature <tmlib.models.feature.Feature>`
+            the model was trained on
+        model_key: str
+            key of the model in the cache
+            (see :meth:`cache_model <tmlib.tools.base.Classifier.cache_model>`)
+
+        Note
+        ----
+        The model itself is not copied, the file of the cached model is
+        referenced in the ``attributes`` of the result. Referenced models are
+        not evicted from the cache and are removed once no result references
+        them anymore.
+        '''
+        logger.info('store model "%s" for result %d', model_key, result_id)
+        with tm.utils.ExperimentSession(self.experiment_id) as session:
+            result = session.query(tm.ToolResult).get(result_id)
+            # In-place modifications of JSON columns are not tracked.
+            attributes = dict(result.attributes)
+            attributes['model_file'] = self._get_cached_model_file(model_key)
+            attributes['feature_names'] = feature_names
+            result.attributes = attributes
+
+    def load_model(self, result_id):
+        '''Loads the model that was stored for a tool result.
+
+        Parameters
+        ----------
+        result_id: int
+            ID of a registerd
+            :class:`ToolResult <tmlib.models.result.ToolResult>`
+
+        Returns
+        -------
+        Tuple[Union[List[str], sklearn.base.BaseEstimator]]
+            names of features, trained classifier and scaler
+
+        Raises
+        ------
+        ValueError
+            when no model was stored for the result
+
+        See also
+        --------
+        :meth:`tmlib.tools.base.Classifier.store_model`
+        '''
+        with tm.utils.ExperimentSession(self.experiment_id) as session:
+            result = session.query(tm.ToolResult).get(result_id)
+            filename = result.attributes.get('model_file')
+            feature_names = result.attributes.get('feature_names')
+        if filename is None or not os.path.exists(filename):
+            raise ValueError('No model stored for result %d.' % result_id)
+        logger.info('load model for result %d', result_id)
+        model, scaler = joblib.load(filename)
+        return (feature_names, model, scaler)
+
+    def get_unlabeled_mapobjects(self, result_id):
+        '''Selects mapobjects that don't have a label value for a tool result
+        yet, for example because they were created after the result.
+
+        Parameters
+        ----------
+        result_id: int
+            ID of a registerd
+            :class:`ToolResult <tmlib.models.result.ToolResult>`
+
+        Returns
+        -------
+        List[int]
+            IDs of mapobjects ordered by partition key and ID
+        '''
+        with tm.utils.ExperimentSession(self.experiment_id) as session:
+            result = session.query(tm.ToolResult.mapobject_type_id).\
+                filter_by(id=result_id).\
+                one()
+        with tm.utils.ExperimentConnection(self.experiment_id) as connection:
+            connection.execute('''
+                SELECT DISTINCT m.partition_key, m.id
+                FROM mapobjects AS m
+                LEFT OUTER JOIN label_values AS v
+                ON v.mapobject_id = m.id AND v.partition_key = m.partition_key
+                WHERE m.mapobject_type_id = %(mapobject_type_id)s
+                AND (v.values IS NULL OR NOT exist(v.values, %(key)s))
+                ORDER BY m.partition_key, m.id
+            ''', {
+                'mapobject_type_id': result.mapobject_type_id,
+                'key': str(result_id)
+            })
+            return [r.id for r in connection.fetchall()]
+
+    def predict_unlabeled(self, result_id):
+        '''Predicts labels for all mapobjects that don't have a label value
+        for a tool result yet, using the model stored for the result.
+
+        Parameters
+        ----------
+        result_id: int
+            ID of a registerd
+            :class:`ToolResult <tmlib.models.result.ToolResult>`
+        '''
+        logger.info(
+            'predict labels for unlabeled objects of result %d', result_id
+        )
+        with tm.utils.ExperimentSession(self.experiment_id) as session:
+            result = session.query(tm.ToolResult).get(result_id)
+            mapobject_type_name = result.mapobject_type.name
+        feature_names, model, scaler = self.load_model(result_id)
+        mapobject_ids = self.get_unlabeled_mapobjects(result_id)
+        logger.info('%d objects have no label', len(mapobject_ids))
+
+        n_test = 10**5
+        logger.debug('set batch size to %d', n_test)
+        batches = create_partitions(mapobject_ids, n_test)
+        test_sets = self.iterate_feature_values(
+            mapobject_type_name, feature_names, batches
+        )
+        for i, test_set in enumerate(test_sets):
+            logger.info('predict labels for batch #%d', i)
+            predicted_labels = self.predict(test_set, model, scaler)
+            self.save_result_values(
+                mapobject_type_name, result_id, predicted_labels
+            )
@@ -36,11 +36,14 @@ class Classification(Classifier):
     )
 
     # TODO: Ensure that all options are available for all libraries.
-    __options__ = {'method': ['randomforest', 'svm'], 'n_fold_cv': 10}
+    __options__ = {
+        'method': ['randomforest', 'svm'], 'n_fold_cv': 10,
+        'search': ['grid', 'randomized']
+    }
 
     @same_docstring_as(Tool.__init__)
-    def __init__(self, experiment_id):
-        super(Classification, self).__init__(experiment_id)
+    def __init__(self, experiment_id, cores=1):
+        super(Classification, self).__init__(experiment_id, cores)
 
     def process_request(self, submission_id, payload):
         '''Processes a client tool request and inserts the generated result
@@ -60,11 +63,28 @@ class Classification(Classifier):
                 ],
                 "options": {
                     "method": str,
-                    "n_fold_cv": int
+                    "n_fold_cv": int,
+                    "search": str,
+                    "time_budget": int
                 }
 
             }
 
+        Options ``"search"`` and ``"time_budget"`` are optional
+        (see :meth:`train_supervised <tmlib.tools.base.Classifier.train_supervised>`).
+        Trained models are cached, such that repeated requests with the same
+        features, labels and options don't require retraining.
+
+        A *predict only* request has the form::
+
+            {
+                "result_id": int
+            }
+
+        and predicts labels for mapobjects that don't have a label for the
+        existing result yet, using the model that was stored for the result
+        (see :meth:`predict_unlabeled <tmlib.tools.base.Classifier.predict_unlabeled>`).
+
         Parameters
         ----------
         submission_id: int
@@ -72,14 +92,21 @@ class Classification(Classifier):
         payload: dict
             description of the tool job
         '''
+        if 'result_id' in payload:
+            return self.predict_unlabeled(payload['result_id'])
+
         logger.info('perform supervised classification')
         mapobject_type_name = payload['chosen_object_type']
         feature_names = payload['selected_features']
         method = payload['options']['method']
         n_fold_cv = payload['options']['n_fold_cv']
+        search = payload['options'].get('search', 'grid')
+        time_budget = payload['options'].get('time_budget')
 
         if method not in self.__options__['method']:
             raise ValueError('Unknown method "%s".' % method)
+        if search not in self.__options__['search']:
+            raise ValueError('Unknown search strategy "%s".' % search)
 
         labels = dict()
         label_map = dict()
@@ -94,13 +121,24 @@ class Classification(Classifier):
             unique_labels=unique_labels, label_map=label_map
         )
 
-        training_set = self.load_feature_values(
-            mapobject_type_name, feature_names, labels.keys()
-        )
-        logger.info('train classifier')
-        model, scaler = self.train_supervised(
-            training_set, labels, method, n_fold_cv
+        model_key = self.build_model_key(
+            mapobject_type_name, feature_names, labels,
+            method=method, n_fold_cv=n_fold_cv, search=search,
+            time_budget=time_budget
         )
+        cached_model = self.load_cached_model(model_key)
+        if cached_model is None:
+            training_set = self.load_feature_values(
+                mapobject_type_name, feature_names, labels.keys()
+            )
+            logger.info('train classifier')
+            model, scaler = self.train_supervised(
+                training_set, labels, method, n_fold_cv, search, time_budget
+            )
+            self.cache_model(model_key, model, scaler)
+        else:
+            model, scaler = cached_model
+        self.store_model(result_id, feature_names, model_key)
 
         n_test = 10**5
         logger.debug('set batch size to %d', n_test)
@@ -16,6 +16,7 @@
 import numpy as np
 import pandas as pd
 import logging
+from sklearn.preprocessing import RobustScaler
 
 import tmlib.models as tm
 from tmlib.utils import same_docstring_as
@@ -31,11 +32,11 @@ class Clustering(Classifier):
 
     __description__ = 'Clusters mapobjects based on a set of selected features.'
 
-    __options__ = {'method': ['kmeans'] }
+    __options__ = {'method': ['kmeans', 'minibatchkmeans']}
 
     @same_docstring_as(Tool.__init__)
-    def __init__(self, experiment_id):
-        super(Clustering, self).__init__(experiment_id)
+    def __init__(self, experiment_id, cores=1):
+        super(Clustering, self).__init__(experiment_id, cores)
 
     def process_request(self, submission_id, payload):
         '''Processes a client tool request and inserts the generated result
@@ -51,6 +52,19 @@ class Clustering(Classifier):
                 }
             }
 
+        Method ``"minibatchkmeans"`` streams over all mapobjects and trains
+        the model incrementally rather than on a random subset.
+
+        A *predict only* request has the form::
+
+            {
+                "result_id": int
+            }
+
+        and predicts labels for mapobjects that don't have a label for the
+        existing result yet, using the model that was stored for the result
+        (see :meth:`predict_unlabeled <tmlib.tools.base.Classifier.predict_unlabeled>`).
+
         Parameters
         ----------
         submission_id: int
@@ -58,6 +72,9 @@ class Clustering(Classifier):
         payload: dict
             description of the tool job
         '''
+        if 'result_id' in payload:
+            return self.predict_unlabeled(payload['result_id'])
+
         logger.info('perform unsupervised classification')
         mapobject_type_name = payload['chosen_object_type']
         feature_names = payload['selected_features']
@@ -81,18 +98,37 @@ class Clustering(Classifier):
         training_set = self.load_feature_values(
             mapobject_type_name, feature_names, mapobject_ids
         )
-        model, scaler = self.train_unsupervised(training_set, k, method)
-
         n_test = 10**5
         logger.debug('set batch size to %d', n_test)
         batches = self.partition_mapobjects(mapobject_type_name, n_test)
-        counter = 0
-        for mapobject_ids in batches:
-            logger.info('predict labels for batch #%d', counter)
-            counter += 1
-            test_set = self.load_feature_values(
-                mapobject_type_name, feature_names, mapobject_ids
+        if method == 'minibatchkmeans':
+            # The random subset is only used to fit the scaler. The model
+            # itself is trained on all objects in a streaming fashion.
+            scaler = RobustScaler(quantile_range=(1.0, 99.0), copy=False)
+            scaler.fit(training_set)
+            model = self.train_unsupervised_incremental(
+                self.iterate_feature_values(
+                    mapobject_type_name, feature_names, batches
+                ),
+                k, method, scaler
             )
+        else:
+            model, scaler = self.train_unsupervised(training_set, k, method)
+        del training_set
+        # Models are trained on a random subset of objects and are thus
+        # specific to the submission rather than reused across requests.
+        model_key = self.build_model_key(
+            mapobject_type_name, feature_names, {},
+            method=method, k=k, submission_id=submission_id
+        )
+        self.cache_model(model_key, model, scaler)
+        self.store_model(result_id, feature_names, model_key)
+
+        test_sets = self.iterate_feature_values(
+            mapobject_type_name, feature_names, batches
+        )
+        for i, test_set in enumerate(test_sets):
+            logger.info('predict labels for batch #%d', i)
             predicted_labels = self.predict(test_set, model, scaler)
             self.save_result_values(
                 mapobject_type_name, result_id, predicted_labels
@@ -70,12 +70,13 @@ class ToolRequestManager(SubmissionManager):
         filename = '%s_%d.json' % (self.__class__.__name__, submission_id)
         return os.path.join(self._batches_location, filename)
 
-    def _build_command(self, submission_id):
+    def _build_command(self, submission_id, cores=1):
         command = [
             'tm_tool',
             str(self.experiment_id),
             '--name', self.tool_name,
-            '--submission_id', str(submission_id)
+            '--submission_id', str(submission_id),
+            '--cores', str(cores)
         ]
         command.extend(['-v' for x in range(self.verbosity)])
         logger.debug('submit tool request: %s', ' '.join(command))
@@ -151,7 +152,7 @@ class ToolRequestManager(SubmissionManager):
         logger.debug('allocated cores for job: %d', cores)
         job = ToolJob(
             tool_name=self.tool_name,
-            arguments=self._build_command(submission_id),
+            arguments=self._build_command(submission_id, cores),
             output_dir=self._log_location,
             submission_id=submission_id,
             user_name=user_name
@@ -267,6 +268,10 @@ class ToolRequestManager(SubmissionManager):
             '--submission_id', '-s', type=int, required=True,
             help='ID of the corresponding submission'
         )
+        parser.add_argument(
+            '--cores', '-c', type=int, default=1,
+            help='number of CPU cores that may be used for processing'
+        )
         return parser
 
     @classmethod
@@ -309,7 +314,7 @@ class ToolRequestManager(SubmissionManager):
         manager._print_logo()
         payload = manager.get_payload(args.submission_id)
         tool_cls = get_tool_class(args.name)
-        tool = tool_cls(args.experiment_id)
+        tool = tool_cls(args.experiment_id, args.cores)
         tool.process_request(args.submission_id, payload)
 
         logger.info('done')
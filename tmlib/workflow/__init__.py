@@ -81,6 +81,7 @@ As an example serves the "canonical" type declared by
 
 '''
 import os
+import sys
 import glob
 
 import logging
@@ -398,9 +399,41 @@ def get_step_information(name):
     return (subpkg.__fullname__, subpkg.__description__)
 
 
-from workflow import Workflow
-from workflow import WorkflowStep
-from workflow import ParallelWorkflowStage
-from workflow import SequentialWorkflowStage
+class _WorkflowPackage(types.ModuleType):
+
+    '''Package module that imports workflow classes upon first access.
+
+    Step packages and the registry functions are used by every job of a
+    workflow. Importing :mod:`tmlib.workflow.workflow` together with the
+    package would load all of its dependencies for each job, although
+    jobs don't need them.
+    '''
+
+    _lazy_attributes = {
+        'Workflow': 'tmlib.workflow.workflow',
+        'WorkflowStep': 'tmlib.workflow.workflow',
+        'ParallelWorkflowStage': 'tmlib.workflow.workflow',
+        'SequentialWorkflowStage': 'tmlib.workflow.workflow'
+    }
+
+    def __init__(self, module):
+        super(_WorkflowPackage, self).__init__(module.__name__, module.__doc__)
+        self.__dict__.update(module.__dict__)
+        # Keep a reference to the original module, since its globals would
+        # otherwise be cleared once it gets garbage collected.
+        self._module = module
+
+    def __getattr__(self, name):
+        if name not in self._lazy_attributes:
+            raise AttributeError(
+                'Module "%s" has no attribute "%s".' % (self.__name__, name)
+            )
+        module = importlib.import_module(self._lazy_attributes[name])
+        value = getattr(module, name)
+        setattr(self, name, value)
+        return value
+
+
+sys.modules[__name__] = _WorkflowPackage(sys.modules[__name__])
 
 
@@ -83,7 +83,10 @@ class ImageRegistrator(WorkflowStepAPI):
                 order_by(tm.Site.id).\
                 all()
 
-            batches = self._create_batches(site_ids, args.batch_size)
+            batch_size = self.resolve_batch_size(
+                args.batch_size, len(site_ids)
+            )
+            batches = self._create_batches(site_ids, batch_size)
             for batch in batches:
 
                 job_count += 1
@@ -36,8 +36,12 @@ class AlignBatchArguments(BatchArguments):
     )
 
     batch_size = Argument(
-        type=int, default=100, flag='batch-size', short_flag='b',
-        help='number of acquisition sites that should be processed per job'
+        type=int, default=100, flag='batch-size', short_flag='b', auto=True,
+        help='''
+            number of acquisition sites that should be processed per job
+            ("auto" determines the number from runtimes of the previous
+            submission)
+        '''
     )
 
     illumcorr = Argument(
@@ -13,10 +13,10 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
-import re
 import os
 import yaml
 import glob
+import shutil
 import time
 import logging
 import numpy as np
@@ -33,10 +33,9 @@ from gc3libs.quantity import Duration, Memory
 import tmlib.models as tm
 from tmlib import cfg
 from tmlib import utils
-from tmlib.readers import JsonReader
-from tmlib.writers import JsonWriter
 from tmlib.workflow import get_step_args
-from tmlib.workflow import WorkflowStep
+from tmlib.workflow import get_step_api
+from tmlib.workflow.batches import create_batch_store
 from tmlib.errors import (
     WorkflowError, WorkflowDescriptionError, WorkflowTransitionError,
     JobDescriptionError, CliArgError
@@ -168,6 +167,11 @@ class WorkflowStepAPI(BasicWorkflowStepAPI):
                     'No experiment with ID %d found.' % self.experiment_id
                 )
             self.workflow_location = experiment.workflow_location
+        self._batch_store = None
+        self._n_items = 0
+        self._batch_size = None
+        self._previous_metadata = dict()
+        self._auto_batch_size = None
 
     @property
     def step_name(self):
@@ -178,6 +182,142 @@ class WorkflowStepAPI(BasicWorkflowStepAPI):
     def _create_batches(li, n):
         return utils.create_partitions(li, n)
 
+    def resolve_batch_size(self, batch_size, n_items):
+        '''Resolves the number of items that should be processed per job.
+
+        Parameters
+        ----------
+        batch_size: Union[int, str]
+            number of items per job or ``"auto"``
+        n_items: int
+            total number of items that should be processed
+
+        Returns
+        -------
+        int
+            number of items per job
+
+        Note
+        ----
+        The number of items and the resolved batch size are recorded and
+        stored together with the batches, such that the next submission of
+        the step can derive per-item statistics.
+
+        See also
+        --------
+        :meth:`tmlib.workflow.api.WorkflowStepAPI.estimate_batch_size`
+        '''
+        self._n_items += n_items
+        if batch_size == 'auto':
+            if self._auto_batch_size is None:
+                self._auto_batch_size = self.estimate_batch_size()
+            batch_size = max(1, min(self._auto_batch_size, n_items))
+        self._batch_size = batch_size
+        return batch_size
+
+    def get_run_job_statistics(self, submission_id):
+        '''Gets runtime statistics of the successfully terminated *run* jobs
+        of the step for a given submission.
+
+        Parameters
+        ----------
+        submission_id: int
+            ID of the submission
+
+        Returns
+        -------
+        Dict[str, List[float]]
+            time in seconds ("time") and memory in megabytes ("memory") of
+            each successfully terminated job
+        '''
+        with tm.utils.MainSession() as session:
+            jobs = session.query(tm.Task.time, tm.Task.memory).\
+                filter(
+                    tm.Task.submission_id == submission_id,
+                    tm.Task.type == RunJob.__name__,
+                    tm.Task.name.like('%s_run%%' % self.step_name),
+                    tm.Task.state == gc3libs.Run.State.TERMINATED,
+                    tm.Task.exitcode == 0,
+                    tm.Task.time.isnot(None)
+                ).\
+                all()
+        return {
+            'time': [j.time.total_seconds() for j in jobs],
+            'memory': [j.memory for j in jobs if j.memory is not None]
+        }
+
+    def estimate_batch_size(self, percentile=90):
+        '''Estimates the number of items per job that meets the targeted
+        job duration and memory ceiling based on the per-item runtime of the
+        previous submission of the step.
+
+        Parameters
+        ----------
+        percentile: int, optional
+            percentile of the per-item time and memory that should be used
+            for the estimate (default: ``90``)
+
+        Returns
+        -------
+        int
+            number of items per job
+
+        Note
+        ----
+        The targeted duration and the memory ceiling are configured via
+        :attr:`batch_duration <tmlib.config.LibraryConfig.batch_duration>`
+        and :attr:`batch_memory <tmlib.config.LibraryConfig.batch_memory>`.
+        Memory is assumed to grow at most linearly with the number of items.
+        The default batch size of the step is used in case no statistics
+        are available.
+        '''
+        default = get_step_args(self.step_name)[0].batch_size.default
+        previous = self._previous_metadata
+        required_keys = {'n_items', 'n_jobs', 'submission_id'}
+        if not required_keys.issubset(previous) or not previous['n_jobs']:
+            logger.info(
+                'no statistics available for previous submission - '
+                'use default batch size: %d', default
+            )
+            return default
+        stats = self.get_run_job_statistics(previous['submission_id'])
+        if not stats['time']:
+            logger.info(
+                'no job of submission %d terminated successfully - '
+                'use default batch size: %d', previous['submission_id'],
+                default
+            )
+            return default
+        # The number of jobs is taken from the stored batches rather than
+        # from the tasks of the submission, which also include resubmitted
+        # jobs.
+        items_per_job = float(previous['n_items']) / previous['n_jobs']
+        time_per_item = (
+            np.percentile(stats['time'], percentile) / items_per_job
+        )
+        hours, minutes, seconds = map(int, cfg.batch_duration.split(':'))
+        duration = hours * 3600 + minutes * 60 + seconds
+        batch_size = duration / max(time_per_item, 1e-3)
+        if stats['memory']:
+            memory_per_item = (
+                np.percentile(stats['memory'], percentile) / items_per_job
+            )
+            batch_size = min(
+                batch_size, cfg.batch_memory / max(memory_per_item, 1e-3)
+            )
+        batch_size = max(1, int(batch_size))
+        logger.info(
+            'estimated %.2f s per item (%dth percentile) for %.1f items per '
+            'job of previous submission %d (batch size: %s)', time_per_item,
+            percentile, items_per_job, previous['submission_id'],
+            previous.get('batch_size')
+        )
+        logger.info(
+            'use batch size %d to target a job duration of %s',
+            batch_size, cfg.batch_duration
+        )
+        return batch_size
+
     @utils.autocreate_directory_property
     def step_location(self):
         '''str: location were step-specific data is stored'''
@@ -193,6 +333,44 @@ class WorkflowStepAPI(BasicWorkflowStepAPI):
         '''str: location where job description files are stored'''
         return os.path.join(self.step_location, 'batches')
 
+    @property
+    def batch_store(self):
+        '''tmlib.workflow.batches.BatchStore: store for job descriptions
+        (the backend is configured via
+        :attr:`batch_store <tmlib.config.LibraryConfig.batch_store>`)
+        '''
+        if self._batch_store is None:
+            self._batch_store = create_batch_store(
+                self.batches_location, self.step_name, cfg.batch_store
+            )
+        return self._batch_store
+
+    def clear_batches(self):
+        '''Removes the persisted job descriptions of a previous submission.'''
+        logger.debug('remove batches of previous submission')
+        # The metadata of the previous submission is required to derive
+        # per-item statistics for an "auto" batch size.
+        self._previous_metadata = self.batch_store.get_metadata()
+        shutil.rmtree(self.batches_location)
+        os.mkdir(self.batches_location)
+        self._batch_store = None
+
+    def get_run_journal(self, job_id):
+        '''Gets the journal of items that a job of the *run* phase has
+        completed, which enables the job to resume where a previous
+        execution stopped.
+
+        Parameters
+        ----------
+        job_id: int
+            one-based job ID
+
+        Returns
+        -------
+        tmlib.workflow.batches.JobJournal
+        '''
+        return self.batch_store.get_journal(job_id)
+
     def get_run_job_ids(self):
         '''Gets IDs of jobs of the *run* phase from persisted descriptions.
 
@@ -202,18 +380,26 @@ class WorkflowStepAPI(BasicWorkflowStepAPI):
             job IDs
 
         '''
-        job_description_files = glob.glob(
-            os.path.join(self.batches_location, '*_run_*.batch.json')
-        )
-        if not job_description_files:
+        job_ids = self.batch_store.get_run_job_ids()
+        if not job_ids:
             raise IOError('No batches found.')
-        job_ids = list()
-        for f in job_description_files:
-            j = int(re.search(r'_run_(\d+)\.batch.json', f).groups()[0])
-            job_ids.append(j)
-
         return job_ids
 
+    def get_run_job_indices(self):
+        '''Gets the index of jobs of the *run* phase from persisted
+        descriptions.
+
+        Returns
+        -------
+        Dict[int, int]
+            mapping of job ID to index
+
+        '''
+        indices = self.batch_store.get_run_job_indices()
+        if not indices:
+            raise IOError('No batches found.')
+        return indices
+
     def get_log_output(self, phase, job_id=None):
         '''Gets log outputs (standard output and error).
 
@@ -264,18 +450,6 @@ class WorkflowStepAPI(BasicWorkflowStepAPI):
             log['stderr'] = f.read()
         return log
 
-    def _build_batch_filename_for_run_job(self, job_id):
-        return os.path.join(
-            self.batches_location,
-            '%s_run_%.7d.batch.json' % (self.step_name, job_id)
-        )
-
-    def _build_batch_filename_for_collect_job(self):
-        return os.path.join(
-            self.batches_location,
-            '%s_collect.batch.json' % self.step_name
-        )
-
     def get_run_batch(self, job_id):
         '''Get description for a :class:`RunJob <tmlib.workflow.jobs.RunJob>`.
 
@@ -290,8 +464,103 @@ class WorkflowStepAPI(BasicWorkflowStepAPI):
             job description
         '''
         logger.debug('get batch for run job #%d', job_id)
-        batch_filename = self._build_batch_filename_for_run_job(job_id)
-        return self._read_batch_file(batch_filename)
+        return self.batch_store.get_run_batch(job_id)
+
+    def get_run_batch_inputs(self, batch):
+        '''Gets the items produced by the preceding step that a
+        :class:`RunJob <tmlib.workflow.jobs.RunJob>` requires.
+
+        Parameters
+        ----------
+        batch: Dict[str, Union[int, str, list, dict]]
+            job description
+
+        Returns
+        -------
+        List[Union[int, str, tuple]]
+            identifiers of required items or ``None`` in case they are not
+            known and the job requires the output of all jobs of the
+            preceding step
+
+        Note
+        ----
+        Steps that can stream from the preceding step (see
+        :class:`WorkflowDependencies <tmlib.workflow.dependencies.WorkflowDependencies>`)
+        should override this method.
+        '''
+        return None
+
+    def get_run_batch_outputs(self, batch):
+        '''Gets the items that a :class:`RunJob <tmlib.workflow.jobs.RunJob>`
+        produces.
+
+        Parameters
+        ----------
+        batch: Dict[str, Union[int, str, list, dict]]
+            job description
+
+        Returns
+        -------
+        List[Union[int, str, tuple]]
+            identifiers of produced items or ``None`` in case they are not
+            known
+
+        Note
+        ----
+        Steps that a subsequent step can stream from should override this
+        method.
+        '''
+        return None
+
+    def get_run_job_dependencies(self, upstream_step_name):
+        '''Determines for each job of the *run* phase the jobs of the *run*
+        phase of the preceding step, which produce the items required by the
+        job.
+
+        Parameters
+        ----------
+        upstream_step_name: str
+            name of the preceding step
+
+        Returns
+        -------
+        Dict[int, Set[int]]
+            mapping of job ID to IDs of jobs of the preceding step
+
+        See also
+        --------
+        :meth:`tmlib.workflow.api.WorkflowStepAPI.get_run_batch_inputs`
+        :meth:`tmlib.workflow.api.WorkflowStepAPI.get_run_batch_outputs`
+        '''
+        logger.info(
+            'determine dependencies of "run" jobs on jobs of step "%s"',
+            upstream_step_name
+        )
+        UpstreamAPI = get_step_api(upstream_step_name)
+        upstream_api = UpstreamAPI(self.experiment_id)
+        producers = dict()
+        # Jobs with unknown output are required by all jobs.
+        required_job_ids = set()
+        upstream_job_ids = upstream_api.get_run_job_ids()
+        for j in upstream_job_ids:
+            batch = upstream_api.get_run_batch(j)
+            items = upstream_api.get_run_batch_outputs(batch)
+            if items is None:
+                required_job_ids.add(j)
+                continue
+            for item in items:
+                producers[item] = j
+        dependencies = dict()
+        for j in self.get_run_job_ids():
+            batch = self.get_run_batch(j)
+            items = self.get_run_batch_inputs(batch)
+            if items is None:
+                dependencies[j] = set(upstream_job_ids)
+                continue
+            # Items that are not produced by any job are already available.
+            dependencies[j] = {producers[i] for i in items if i in producers}
+            dependencies[j].update(required_job_ids)
+        return dependencies
 
     def get_collect_batch(self):
         '''Get description for a
@@ -303,8 +572,7 @@ class WorkflowStepAPI(BasicWorkflowStepAPI):
             job description
         '''
         logger.debug('get batch for collect job')
-        batch_filename = self._build_batch_filename_for_collect_job()
-        return self._read_batch_file(batch_filename)
+        return self.batch_store.get_collect_batch()
 
     def store_run_batch(self, batch, job_id):
         '''Persists description for a
@@ -318,8 +586,27 @@ class WorkflowStepAPI(BasicWorkflowStepAPI):
             job ID
         '''
         logger.debug('store batch for run job #%d', job_id)
-        filename = self._build_batch_filename_for_run_job(job_id)
-        self._write_batch_file(filename, batch)
+        self.batch_store.store_run_batch(batch, job_id)
+
+    def store_run_batches(self, batches):
+        '''Persists descriptions for all
+        :class:`RunJob <tmlib.workflow.jobs.RunJob>` at once. Jobs get
+        one-based IDs in the order of `batches`.
+
+        Parameters
+        ----------
+        batches: Iterable[Dict[str, Union[int, str, list, dict]]]
+            JSON serializable job descriptions
+        '''
+        logger.debug('store batches for run jobs')
+        self.batch_store.store_run_batches(
+            (index + 1, batch) for index, batch in enumerate(batches)
+        )
+        self.batch_store.store_metadata({
+            'n_items': self._n_items,
+            'n_jobs': len(self.batch_store.get_run_job_ids()),
+            'batch_size': self._batch_size
+        })
 
     def store_collect_batch(self, batch):
         '''Persists description for a
@@ -331,23 +618,7 @@ class WorkflowStepAPI(BasicWorkflowStepAPI):
             JSON serializable job description
         '''
         logger.debug('store batch for collect job')
-        filename = self._build_batch_filename_for_collect_job()
-        self._write_batch_file(filename, batch)
-
-    def _read_batch_file(self, filename):
-        if not os.path.exists(filename):
-            raise OSError(
-                'Job description file does not exist: %s.\n'
-                'Initialize the step first by calling the "init" method.'
-                % filename
-            )
-        with JsonReader(filename) as f:
-            batch = f.read()
-        return batch
-
-    def _write_batch_file(self, filename, batch):
-        with JsonWriter(filename) as f:
-            f.write(batch)
+        self.batch_store.store_collect_batch(batch)
 
     def _build_init_command(self, batch_args, verbosity):
         logger.debug('build "init" command')
@@ -403,6 +674,12 @@ class WorkflowStepAPI(BasicWorkflowStepAPI):
         runs. Setting `assume_clean_state` would thus be appropriate in this
         context. It is up to the developer to implement this logic in a step
         accordingly.
+
+        Jobs that process several items, e.g. sites or image files, should
+        commit each item to the job's journal (see :meth:`get_run_journal`)
+        once its output has been persisted and skip items that have already
+        been committed, such that a resubmitted job resumes where a previous
+        execution stopped.
         '''
         pass
 
@@ -497,6 +774,7 @@ class WorkflowStepAPI(BasicWorkflowStepAPI):
         -------
         tmlib.workflow.WorkflowStep
         '''
+        from tmlib.workflow.workflow import WorkflowStep
         logger.debug('create workflow step for submission %d', submission_id)
         return WorkflowStep(
             name=self.step_name,
@@ -636,6 +914,12 @@ class WorkflowStepAPI(BasicWorkflowStepAPI):
         logger.debug('allocated memory for run jobs: %d MB', memory)
         logger.debug('allocated cores for run jobs: %d', cores)
 
+        # Statistics of the next submission are restricted to jobs of this
+        # submission.
+        metadata = self.batch_store.get_metadata()
+        metadata['submission_id'] = job_collection.submission_id
+        self.batch_store.store_metadata(metadata)
+
         job_ids = self.get_run_job_ids()
         for j in job_ids:
             job = RunJob(
@@ -62,7 +62,7 @@ class Argument(object):
     )
     def __init__(self, type, help, default=None, choices=None, flag=None,
             short_flag=None, required=False, disabled=False,
-            get_choices=None, meta=None, dependency=()):
+            get_choices=None, meta=None, dependency=(), auto=False):
         '''
         Parameters
         ----------
@@ -97,6 +97,10 @@ class Argument(object):
             alternative name of the argument displayed for command line options
         dependency: tuple, optional
             name-value pair of an argument the given argument depends on
+        auto: bool, optional
+            whether the value ``"auto"`` is accepted in addition to values
+            of type `type`, indicating that the value should be determined
+            automatically (default: ``False``)
 
         Note
         ----
@@ -113,6 +117,7 @@ class Argument(object):
         self.required = required
         self.disabled = disabled
         self.default = default
+        self.auto = auto
         self.value = None
         if isinstance(get_choices, types.FunctionType):
             arg_names = inspect.getargspec(get_choices).args
@@ -228,7 +233,9 @@ class Argument(object):
             # This can be caused by an emtpy text input fields. We will
             # interpret the value as unspecified.
             value = None
-        if value is not None:
+        if self.auto and value == 'auto':
+            value = str(value)
+        elif value is not None:
             try:
                 value = self.type(value)
             except ValueError:
@@ -239,6 +246,11 @@ class Argument(object):
                 )
         setattr(instance, self._attr_name, value)
 
+    def _cast_auto(self, value):
+        if value == 'auto':
+            return value
+        return self.type(value)
+
     def add_to_argparser(self, parser):
         '''Adds the argument to an argument parser for use in a command line
         interface.
@@ -268,7 +280,11 @@ class Argument(object):
             else:
                 kwargs['action'] = 'store_true'
         else:
-            kwargs['type'] = self.type
+            if self.auto:
+                kwargs['type'] = self._cast_auto
+                kwargs['help'] += ' or "auto"'
+            else:
+                kwargs['type'] = self.type
             kwargs['default'] = self.default
             kwargs['choices'] = self.choices
             if self.default is not None:
@@ -0,0 +1,559 @@
+# TmLibrary - TissueMAPS library for distibuted image analysis routines.
+# Copyright (C) 2016  Markus D. Herrmann, University of Zurich and Robin Hafen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''Persistent storage of job descriptions (batches) of workflow steps.'''
+import re
+import os
+import glob
+import json
+import sqlite3
+import logging
+from abc import ABCMeta
+from abc import abstractmethod
+
+from tmlib.readers import JsonReader
+from tmlib.readers import load_json
+from tmlib.writers import JsonWriter
+
+logger = logging.getLogger(__name__)
+
+
+class BatchStore(object):
+
+    '''Abstract base class for storing job descriptions of a workflow step.
+
+    Each :class:`RunJob <tmlib.workflow.jobs.RunJob>` is identified by a
+    one-based job ID. A step has at most one
+    :class:`CollectJob <tmlib.workflow.jobs.CollectJob>`.
+    '''
+
+    __metaclass__ = ABCMeta
+
+    def __init__(self, location, step_name):
+        '''
+        Parameters
+        ----------
+        location: str
+            absolute path to the directory where batches should be stored
+        step_name: str
+            name of the workflow step
+        '''
+        self.location = location
+        self.step_name = step_name
+
+    @abstractmethod
+    def exists(self):
+        '''Determines whether batches have been stored.
+
+        Returns
+        -------
+        bool
+        '''
+        pass
+
+    @abstractmethod
+    def store_run_batches(self, batches):
+        '''Persists descriptions for several
+        :class:`RunJob <tmlib.workflow.jobs.RunJob>` at once.
+
+        Parameters
+        ----------
+        batches: Iterable[Tuple[int, Dict[str, Union[int, str, list, dict]]]]
+            job ID and JSON serializable job description
+        '''
+        pass
+
+    def store_run_batch(self, batch, job_id):
+        '''Persists description for a
+        :class:`RunJob <tmlib.workflow.jobs.RunJob>`.
+
+        Parameters
+        ----------
+        batch: Dict[str, Union[int, str, list, dict]]
+            JSON serializable job description
+        job_id: int
+            job ID
+        '''
+        self.store_run_batches([(job_id, batch)])
+
+    @abstractmethod
+    def get_run_batch(self, job_id):
+        '''Gets description for a
+        :class:`RunJob <tmlib.workflow.jobs.RunJob>`.
+
+        Parameters
+        ----------
+        job_id: int
+            job ID
+
+        Returns
+        -------
+        Dict[str, Union[int, str, list, dict]]
+            job description
+
+        Raises
+        ------
+        OSError
+            when no description exists for `job_id`
+        '''
+        pass
+
+    @abstractmethod
+    def get_run_job_indices(self):
+        '''Gets the value of the ``"index"`` field of the description of
+        each :class:`RunJob <tmlib.workflow.jobs.RunJob>`.
+
+        Returns
+        -------
+        Dict[int, int]
+            mapping of job ID to index (``None`` for descriptions without
+            index)
+        '''
+        pass
+
+    def get_run_job_ids(self):
+        '''Gets IDs of all stored
+        :class:`RunJob <tmlib.workflow.jobs.RunJob>` descriptions.
+
+        Returns
+        -------
+        List[int]
+            job IDs
+        '''
+        return sorted(self.get_run_job_indices().keys())
+
+    @abstractmethod
+    def store_collect_batch(self, batch):
+        '''Persists description for a
+        :class:`CollectJob <tmlib.workflow.jobs.CollectJob>`.
+
+        Parameters
+        ----------
+        batch: Dict[str, Union[int, str, list, dict]]
+            JSON serializable job description
+        '''
+        pass
+
+    @abstractmethod
+    def get_collect_batch(self):
+        '''Gets description for a
+        :class:`CollectJob <tmlib.workflow.jobs.CollectJob>`.
+
+        Returns
+        -------
+        Dict[str, Union[int, str, list, dict]]
+            job description
+
+        Raises
+        ------
+        OSError
+            when no description exists
+        '''
+        pass
+
+    @abstractmethod
+    def store_metadata(self, metadata):
+        '''Persists metadata about the stored batches, such as the total
+        number of processed items.
+
+        Parameters
+        ----------
+        metadata: Dict[str, Union[int, str, list, dict]]
+            JSON serializable metadata
+        '''
+        pass
+
+    @abstractmethod
+    def get_metadata(self):
+        '''Gets metadata about the stored batches.
+
+        Returns
+        -------
+        Dict[str, Union[int, str, list, dict]]
+            metadata (empty if none was stored)
+        '''
+        pass
+
+    def get_journal(self, job_id):
+        '''Gets the journal of items completed by a
+        :class:`RunJob <tmlib.workflow.jobs.RunJob>`.
+
+        Parameters
+        ----------
+        job_id: int
+            job ID
+
+        Returns
+        -------
+        tmlib.workflow.batches.JobJournal
+        '''
+        return JobJournal(os.path.join(
+            self.location, '%s_run_%.7d.journal' % (self.step_name, job_id)
+        ))
+
+    def _raise_missing(self, what):
+        raise OSError(
+            'Job description does not exist: %s.\n'
+            'Initialize the step first by calling the "init" method.' % what
+        )
+
+
+class JobJournal(object):
+
+    '''Append-only record of the items of a batch that a job has completed.
+
+    A job commits an item once its output has been persisted. When the job
+    gets resubmitted, e.g. because it exceeded its walltime, items that have
+    already been committed can be skipped.
+
+    Note
+    ----
+    Each job writes its own journal file, such that no locking is required.
+    A job removes its journal once it completed successfully, such that
+    only interrupted executions are resumed. Journals are also removed
+    together with the batches upon initialization of the step.
+    '''
+
+    def __init__(self, filename):
+        '''
+        Parameters
+        ----------
+        filename: str
+            absolute path to the journal file
+        '''
+        self.filename = filename
+
+    @property
+    def exists(self):
+        '''bool: whether a previous execution of the job has started the
+        journal'''
+        return os.path.exists(self.filename)
+
+    def start(self):
+        '''Starts the journal for an execution of the job without removing
+        items committed by previous executions.
+        '''
+        with open(self.filename, 'a+') as f:
+            # Terminate a line that was truncated when a previous execution
+            # got killed, such that it doesn't corrupt the next item.
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != '\n':
+                    f.write('\n')
+
+    def get_items(self):
+        '''Gets the items that have been committed.
+
+        Returns
+        -------
+        Set[Union[int, str, tuple]]
+            committed items (lists are converted to tuples)
+        '''
+        items = set()
+        if not os.path.exists(self.filename):
+            return items
+        with open(self.filename) as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    # The last line may be truncated when the job was killed
+                    # while writing.
+                    logger.warning(
+                        'ignore corrupt line in journal: %s', self.filename
+                    )
+                    continue
+                if isinstance(item, list):
+                    item = tuple(item)
+                items.add(item)
+        return items
+
+    def remove(self):
+        '''Removes the journal once the job has completed successfully, such
+        that a later execution of the job processes all items again.
+        '''
+        if os.path.exists(self.filename):
+            logger.debug('remove journal: %s', self.filename)
+            os.remove(self.filename)
+
+    def commit(self, items):
+        '''Records items as completed.
+
+        Parameters
+        ----------
+        items: Iterable[Union[int, str, tuple]]
+            JSON serializable items
+
+        Warning
+        -------
+        Items must only be committed after their output has been persisted.
+        '''
+        with open(self.filename, 'a') as f:
+            for item in items:
+                f.write(json.dumps(item) + '\n')
+
+
+class JsonBatchStore(BatchStore):
+
+    '''Stores the description of each job in a separate JSON file.'''
+
+    def _build_run_filename(self, job_id):
+        return os.path.join(
+            self.location, '%s_run_%.7d.batch.json' % (self.step_name, job_id)
+        )
+
+    def _build_collect_filename(self):
+        return os.path.join(
+            self.location, '%s_collect.batch.json' % self.step_name
+        )
+
+    def exists(self):
+        return len(glob.glob(os.path.join(self.location, '*.batch.json'))) > 0
+
+    def store_run_batches(self, batches):
+        for job_id, batch in batches:
+            logger.debug('store batch for run job #%d', job_id)
+            with JsonWriter(self._build_run_filename(job_id)) as f:
+                f.write(batch)
+
+    def get_run_batch(self, job_id):
+        filename = self._build_run_filename(job_id)
+        if not os.path.exists(filename):
+            self._raise_missing(filename)
+        with JsonReader(filename) as f:
+            return f.read()
+
+    def get_run_job_ids(self):
+        filenames = glob.glob(
+            os.path.join(self.location, '*_run_*.batch.json')
+        )
+        return sorted([
+            int(re.search(r'_run_(\d+)\.batch.json', f).groups()[0])
+            for f in filenames
+        ])
+
+    def get_run_job_indices(self):
+        # The index is part of the description and each file has to be read.
+        return {
+            j: self.get_run_batch(j).get('index')
+            for j in self.get_run_job_ids()
+        }
+
+    def store_collect_batch(self, batch):
+        with JsonWriter(self._build_collect_filename()) as f:
+            f.write(batch)
+
+    def get_collect_batch(self):
+        filename = self._build_collect_filename()
+        if not os.path.exists(filename):
+            self._raise_missing(filename)
+        with JsonReader(filename) as f:
+            return f.read()
+
+    def store_metadata(self, metadata):
+        filename = os.path.join(
+            self.location, '%s_metadata.json' % self.step_name
+        )
+        with JsonWriter(filename) as f:
+            f.write(metadata)
+
+    def get_metadata(self):
+        filename = os.path.join(
+            self.location, '%s_metadata.json' % self.step_name
+        )
+        if not os.path.exists(filename):
+            return dict()
+        with JsonReader(filename) as f:
+            return f.read()
+
+
+class SqliteBatchStore(BatchStore):
+
+    '''Stores the descriptions of all jobs of a step in a single SQLite
+    database file with job descriptions indexed by job ID.
+
+    Note
+    ----
+    Descriptions are only written by the *init* phase of a step. Jobs only
+    read descriptions and may thus open the file concurrently.
+    '''
+
+    @property
+    def filename(self):
+        '''str: absolute path to the database file'''
+        return os.path.join(self.location, '%s.batches.sqlite' % self.step_name)
+
+    def _connect(self, writable=False):
+        connection = sqlite3.connect(self.filename, timeout=60)
+        if not writable:
+            # Jobs only read descriptions. The file is never modified by them
+            # and the schema is not checked for each read.
+            connection.execute('PRAGMA query_only = ON')
+            return connection
+        # The schema is only created by the init phase, which writes the
+        # descriptions. Tables of all descriptions are created together, such
+        # that readers can rely on their existence once the file exists.
+        connection.executescript('''
+            CREATE TABLE IF NOT EXISTS run_batches (
+                job_id INTEGER PRIMARY KEY,
+                job_index INTEGER,
+                description TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS collect_batch (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                description TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS metadata (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        ''')
+        return connection
+
+    def exists(self):
+        return os.path.exists(self.filename)
+
+    def store_run_batches(self, batches):
+        logger.debug('store batches for run jobs in file: %s', self.filename)
+        connection = self._connect(writable=True)
+        try:
+            with connection:
+                connection.executemany('''
+                    INSERT OR REPLACE INTO run_batches (
+                        job_id, job_index, description
+                    ) VALUES (?, ?, ?)
+                ''', (
+                    (job_id, batch.get('index'),
+                     json.dumps(batch, sort_keys=True))
+                    for job_id, batch in batches
+                ))
+        finally:
+            connection.close()
+
+    def _get_description(self, sql, params=()):
+        if not self.exists():
+            self._raise_missing(self.filename)
+        connection = self._connect()
+        try:
+            return connection.execute(sql, params).fetchone()
+        finally:
+            connection.close()
+
+    def get_run_batch(self, job_id):
+        record = self._get_description(
+            'SELECT description FROM run_batches WHERE job_id = ?', (job_id, )
+        )
+        if record is None:
+            self._raise_missing('run job #%d' % job_id)
+        return load_json(record[0])
+
+    def get_run_job_indices(self):
+        if not self.exists():
+            return dict()
+        connection = self._connect()
+        try:
+            records = connection.execute(
+                'SELECT job_id, job_index FROM run_batches'
+            ).fetchall()
+        finally:
+            connection.close()
+        return {job_id: index for job_id, index in records}
+
+    def store_collect_batch(self, batch):
+        connection = self._connect(writable=True)
+        try:
+            with connection:
+                connection.execute('''
+                    INSERT OR REPLACE INTO collect_batch (id, description)
+                    VALUES (1, ?)
+                ''', (json.dumps(batch, sort_keys=True), ))
+        finally:
+            connection.close()
+
+    def get_collect_batch(self):
+        record = self._get_description(
+            'SELECT description FROM collect_batch WHERE id = 1'
+        )
+        if record is None:
+            self._raise_missing('collect job')
+        return load_json(record[0])
+
+    def store_metadata(self, metadata):
+        connection = self._connect(writable=True)
+        try:
+            with connection:
+                connection.executemany('''
+                    INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)
+                ''', (
+                    (k, json.dumps(v)) for k, v in metadata.iteritems()
+                ))
+        finally:
+            connection.close()
+
+    def get_metadata(self):
+        if not self.exists():
+            return dict()
+        connection = self._connect()
+        try:
+            records = connection.execute(
+                'SELECT key, value FROM metadata'
+            ).fetchall()
+        finally:
+            connection.close()
+        return {str(k): load_json(v) for k, v in records}
+
+
+#: Dict[str, type]: batch store implementation for each backend
+BATCH_STORES = {
+    'sqlite': SqliteBatchStore,
+    'json': JsonBatchStore
+}
+
+
+def create_batch_store(location, step_name, backend='sqlite'):
+    '''Creates a batch store for a workflow step.
+
+    Parameters
+    ----------
+    location: str
+        absolute path to the directory where batches should be stored
+    step_name: str
+        name of the workflow step
+    backend: str, optional
+        storage backend (options: ``{"sqlite", "json"}``,
+        default: ``"sqlite"``)
+
+    Returns
+    -------
+    tmlib.workflow.batches.BatchStore
+
+    Note
+    ----
+    When batches have been stored in JSON files, e.g. by a previous version,
+    the JSON store is used independent of `backend`.
+    '''
+    if backend not in BATCH_STORES:
+        raise ValueError(
+            'Unknown batch store "%s". Options are: "%s"'
+            % (backend, '", "'.join(BATCH_STORES.keys()))
+        )
+    store = BATCH_STORES[backend](location, step_name)
+    if backend != 'json' and not store.exists():
+        fallback = JsonBatchStore(location, step_name)
+        if fallback.exists():
+            logger.debug('use JSON batch store')
+            return fallback
+    return store
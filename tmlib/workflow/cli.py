@@ -13,11 +13,9 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
-import os
 import sys
 import traceback
 import logging
-import shutil
 import datetime
 import yaml
 import inspect
@@ -41,8 +39,8 @@ from tmlib.workflow.args import Argument
 from tmlib.workflow.utils import create_gc3pie_sql_store
 from tmlib.workflow.utils import create_gc3pie_session
 from tmlib.workflow.utils import create_gc3pie_engine
+from tmlib.workflow.utils import notify_task_event
 from tmlib.workflow.submission import WorkflowSubmissionManager
-from tmlib.workflow.workflow import WorkflowStep
 from tmlib.workflow.jobs import IndependentJobCollection
 from tmlib.log import configure_logging
 from tmlib.log import map_logging_verbosity
@@ -244,6 +242,26 @@ class WorkflowStepCLI(WorkflowSubmissionManager):
         arguments = cls._parser.parse_args()
 
         configure_logging()
+        sys.exit(cls.execute(arguments))
+
+    @classmethod
+    def execute(cls, arguments):
+        '''Executes a parsed command line call in the current process.
+
+        Parameters
+        ----------
+        arguments: argparse.Namespace
+            command line arguments parsed by the parser of the class
+
+        Returns
+        -------
+        int
+            ``0`` when program completes successfully and ``1`` otherwise
+
+        Note
+        ----
+        Logging must have been configured beforehand.
+        '''
         logger = logging.getLogger('tmlib')
         level = map_logging_verbosity(arguments.verbosity)
         logger.setLevel(level)
@@ -282,14 +300,12 @@ class WorkflowStepCLI(WorkflowSubmissionManager):
             cli_instance = cls(api_instance, arguments.verbosity)
             cli_instance(arguments)
             logger.info('JOB COMPLETED')
-            sys.exit(0)
             return 0
         except Exception as error:
             sys.stderr.write('\nJOB FAILED:\n%s\n' % str(error))
             exc_type, exc_value, exc_traceback = sys.exc_info()
             for tb in traceback.format_tb(exc_traceback):
                 sys.stderr.write(tb)
-            sys.exit(1)
             return 1
 
     def __call__(self, cli_args):
@@ -339,7 +355,17 @@ class WorkflowStepCLI(WorkflowSubmissionManager):
             self._batch_args = self._batch_args_class(**vars(cli_args))
         elif cli_args.method == 'submit':
             self._submission_args = self._submission_args_class(**vars(cli_args))
-        method(**method_args)
+        try:
+            method(**method_args)
+        finally:
+            if cli_args.method in {'init', 'run', 'collect'}:
+                # Wake up processes that monitor the submission.
+                name = '%s_%s' % (
+                    self.api_instance.step_name, cli_args.method
+                )
+                if cli_args.method == 'run':
+                    name = '%s_%.7d' % (name, cli_args.job_id)
+                notify_task_event(self.api_instance.experiment_id, name)
 
     @classmethod
     def _print_logo(cls):
@@ -366,15 +392,12 @@ class WorkflowStepCLI(WorkflowSubmissionManager):
     def init(self):
         self._print_logo()
         api = self.api_instance
-        logger.debug('remove batches of previous submission')
-        shutil.rmtree(api.batches_location)
-        os.mkdir(api.batches_location)
+        api.clear_batches()
         logger.info('delete previous job output')
         api.delete_previous_job_output()
         logger.info('create batches for run jobs')
         batches = api.create_run_batches(self._batch_args)
-        for index, batch in enumerate(batches):
-            api.store_run_batch(batch, index+1)
+        api.store_run_batches(batches)
         if api.has_collect_phase:
             logger.info('create batch for collect job')
             batch = api.create_collect_batch(self._batch_args)
@@ -470,9 +493,16 @@ class WorkflowStepCLI(WorkflowSubmissionManager):
         monitoring_interval=Argument(
             type=int, help='seconds to wait between monitoring iterations',
             meta='SECONDS', default=10, flag='interval', short_flag='i'
+        ),
+        local=Argument(
+            type=bool, default=False,
+            help='''
+                execute jobs in a pool of worker processes on the local
+                machine instead of submitting them to the cluster
+            '''
         )
     )
-    def submit(self, monitoring_depth, monitoring_interval):
+    def submit(self, monitoring_depth, monitoring_interval, local=False):
         self._print_logo()
         submission_id, user_name = self.register_submission()
         api = self.api_instance
@@ -500,7 +530,7 @@ class WorkflowStepCLI(WorkflowSubmissionManager):
         store = create_gc3pie_sql_store()
         store.save(jobs)
         self.update_submission(jobs)
-        engine = create_gc3pie_engine(store)
+        engine = create_gc3pie_engine(store, local)
         logger.info('submit and monitor jobs')
         try:
             self.submit_jobs(
@@ -530,15 +560,22 @@ class WorkflowStepCLI(WorkflowSubmissionManager):
         monitoring_interval=Argument(
             type=int, help='seconds to wait between monitoring iterations',
             meta='SECONDS', default=10, flag='interval', short_flag='i'
+        ),
+        local=Argument(
+            type=bool, default=False,
+            help='''
+                execute jobs in a pool of worker processes on the local
+                machine instead of submitting them to the cluster
+            '''
         )
     )
-    def resubmit(self, monitoring_depth, monitoring_interval):
+    def resubmit(self, monitoring_depth, monitoring_interval, local=False):
         self._print_logo()
         api = self.api_instance
         store = create_gc3pie_sql_store()
         job_id = self.get_task_id_of_last_submission()
         jobs = store.load(job_id)
-        engine = create_gc3pie_engine(store)
+        engine = create_gc3pie_engine(store, local)
         logger.info('resubmit and monitor jobs')
         try:
             self.submit_jobs(
@@ -104,6 +104,23 @@ class IllumstatsCalculator(WorkflowStepAPI):
                     'channel_id': ch.id,
                 }
 
+    def get_run_batch_inputs(self, batch):
+        '''Gets the image files that a job calculates statistics for, such
+        that the job can be processed as soon as these files have been
+        extracted by :mod:`imextract <tmlib.workflow.imextract>`.
+
+        Parameters
+        ----------
+        batch: dict
+            job description
+
+        Returns
+        -------
+        List[int]
+            IDs of :class:`ChannelImageFile <tmlib.models.file.ChannelImageFile>`
+        '''
+        return [f[0] for f in batch['channel_image_files_ids']]
+
     def delete_previous_job_output(self):
         '''Deletes all :class:`tmlib.models.file.IllumstatsFile` instances
         of the processed experiment.
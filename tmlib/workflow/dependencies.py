@@ -49,11 +49,49 @@ class _WorkflowDependenciesMeta(ABCMeta):
                         attr_name, self.__name__, attr_type.__name__
                     )
                 )
-            # TODO: check intra_stage_dependencies inter_stage_dependencies
-            # based on __dependencies__
+            # TODO: check intra_stage_dependencies based on __dependencies__
+        self._check_stage_dependencies()
+        self._check_streaming_dependencies()
         _workflow_register[getattr(self, '__type__')] = self
 
 
+    def _check_stage_dependencies(self):
+        # Stages must be listed in topological order, which also ensures that
+        # the declared dependencies form a directed acyclic graph.
+        for index, name in enumerate(self.STAGES):
+            dependencies = self.INTER_STAGE_DEPENDENCIES.get(name, set())
+            for dep_name in dependencies:
+                if dep_name not in self.STAGES:
+                    raise ValueError(
+                        'Stage "%s" of class "%s" depends on unknown stage '
+                        '"%s".' % (name, self.__name__, dep_name)
+                    )
+                if self.STAGES.index(dep_name) >= index:
+                    raise ValueError(
+                        'Stage "%s" of class "%s" must be listed after stage '
+                        '"%s", which it depends on.'
+                        % (name, self.__name__, dep_name)
+                    )
+
+    def _check_streaming_dependencies(self):
+        # A step can only stream from the step that immediately precedes it.
+        step_names = list()
+        for stage_name in self.STAGES:
+            step_names.extend(self.STEPS_PER_STAGE.get(stage_name, []))
+        for name, upstream_name in self.STREAMING_DEPENDENCIES.iteritems():
+            if name not in step_names or upstream_name not in step_names:
+                raise ValueError(
+                    'Streaming dependency "%s" -> "%s" of class "%s" '
+                    'references an unknown step.'
+                    % (upstream_name, name, self.__name__)
+                )
+            if step_names.index(name) != step_names.index(upstream_name) + 1:
+                raise ValueError(
+                    'Step "%s" of class "%s" can only stream from the step '
+                    'that precedes it.' % (name, self.__name__)
+                )
+
+
 class WorkflowDependencies(object):
 
     '''Abstract base class for declartion of workflow dependencies.
@@ -70,16 +108,35 @@ class WorkflowDependencies(object):
         * ``STEPS_PER_STAGE`` (dict): ordered mapping of
           stage name to corresponding step names
         * ``INTER_STAGE_DEPENDENCIES`` (dict): mapping of stage name to names
-          of other stages the referenced stage depends on
+          of other stages the referenced stage depends on, which must be
+          listed before the stage in ``STAGES``
         * ``INTRA_STAGE_DEPENDENCIES`` (dict): mapping of step name to names
           of other steps the referenced step depends on
 
+    Optionally, derived classes can implement the following attributes:
+
+        * ``STREAMING_DEPENDENCIES`` (dict): mapping of step name to the name
+          of the preceding step whose *run* jobs the referenced step can
+          stream from
+
+    Stage dependencies form a directed acyclic graph: a stage gets submitted
+    as soon as all stages it depends on are done, such that stages that don't
+    depend on each other are processed concurrently.
+
+    A step that streams from the preceding step gets submitted as soon as the
+    jobs of the preceding step have been created and each of its *run* jobs
+    gets released as soon as the jobs of the preceding step that produce the
+    required items are done (see
+    :meth:`get_run_job_dependencies <tmlib.workflow.api.WorkflowStepAPI.get_run_job_dependencies>`).
     '''
 
     __metaclass__ = _WorkflowDependenciesMeta
 
     __abstract__ = True
 
+    #: Dict[str, str]: step that each step can stream from
+    STREAMING_DEPENDENCIES = {}
+
 
 class CanonicalWorkflowDependencies(WorkflowDependencies):
 
@@ -115,6 +172,8 @@ class CanonicalWorkflowDependencies(WorkflowDependencies):
     }
 
     #: collections.OrderedDict[str, Set[str]]: dependencies between workflow stages
+    #: (stages "pyramid_creation" and "image_analysis" are independent of each
+    #: other and thus processed concurrently)
     INTER_STAGE_DEPENDENCIES = {
         'image_conversion': {
 
@@ -143,6 +202,13 @@ class CanonicalWorkflowDependencies(WorkflowDependencies):
         }
     }
 
+    #: Dict[str, str]: step whose *run* jobs each step can stream from
+    #: (:mod:`corilla <tmlib.workflow.corilla>` doesn't stream from
+    #: :mod:`imextract <tmlib.workflow.imextract>`, because statistics are
+    #: calculated per channel over all cycles, plates and time points, such
+    #: that each job depends on almost all jobs of the preceding step)
+    STREAMING_DEPENDENCIES = {}
+
 
 class MultiplexingWorkflowDependencies(CanonicalWorkflowDependencies):
 
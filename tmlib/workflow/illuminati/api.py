@@ -184,7 +184,9 @@ class PyramidBuilder(WorkflowStepAPI):
                         if level == max_zoomlevel_index:
                             # For the base level, batches are composed of
                             # image files, which will get chopped into tiles.
-                            batch_size = args.batch_size
+                            batch_size = self.resolve_batch_size(
+                                args.batch_size, len(image_file_ids)
+                            )
                             batches = self._create_batches(
                                 image_file_ids, batch_size
                             )
@@ -310,10 +312,8 @@ class PyramidBuilder(WorkflowStepAPI):
         logger.debug('allocated cores for "run" jobs: %d', cores)
 
         multi_run_jobs = collections.defaultdict(list)
-        job_ids = self.get_run_job_ids()
-        for j in job_ids:
-            batch = self.get_run_batch(j)
-            multi_run_jobs[batch['index']].append(j)
+        for j, index in sorted(self.get_run_job_indices().iteritems()):
+            multi_run_jobs[index].append(j)
 
         for index, job_ids in multi_run_jobs.iteritems():
             subjob_collection = SingleRunPhase(
@@ -355,6 +355,9 @@ class PyramidBuilder(WorkflowStepAPI):
 
     def _create_maxzoom_level_tiles(self, batch, assume_clean_state):
         exp_id = self.experiment_id
+        journal = self.get_run_journal(batch['id'])
+        completed_file_ids = journal.get_items()
+        journal.start()
         with tm.utils.ExperimentSession(exp_id, transaction=False) as session:
             layer = session.query(tm.ChannelLayer).get(batch['layer_id'])
             logger.info(
@@ -389,6 +392,11 @@ class PyramidBuilder(WorkflowStepAPI):
             clip_max = layer.max_intensity
 
             for fid in batch['image_file_ids']:
+                if fid in completed_file_ids:
+                    logger.info(
+                        'skip image %d, which was already processed', fid
+                    )
+                    continue
                 file = session.query(tm.ChannelImageFile).get(fid)
                 logger.info('process image %d', file.id)
                 tiles = layer.map_image_to_base_tiles(file)
@@ -499,9 +507,15 @@ class PyramidBuilder(WorkflowStepAPI):
                     )
                     session.add(channel_layer_tile)
 
+                # Tiles must be persisted before the image is committed.
+                session.flush()
+                journal.commit([fid])
 
     def _create_lower_zoom_level_tiles(self, batch, assume_clean_state):
         exp_id = self.experiment_id
+        journal = self.get_run_journal(batch['id'])
+        completed_coordinates = journal.get_items()
+        journal.start()
         with tm.utils.ExperimentSession(exp_id, transaction=False) as session:
             layer = session.query(tm.ChannelLayer).get(batch['layer_id'])
             logger.info('processing layer for channel %s', layer.channel.name)
@@ -510,9 +524,16 @@ class PyramidBuilder(WorkflowStepAPI):
             layer_id = layer.id
             zoom_factor = layer.zoom_factor
 
+            # Tiles are persisted in chunks before they are committed.
+            pending_coordinates = list()
             for coordinates in batch['coordinates']:
                 row = coordinates[0]
                 column = coordinates[1]
+                if (row, column) in completed_coordinates:
+                    logger.debug(
+                        'skip tile: z=%d, y=%d, x=%d', level, row, column
+                    )
+                    continue
                 pre_coordinates = layer.calc_coordinates_of_next_higher_level(
                     level, row, column
                 )
@@ -571,6 +592,13 @@ class PyramidBuilder(WorkflowStepAPI):
                     z=level, y=row, x=column, pixels=tile
                 )
                 session.add(channel_layer_tile)
+                pending_coordinates.append((row, column))
+                if len(pending_coordinates) == 100:
+                    session.flush()
+                    journal.commit(pending_coordinates)
+                    pending_coordinates = list()
+            session.flush()
+            journal.commit(pending_coordinates)
 
     def run_job(self, batch, assume_clean_state=False):
         '''Creates 8-bit grayscale JPEG layer tiles.
@@ -586,6 +614,7 @@ class PyramidBuilder(WorkflowStepAPI):
             self._create_maxzoom_level_tiles(batch, assume_clean_state)
         else:
             self._create_lower_zoom_level_tiles(batch, assume_clean_state)
+        self.get_run_journal(batch['id']).remove()
 
     def collect_job_output(self, batch):
         '''Creates :class:`MapobjectType <tmlib.models.mapobject.MapobjectType>`
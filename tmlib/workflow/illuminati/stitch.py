@@ -15,7 +15,6 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import logging
 import numpy as np
-from sklearn.cluster import KMeans
 import itertools
 
 from tmlib.errors import MetadataError
@@ -254,6 +253,7 @@ def calc_grid_coordinates_from_positions(stage_positions, n,
     List[Tuple[int]]
         relative positions (zero-based coordinates) within the grid
     '''
+    from sklearn.cluster import KMeans
     # Calculate the spread along each dimension to determine the major stitch
     # axis.
     coordinates = np.array(stage_positions)
@@ -66,10 +66,28 @@ class ImageExtractor(WorkflowStepAPI):
         with tm.utils.ExperimentSession(self.experiment_id) as session:
             channel_image_files = session.query(tm.ChannelImageFile.id).all()
             file_ids = [f.id for f in channel_image_files]
-            batches = self._create_batches(file_ids, args.batch_size)
+            batch_size = self.resolve_batch_size(
+                args.batch_size, len(file_ids)
+            )
+            batches = self._create_batches(file_ids, batch_size)
             for i, file_ids in enumerate(batches):
                 yield {'id': i+1, 'channel_image_file_ids': file_ids}
 
+    def get_run_batch_outputs(self, batch):
+        '''Gets the image files that a job extracts.
+
+        Parameters
+        ----------
+        batch: dict
+            job description
+
+        Returns
+        -------
+        List[int]
+            IDs of :class:`ChannelImageFile <tmlib.models.file.ChannelImageFile>`
+        '''
+        return batch['channel_image_file_ids']
+
     def create_collect_batch(self, args):
         '''Creates a job description for the *collect* phase.
 
@@ -112,12 +130,21 @@ class ImageExtractor(WorkflowStepAPI):
                 Reader = ImageReader
                 subset = False
 
+        journal = self.get_run_journal(batch['id'])
+        completed_file_ids = journal.get_items()
+        journal.start()
         with JavaBridge(active=subset):
             with tm.utils.ExperimentSession(self.experiment_id) as session:
                 acquisition_lut = {
                     a.id: a for a in session.query(tm.Acquisition).all()
                 }
                 for i, fid in enumerate(batch['channel_image_file_ids']):
+                    if fid in completed_file_ids:
+                        logger.info(
+                            'skip channel image file #%d, which was already '
+                            'extracted', fid
+                        )
+                        continue
                     logger.info(
                         'extract pixels for channel image file #%d', fid
                     )
@@ -155,6 +182,8 @@ class ImageExtractor(WorkflowStepAPI):
                     img = ChannelImage(pixel_array)
                     logger.info('write pixels to file on disk')
                     image_file.put(img)
+                    journal.commit([fid])
+        journal.remove()
 
     def delete_previous_job_output(self):
         '''Deletes all instances of class
@@ -24,8 +24,12 @@ from tmlib.workflow import register_step_submission_args
 class ImextractBatchArguments(BatchArguments):
 
     batch_size = Argument(
-        type=int, default=100, flag='batch-size', short_flag='b',
-        help='number of image acquisition sites to process per job',
+        type=int, default=100, flag='batch-size', short_flag='b', auto=True,
+        help='''
+            number of image acquisition sites to process per job
+            ("auto" determines the number from runtimes of the previous
+            submission)
+        '''
     )
 
     delete = Argument(
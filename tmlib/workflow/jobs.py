@@ -16,12 +16,14 @@
 import logging
 from abc import ABCMeta
 from abc import abstractproperty
+import gc3libs
 # from gc3libs.workflow import RetryableTask
 from gc3libs.workflow import (
     AbortOnError, SequentialTaskCollection, ParallelTaskCollection
 )
 from gc3libs.persistence.sql import IdFactory, IntId
 
+import tmlib.models
 from tmlib.jobs import Job
 
 logger = logging.getLogger(__name__)
@@ -403,6 +405,8 @@ class SingleRunPhase(ParallelTaskCollection, RunPhase):
         self.parent_id = parent_id
         self.persistent_id = _idfactory.new(self)
         self.submission_id = submission_id
+        self.upstream_step_name = None
+        self.dependencies = dict()
         super(self.__class__, self).__init__(jobname=self.name, tasks=jobs)
 
     def add(self, job):
@@ -425,6 +429,86 @@ class SingleRunPhase(ParallelTaskCollection, RunPhase):
             )
         super(self.__class__, self).add(job)
 
+    def set_dependencies(self, upstream_step_name, dependencies):
+        '''Holds back jobs until the jobs of the *run* phase of the preceding
+        step they depend on have terminated successfully.
+
+        Parameters
+        ----------
+        upstream_step_name: str
+            name of the preceding step
+        dependencies: Dict[int, Set[int]]
+            mapping of job ID to IDs of jobs of the preceding step
+
+        See also
+        --------
+        :meth:`tmlib.workflow.api.WorkflowStepAPI.get_run_job_dependencies`
+        '''
+        self.upstream_step_name = upstream_step_name
+        self.dependencies = {
+            job_id: set(upstream_job_ids)
+            for job_id, upstream_job_ids in dependencies.iteritems()
+            if upstream_job_ids
+        }
+        logger.info(
+            'hold back %d of %d jobs of step "%s" until jobs of step "%s" '
+            'are done', len(self.dependencies), len(self.tasks),
+            self.step_name, upstream_step_name
+        )
+
+    def _release_jobs(self, resubmit=False, targets=None, **extra_args):
+        held_jobs = [j for j in self.tasks if j.job_id in self.dependencies]
+        if not held_jobs:
+            return
+        upstream_job_ids = set()
+        for job in held_jobs:
+            upstream_job_ids.update(self.dependencies[job.job_id])
+        names = {
+            '%s_run_%.7d' % (self.upstream_step_name, j): j
+            for j in upstream_job_ids
+        }
+        # The state of the upstream jobs is queried from the database rather
+        # than looked up in the task tree, such that it's also available when
+        # the workflow has been reloaded from the store.
+        with tmlib.models.utils.MainSession() as session:
+            Task = tmlib.models.Task
+            tasks = session.query(Task.name).\
+                filter(
+                    Task.submission_id == self.submission_id,
+                    Task.name.in_(names.keys()),
+                    Task.state == gc3libs.Run.State.TERMINATED,
+                    Task.exitcode == 0
+                ).\
+                all()
+        done = {names[t.name] for t in tasks}
+        for job in held_jobs:
+            self.dependencies[job.job_id] -= done
+            if not self.dependencies[job.job_id]:
+                logger.debug('release job "%s"', job.name)
+                del self.dependencies[job.job_id]
+                job.submit(resubmit, targets, **extra_args)
+
+    def submit(self, resubmit=False, targets=None, **extra_args):
+        '''Submits all jobs that don't wait for jobs of the preceding step.'''
+        for job in self.tasks:
+            if job.job_id not in self.dependencies:
+                job.submit(resubmit, targets, **extra_args)
+        self._release_jobs(resubmit, targets, **extra_args)
+        self.execution.state = self._state()
+
+    def update_state(self, **extra_args):
+        '''Submits jobs whose dependencies are done and updates the state of
+        all jobs.
+        '''
+        if self.dependencies:
+            self._release_jobs()
+        return super(SingleRunPhase, self).update_state(**extra_args)
+
+    def kill(self, **extra_args):
+        '''Kills all jobs, including those that are still held back.'''
+        self.dependencies = dict()
+        super(SingleRunPhase, self).kill(**extra_args)
+
     def __repr__(self):
         return (
             '<%s(name=%r, n=%r, submission_id=%r)>'
@@ -17,15 +17,19 @@ import os
 import re
 import sys
 import shutil
+import time
+import copy
 import logging
 import subprocess
+import multiprocessing
 import numpy as np
 import pandas as pd
 import collections
 import shapely.geometry
 import shapely.ops
+from Queue import Queue
+from threading import Thread
 from cached_property import cached_property
-from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import FLOAT
 from psycopg2 import ProgrammingError
@@ -45,6 +49,7 @@ from tmlib.errors import JobDescriptionError
 from tmlib.workflow.jterator.project import Project
 from tmlib.workflow.jterator.module import ImageAnalysisModule
 from tmlib.workflow.jterator.handles import SegmentedObjects
+from tmlib.workflow.jterator.context import BatchContext
 from tmlib.workflow.jobs import SingleRunPhase
 from tmlib.workflow.jterator.jobs import DebugRunJob
 from tmlib.workflow import register_step_api
@@ -52,6 +57,20 @@ from tmlib import cfg
 
 logger = logging.getLogger(__name__)
 
+#: dict: state of the pipeline engine that is inherited by forked worker
+#: processes
+_worker_state = dict()
+
+
+def _process_site(site_id):
+    # Executed in a forked worker process.
+    engine = _worker_state['engine']
+    engine._module_times = collections.defaultdict(list)
+    store = engine._load_pipeline_input(site_id, _worker_state['context'])
+    store = engine._run_pipeline(store, site_id, _worker_state['plot'])
+    output = {'site_id': site_id, 'objects': store['objects']}
+    return (output, dict(engine._module_times))
+
 
 @register_step_api('jterator')
 class ImageAnalysisPipelineEngine(WorkflowStepAPI):
@@ -78,6 +97,9 @@ class ImageAnalysisPipelineEngine(WorkflowStepAPI):
         '''
         super(ImageAnalysisPipelineEngine, self).__init__(experiment_id)
         self._engines = {'Python': None, 'R': None}
+        self._code_cache = dict()
+        self._module_times = collections.defaultdict(list)
+        self._ids = collections.defaultdict(dict)
         self.project = Project(
             location=self.step_location,
             pipeline_description=pipeline_description,
@@ -122,7 +144,8 @@ class ImageAnalysisPipelineEngine(WorkflowStepAPI):
             name = self.project.handles[i].name
             handles = self.project.handles[i].description
             module = ImageAnalysisModule(
-                name=name, source_file=source_file, handles=handles
+                name=name, source_file=source_file, handles=handles,
+                code_cache=self._code_cache
             )
             pipeline.append(module)
         return pipeline
@@ -137,13 +160,17 @@ class ImageAnalysisPipelineEngine(WorkflowStepAPI):
         For Matlab, you need to set the MATLABPATH environment variable
         in order to add module dependencies to the Matlab path.
 
+        Engines that are already running are reused, such that modules
+        are evaluated in a warm interpreter when the same instance processes
+        multiple batches.
+
         Warning
         -------
         Matlab will be started with the ``"-nojvm"`` option.
         '''
         # TODO: JVM for java code
         languages = [m.language for m in self.pipeline]
-        if 'Matlab' in languages:
+        if 'Matlab' in languages and self._engines.get('Matlab') is None:
             logger.info('start Matlab engine')
             try:
                 import matlab_wrapper as matlab
@@ -199,6 +226,14 @@ class ImageAnalysisPipelineEngine(WorkflowStepAPI):
             raise JobDescriptionError(
                 'Batch size must be 1 when plotting is active.'
             )
+        # Objects are only represented by the geometry that is required
+        # downstream, since tracing contours of objects is expensive.
+        representations = self._get_object_representations()
+        for name, representation in representations.iteritems():
+            logger.info(
+                'objects of type "%s" are represented as %s',
+                name, representation
+            )
 
         with tm.utils.ExperimentSession(self.experiment_id) as session:
             # Distribute sites randomly. Thereby we achieve a certain level
@@ -206,7 +241,10 @@ class ImageAnalysisPipelineEngine(WorkflowStepAPI):
             # for example.
             sites = session.query(tm.Site.id).order_by(func.random()).all()
             site_ids = [s.id for s in sites]
-            batches = self._create_batches(site_ids, args.batch_size)
+            batch_size = self.resolve_batch_size(
+                args.batch_size, len(site_ids)
+            )
+            batches = self._create_batches(site_ids, batch_size)
             for j, batch in enumerate(batches):
                 image_file_locations = session.query(
                         tm.ChannelImageFile._location
@@ -218,7 +256,9 @@ class ImageAnalysisPipelineEngine(WorkflowStepAPI):
                 yield {
                     'id': j + 1,  # job IDs are one-based!
                     'site_ids': batch,
-                    'plot': args.plot
+                    'plot': args.plot,
+                    'processes': args.processes,
+                    'representations': representations
                 }
 
     def delete_previous_job_output(self):
@@ -238,7 +278,14 @@ class ImageAnalysisPipelineEngine(WorkflowStepAPI):
                 filter(tm.Mapobject.mapobject_type_id.in_(mapobject_type_ids)).\
                 delete()
 
-    def _load_pipeline_input(self, site_id):
+    def _load_batch_context(self, site_ids):
+        channel_input = self.project.pipe.description.input.channels
+        objects_input = self.project.pipe.description.input.objects
+        return BatchContext(
+            self.experiment_id, site_ids, channel_input, objects_input
+        )
+
+    def _load_pipeline_input(self, site_id, context=None):
         logger.info('load pipeline inputs')
         # Use an in-memory store for pipeline data and only insert outputs
         # into the database once the whole pipeline has completed successfully.
@@ -249,6 +296,8 @@ class ImageAnalysisPipelineEngine(WorkflowStepAPI):
             'objects': dict(),
             'channels': list()
         }
+        if context is None:
+            context = self._load_batch_context([site_id])
 
         # Load the images, correct them if requested and align them if required.
         # NOTE: When the experiment was acquired in "multiplexing" mode,
@@ -256,91 +305,47 @@ class ImageAnalysisPipelineEngine(WorkflowStepAPI):
         # desired behavior.
         channel_input = self.project.pipe.description.input.channels
         objects_input = self.project.pipe.description.input.objects
-        with tm.utils.ExperimentSession(self.experiment_id) as session:
-            site = session.query(tm.Site).get(site_id)
-
-            records = session.query(tm.ChannelImageFile.tpoint).\
-                filter_by(site_id=site.id).\
-                distinct()
-            tpoints = [r.tpoint for r in records]
-            n_tpoints = len(tpoints)
-            records = session.query(tm.ChannelImageFile.zplane).\
-                filter_by(site_id=site.id).\
-                distinct()
-            zplanes = [r.zplane for r in records]
-            n_zplanes = len(zplanes)
-
-            y_offset, x_offset = site.aligned_offset
-            height = site.aligned_height
-            width = site.aligned_width
-
-            for ch in channel_input:
-                channel = session.query(
-                        tm.Channel.bit_depth, tm.Channel.id
-                    ).\
-                    filter_by(name=ch.name).\
-                    one()
-                if channel.bit_depth == 16:
-                    dtype = np.uint16
-                elif channel.bit_depth == 8:
-                    dtype = np.uint8
-                image_array = np.zeros(
-                    (height, width, n_zplanes, n_tpoints), dtype
-                )
+        site = context.sites[site_id]
+        n_tpoints = len(site.tpoints)
+        n_zplanes = len(site.zplanes)
+        for ch in channel_input:
+            image_array = np.zeros(
+                (site.height, site.width, n_zplanes, n_tpoints),
+                context.dtypes[ch.name]
+            )
+            if ch.correct:
+                stats = context.illumstats[ch.name]
+            else:
+                stats = None
+
+            logger.info('load images for channel "%s"', ch.name)
+            for img in context.get_images(site_id, ch.name):
+                md = img.metadata
                 if ch.correct:
-                    logger.info(
-                        'load illumination statistics for channel "%s"', ch.name
-                    )
-                    try:
-                        stats_file = session.query(tm.IllumstatsFile).\
-                            join(tm.Channel).\
-                            filter(tm.Channel.name == ch.name).\
-                            one()
-                    except NoResultFound:
-                        raise PipelineDescriptionError(
-                            'No illumination statistics file found for '
-                            'channel "%s"' % ch.name
-                        )
-                    stats = stats_file.get()
-                else:
-                    stats = None
+                    logger.info('correct image')
+                    img = img.correct(stats)
+                logger.debug('align image')
+                img = img.align()  # shifted and cropped!
+                image_array[:, :, md.zplane, md.tpoint] = img.array
+            store['pipe'][ch.name] = image_array
 
-                logger.info('load images for channel "%s"', ch.name)
-                image_files = session.query(tm.ChannelImageFile).\
-                    filter_by(site_id=site.id, channel_id=channel.id).\
-                    all()
-                for f in image_files:
-                    logger.info('load image %d', f.id)
-                    img = f.get()
-                    if ch.correct:
-                        logger.info('correct image %d', f.id)
-                        img = img.correct(stats)
-                    logger.debug('align image %d', f.id)
-                    img = img.align()  # shifted and cropped!
-                    image_array[:, :, f.zplane, f.tpoint] = img.array
-                store['pipe'][ch.name] = image_array
-
-            for obj in objects_input:
-                mapobject_type = session.query(tm.MapobjectType).\
-                    filter_by(name=obj.name).\
-                    one()
-                polygons = list()
-                for t in sorted(tpoints):
-                    zpolys = list()
-                    for z in sorted(zplanes):
-                        zpolys.append(
-                            mapobject_type.get_segmentations_per_site(
-                                site_id=site.id, tpoint=t, zplane=z
-                            )
-                        )
-                    polygons.append(zpolys)
+        for obj in objects_input:
+            polygons = list()
+            for t in site.tpoints:
+                zpolys = list()
+                for z in site.zplanes:
+                    zpolys.append(
+                        context.get_segmentations(site_id, obj.name, t, z)
+                    )
+                polygons.append(zpolys)
 
-                segm_obj = SegmentedObjects(obj.name, obj.name)
-                segm_obj.add_polygons(
-                    polygons, y_offset, x_offset, (height, width)
-                )
-                store['objects'][segm_obj.name] = segm_obj
-                store['pipe'][segm_obj.name] = segm_obj.value
+            segm_obj = SegmentedObjects(obj.name, obj.name)
+            segm_obj.add_polygons(
+                polygons, site.y_offset, site.x_offset,
+                (site.height, site.width)
+            )
+            store['objects'][segm_obj.name] = segm_obj
+            store['pipe'][segm_obj.name] = segm_obj.value
 
         # Remove single-dimensions from image arrays.
         # NOTE: It would be more consistent to preserve shape, but most people
@@ -358,7 +363,9 @@ class ImageAnalysisPipelineEngine(WorkflowStepAPI):
             # When plotting is not deriberately activated it defaults to
             # headless mode
             module.update_handles(store, headless=not plot)
+            start = time.time()
             module.run(self._engines[module.language])
+            self._module_times[module.name].append(time.time() - start)
             store = module.update_store(store)
 
             plotting_active = [
@@ -377,6 +384,21 @@ class ImageAnalysisPipelineEngine(WorkflowStepAPI):
 
         return store
 
+    @property
+    def module_statistics(self):
+        '''pandas.DataFrame: number of calls as well as total, mean and
+        maximal execution time in seconds for each module of the pipeline
+        that has been run by this instance
+        '''
+        stats = pd.DataFrame(
+            [
+                (name, len(t), np.sum(t), np.mean(t), np.max(t))
+                for name, t in self._module_times.iteritems()
+            ],
+            columns=['module', 'calls', 'total', 'mean', 'max']
+        )
+        return stats.set_index('module')
+
     def _build_debug_run_command(self, site_id, verbosity):
         logger.debug('build "debug" command')
         command = [self.step_name]
@@ -385,188 +407,297 @@ class ImageAnalysisPipelineEngine(WorkflowStepAPI):
         command.extend(['debug', '--site', str(site_id), '--plot'])
         return command
 
-    def _save_pipeline_outputs(self, store, assume_clean_state):
-        logger.info('save pipeline outputs')
-        objects_output = self.project.pipe.description.output.objects
-        for item in objects_output:
-            as_polygons = item.as_polygons
-            store['objects'][item.name].save = True
-            store['objects'][item.name].represent_as_polygons = as_polygons
+    def _get_object_representations(self):
+        return {
+            item.name: item.representation
+            for item in self.project.pipe.description.output.objects
+        }
+
+    def _get_or_create_ids(self, session, model, key, rows):
+        # IDs are cached for the lifetime of the instance, such that
+        # only the first site of a batch has to query the database.
+        cache = self._ids[model.__name__]
+        if isinstance(key, basestring):
+            get_key = lambda r: r[key]
+        else:
+            get_key = lambda r: tuple(r[k] for k in key)
+        missing = collections.OrderedDict()
+        for r in rows:
+            k = get_key(r)
+            if k not in cache and k not in missing:
+                missing[k] = r
+        missing = missing.values()
+        if missing:
+            ids = session.get_or_create_many(model, missing)
+            for r, i in zip(missing, ids):
+                cache[get_key(r)] = i
+        return {get_key(r): cache[get_key(r)] for r in rows}
+
+    def _save_pipeline_outputs(self, stores, assume_clean_state,
+            representations=None, journal=None):
+        if isinstance(stores, dict):
+            stores = [stores]
+        logger.info('save pipeline outputs of %d sites', len(stores))
+        if representations is None:
+            representations = self._get_object_representations()
+        for store in stores:
+            for name, representation in representations.iteritems():
+                store['objects'][name].save = True
+                store['objects'][name].representation = representation
 
         with tm.utils.ExperimentSession(self.experiment_id, False) as session:
-            layer = session.query(tm.ChannelLayer).first()
-            mapobject_type_ids = dict()
-            segmentation_layer_ids = dict()
-            objects_to_save = dict()
+            object_names = set()
+            for store in stores:
+                for obj_name, segm_objs in store['objects'].iteritems():
+                    if segm_objs.save:
+                        object_names.add(obj_name)
+            object_names = sorted(object_names)
+            for obj_name in object_names:
+                logger.info('objects of type "%s" are saved', obj_name)
+
+            logger.debug('add object types')
+            mapobject_type_ids = self._get_or_create_ids(
+                session, tm.MapobjectType, 'name', [
+                    {
+                        'experiment_id': self.experiment_id,
+                        'name': obj_name, 'ref_type': tm.Site.__name__
+                    }
+                    for obj_name in object_names
+                ]
+            )
+            mapobject_type_names = {
+                v: k for k, v in mapobject_type_ids.iteritems()
+            }
+            # Create a feature values entry for each segmented object at
+            # each time point.
+            logger.info('add features')
             feature_ids = collections.defaultdict(dict)
-            for obj_name, segm_objs in store['objects'].iteritems():
-                if segm_objs.save:
-                    logger.info('objects of type "%s" are saved', obj_name)
-                    objects_to_save[obj_name] = segm_objs
-                else:
-                    logger.info('objects of type "%s" are not saved', obj_name)
-                    continue
-                logger.debug('add object type "%s"', obj_name)
-                mapobject_type = session.get_or_create(
-                    tm.MapobjectType, experiment_id=self.experiment_id,
-                    name=obj_name, ref_type=tm.Site.__name__
-                )
-                mapobject_type_ids[obj_name] = mapobject_type.id
-                # Create a feature values entry for each segmented object at
-                # each time point.
-                logger.info('add features for objects of type "%s"', obj_name)
-                for feature_name in segm_objs.measurements[0].columns:
-                    logger.debug('add feature "%s"', feature_name)
-                    feature = session.get_or_create(
-                        tm.Feature, name=feature_name,
-                        mapobject_type_id=mapobject_type_ids[obj_name],
-                        is_aggregate=False
-                    )
-                    feature_ids[obj_name][feature_name] = feature.id
+            ids = self._get_or_create_ids(
+                session, tm.Feature, ('mapobject_type_id', 'name'), [
+                    {
+                        'name': feature_name,
+                        'mapobject_type_id': mapobject_type_ids[obj_name],
+                        'is_aggregate': False
+                    }
+                    for store in stores
+                    for obj_name in object_names
+                    for feature_name in
+                        store['objects'][obj_name].measurements[0].columns
+                ]
+            )
+            for (mapobject_type_id, feature_name), i in ids.iteritems():
+                obj_name = mapobject_type_names[mapobject_type_id]
+                feature_ids[obj_name][feature_name] = i
 
-                for (t, z), plane in segm_objs.iter_planes():
-                    segmentation_layer = session.get_or_create(
-                        tm.SegmentationLayer,
-                        mapobject_type_id=mapobject_type.id,
-                        tpoint=t, zplane=z
-                    )
+            logger.info('add segmentation layers')
+            ids = self._get_or_create_ids(
+                session, tm.SegmentationLayer,
+                ('mapobject_type_id', 'tpoint', 'zplane'), [
+                    {
+                        'mapobject_type_id': mapobject_type_ids[name],
+                        'tpoint': t, 'zplane': z
+                    }
+                    for store in stores
+                    for name in object_names
+                    if store['objects'][name].representation != 'features'
+                    for (t, z), plane in store['objects'][name].iter_planes()
+                ]
+            )
+            segmentation_layer_ids = {
+                (mapobject_type_names[k[0]], k[1], k[2]): i
+                for k, i in ids.iteritems()
+            }
 
-                    segmentation_layer_ids[(obj_name, t, z)] = \
-                        segmentation_layer.id
-
-            site = session.query(tm.Site).get(store['site_id'])
-            y_offset, x_offset = site.aligned_offset
-
-            mapobject_ids = dict()
-            for obj_name, segm_objs in objects_to_save.iteritems():
-                if not assume_clean_state:
-                    # Delete existing mapobjects for this site, which were
-                    # generated in a previous run of the same pipeline. In case
-                    # they were passed as inputs don't delete them.
-                    inputs = self.project.pipe.description.input.objects
-                    if obj_name not in inputs:
-                        logger.info(
-                            'delete segmentations for existing mapobjects of '
-                            'type "%s"', obj_name
+            # Create a mapobject for each segmented object, i.e. each
+            # pixel component having a unique label. Objects of all sites
+            # are inserted at once.
+            mapobjects = list()
+            for store in stores:
+                for obj_name in object_names:
+                    if not assume_clean_state:
+                        # Delete existing mapobjects for this site, which were
+                        # generated in a previous run of the same pipeline.
+                        # In case they were passed as inputs don't delete them.
+                        inputs = self.project.pipe.description.input.objects
+                        if obj_name not in inputs:
+                            logger.info(
+                                'delete segmentations for existing mapobjects '
+                                'of type "%s"', obj_name
+                            )
+                            session.query(tm.Mapobject).\
+                                filter_by(
+                                    mapobject_type_id=mapobject_type_ids[
+                                        obj_name
+                                    ],
+                                    partition_key=store['site_id']
+                                ).\
+                                delete()
+                    logger.info('add objects of type "%s"', obj_name)
+                    mapobjects.extend([
+                        tm.Mapobject(
+                            partition_key=store['site_id'],
+                            mapobject_type_id=mapobject_type_ids[obj_name]
                         )
-                        session.query(tm.Mapobject).\
-                            filter_by(
-                                mapobject_type_id=mapobject_type_ids[obj_name],
-                                partition_key=store['site_id']
-                            ).\
-                            delete()
-
-                # Create a mapobject for each segmented object, i.e. each
-                # pixel component having a unique label.
-                logger.info('add objects of type "%s"', obj_name)
-                # TODO: Can we avoid these multiple loops?
-                # Is the bottleneck inserting objects into the db or Python?
-                mapobjects = [
-                    tm.Mapobject(
-                        partition_key=store['site_id'],
-                        mapobject_type_id=mapobject_type_ids[obj_name]
-                    )
-                    for _ in segm_objs.labels
-                ]
-                logger.info('insert objects into database')
-                # FIXME: does this update the id attribute?
-                session.bulk_ingest(mapobjects)
-                session.flush()
-                mapobject_ids = {
-                    label: mapobjects[i].id
-                    for i, label in enumerate(segm_objs.labels)
-                }
+                        for _ in store['objects'][obj_name].labels
+                    ])
+            logger.info('insert %d objects into database', len(mapobjects))
+            session.bulk_ingest(mapobjects)
+            session.flush()
 
-                # Create a polygon and/or point for each segmented object
-                # based on the cooridinates of their contours and centroids,
-                # respectively.
-                logger.info(
-                    'add segmentations for objects of type "%s"', obj_name
-                )
-                mapobject_segmentations = list()
-                if segm_objs.represent_as_polygons:
-                    logger.debug('represent segmented objects as polygons')
-                    iterator = segm_objs.iter_polygons(y_offset, x_offset)
-                    for t, z, label, polygon in iterator:
+            mapobject_segmentations = list()
+            segmentation_records = list()
+            feature_values = list()
+            offset = 0
+            for store in stores:
+                site = session.query(tm.Site).get(store['site_id'])
+                y_offset, x_offset = site.aligned_offset
+                for obj_name in object_names:
+                    segm_objs = store['objects'][obj_name]
+                    mapobject_ids = {
+                        label: mapobjects[offset + i].id
+                        for i, label in enumerate(segm_objs.labels)
+                    }
+                    offset += len(mapobject_ids)
+
+                    # Create a polygon and/or point for each segmented object
+                    # based on the cooridinates of their contours and
+                    # centroids, respectively.
+                    logger.info(
+                        'add segmentations for objects of type "%s"', obj_name
+                    )
+                    representation = segm_objs.representation
+                    if representation == 'features':
                         logger.debug(
-                            'add segmentation for object #%d at '
-                            'tpoint %d and zplane %d', label, t, z
+                            'represent segmented objects without geometry'
                         )
-                        if polygon.is_empty:
-                            logger.warn(
-                                'object #%d of type %s doesn\'t have a polygon',
-                                label, obj_name
+                    elif representation == 'polygons':
+                        logger.debug('represent segmented objects as polygons')
+                        iterator = segm_objs.iter_polygons(y_offset, x_offset)
+                        for t, z, label, polygon in iterator:
+                            logger.debug(
+                                'add segmentation for object #%d at '
+                                'tpoint %d and zplane %d', label, t, z
                             )
-                            # TODO: Shall we rather raise an Exception here???
-                            # At the moment we remove the corresponding
-                            # mapobjects in the collect phase.
-                            continue
-                        mapobject_segmentations.append(
-                            tm.MapobjectSegmentation(
-                                partition_key=store['site_id'], label=label,
-                                geom_polygon=polygon,
-                                geom_centroid=polygon.centroid,
-                                mapobject_id=mapobject_ids[label],
-                                segmentation_layer_id=segmentation_layer_ids[
-                                    (obj_name, t, z)
-                                ],
+                            if polygon.is_empty:
+                                logger.warn(
+                                    'object #%d of type %s doesn\'t have a '
+                                    'polygon', label, obj_name
+                                )
+                                # TODO: Shall we rather raise an Exception
+                                # here??? At the moment we remove the
+                                # corresponding mapobjects in the collect phase.
+                                continue
+                            mapobject_segmentations.append(
+                                tm.MapobjectSegmentation(
+                                    partition_key=store['site_id'], label=label,
+                                    geom_polygon=polygon,
+                                    geom_centroid=polygon.centroid,
+                                    mapobject_id=mapobject_ids[label],
+                                    segmentation_layer_id=segmentation_layer_ids[
+                                        (obj_name, t, z)
+                                    ],
+                                )
                             )
-                        )
-                else:
-                    logger.debug('represent segmented objects only as points')
-                    iterator = segm_objs.iter_points(y_offset, x_offset)
-                    for t, z, label, centroid in iterator:
+                    elif representation == 'bboxes':
                         logger.debug(
-                            'add segmentation for object #%d at '
-                            'tpoint %d and zplane %d', label, t, z
+                            'represent segmented objects as bounding boxes'
                         )
-                        mapobject_segmentations.append(
-                            tm.MapobjectSegmentation(
-                                partition_key=store['site_id'], label=label,
-                                geom_polygon=None, geom_centroid=centroid,
-                                mapobject_id=mapobject_ids[label],
-                                segmentation_layer_id=segmentation_layer_ids[
-                                    (obj_name, t, z)
-                                ]
-                            )
+                        ids = pd.Series(mapobject_ids)
+                        iterator = segm_objs.iter_bounding_boxes(
+                            y_offset, x_offset
                         )
-                logger.info('insert segmentations into database')
-                session.bulk_ingest(mapobject_segmentations)
-
-                logger.info(
-                    'add feature values for objects of type "%s"', obj_name
-                )
-                logger.debug('round feature values to 6 decimals')
-                feature_values = list()
-                for t, data in enumerate(segm_objs.measurements):
-                    data = data.round(6)  # single!
-                    if data.empty:
-                        logger.warn('empty measurement at time point %d', t)
-                        continue
-                    elif data.shape[0] < len(mapobject_ids):
-                        # We clean up these objects in the collect phase.
-                        logger.error('missing feature values')
-                    elif data.shape[0] > len(mapobject_ids):
-                        # Not sure this could happen.
-                        logger.error('too many feature values')
-                    column_lut = feature_ids[obj_name]
-                    for label, c in data.rename(columns=column_lut).iterrows():
+                        for t, z, labels, polygons, centroids in iterator:
+                            logger.debug(
+                                'add segmentations for %d objects at '
+                                'tpoint %d and zplane %d', len(labels), t, z
+                            )
+                            segmentation_records.append(pd.DataFrame(
+                                collections.OrderedDict([
+                                    ('partition_key', store['site_id']),
+                                    ('geom_polygon', polygons),
+                                    ('geom_centroid', centroids),
+                                    ('mapobject_id', ids.loc[labels].values),
+                                    ('segmentation_layer_id',
+                                        segmentation_layer_ids[
+                                            (obj_name, t, z)
+                                        ]),
+                                    ('label', labels)
+                                ])
+                            ))
+                    else:
                         logger.debug(
-                            'add values for mapobject #%d at time point %d',
-                            label, t
+                            'represent segmented objects only as points'
                         )
-                        values = dict(
-                            zip(c.index.astype(str), c.values.astype(str))
-                        )
-                        feature_values.append(
-                            tm.FeatureValues(
-                                partition_key=store['site_id'],
-                                mapobject_id=mapobject_ids[label],
-                                tpoint=t, values=values
+                        # Centroids are computed and formatted for all objects
+                        # of a plane at once and copied into the database
+                        # without creating a model instance for each object.
+                        ids = pd.Series(mapobject_ids)
+                        iterator = segm_objs.iter_centroids(y_offset, x_offset)
+                        for t, z, labels, centroids in iterator:
+                            logger.debug(
+                                'add segmentations for %d objects at '
+                                'tpoint %d and zplane %d', len(labels), t, z
                             )
-                        )
-                logger.debug('insert feature values into db table')
-                session.bulk_ingest(feature_values)
+                            segmentation_records.append(pd.DataFrame(
+                                collections.OrderedDict([
+                                    ('partition_key', store['site_id']),
+                                    ('geom_centroid', centroids),
+                                    ('mapobject_id', ids.loc[labels].values),
+                                    ('segmentation_layer_id',
+                                        segmentation_layer_ids[
+                                            (obj_name, t, z)
+                                        ]),
+                                    ('label', labels)
+                                ])
+                            ))
+
+                    logger.info(
+                        'add feature values for objects of type "%s"', obj_name
+                    )
+                    logger.debug('round feature values to 6 decimals')
+                    for t, data in enumerate(segm_objs.measurements):
+                        data = data.round(6)  # single!
+                        if data.empty:
+                            logger.warn('empty measurement at time point %d', t)
+                            continue
+                        elif data.shape[0] < len(mapobject_ids):
+                            # We clean up these objects in the collect phase.
+                            logger.error('missing feature values')
+                        elif data.shape[0] > len(mapobject_ids):
+                            # Not sure this could happen.
+                            logger.error('too many feature values')
+                        column_lut = feature_ids[obj_name]
+                        data = data.rename(columns=column_lut)
+                        for label, c in data.iterrows():
+                            logger.debug(
+                                'add values for mapobject #%d at time point %d',
+                                label, t
+                            )
+                            values = dict(
+                                zip(c.index.astype(str), c.values.astype(str))
+                            )
+                            feature_values.append(
+                                tm.FeatureValues(
+                                    partition_key=store['site_id'],
+                                    mapobject_id=mapobject_ids[label],
+                                    tpoint=t, values=values
+                                )
+                            )
+
+            # Segmentations and feature values of all sites are copied into
+            # the database in a single stream per table.
+            logger.info('insert segmentations into database')
+            session.bulk_ingest(mapobject_segmentations)
+            if segmentation_records:
+                session.bulk_ingest_records(
+                    tm.MapobjectSegmentation,
+                    pd.concat(segmentation_records, ignore_index=True)
+                )
+            logger.debug('insert feature values into db table')
+            session.bulk_ingest(feature_values)
+
+        if journal is not None:
+            journal.commit([store['site_id'] for store in stores])
 
     def create_debug_run_phase(self, submission_id):
         '''Creates a job collection for the debug "run" phase of the step.
@@ -664,18 +795,173 @@ class ImageAnalysisPipelineEngine(WorkflowStepAPI):
             job description
         assume_clean_state: bool, optional
             assume that output of previous runs has already been cleaned up
+
+        Note
+        ----
+        By default, sites are processed in a pipelined fashion: the input of
+        the next site is loaded and the output of the previous site is saved
+        in background threads while the pipeline is run for the current site.
+        At most one loaded and one processed site are queued at a time.
+        When the batch specifies more than one ``"processes"``, sites are
+        processed in parallel by a pool of forked worker processes and
+        outputs of several sites are saved together by the main process.
         '''
         logger.info('handle pipeline input')
 
+        journal = None
+        if 'id' in batch:
+            journal = self.get_run_journal(batch['id'])
+            if journal.exists:
+                # A previous execution of the job was interrupted. Outputs of
+                # sites that haven't been committed may have been saved
+                # partially and must be removed.
+                completed_site_ids = journal.get_items()
+                logger.info(
+                    'resume job: skip %d sites that were already processed',
+                    len(completed_site_ids)
+                )
+                batch = dict(batch, site_ids=[
+                    i for i in batch['site_ids']
+                    if i not in completed_site_ids
+                ])
+                assume_clean_state = False
+            journal.start()
+
         self.start_engines()
 
-        # Enable debugging of pipelines by providing the full path to images.
-        # This requires a work around for "plot" and "job_id" arguments.
-        for site_id in batch['site_ids']:
-            logger.info('process site %d', site_id)
-            store = self._load_pipeline_input(site_id)
-            store = self._run_pipeline(store, site_id, batch['plot'])
-            self._save_pipeline_outputs(store, assume_clean_state)
+        processes = batch.get('processes', 1)
+        languages = [m.language for m in self.pipeline]
+        if processes > 1 and 'Matlab' in languages:
+            logger.warn(
+                'sites are processed sequentially, because the Matlab engine '
+                'cannot be shared between processes'
+            )
+            processes = 1
+        if processes > 1 and multiprocessing.current_process().daemon:
+            # Jobs that are executed by a pool of local worker processes
+            # cannot fork processes themselves.
+            logger.warn(
+                'sites are processed sequentially, because the job is '
+                'executed by a worker process'
+            )
+            processes = 1
+        if processes > 1:
+            self._run_sites_in_processes(
+                batch, assume_clean_state, processes, journal
+            )
+        else:
+            self._run_sites_in_threads(batch, assume_clean_state, journal)
+
+        stats = self.module_statistics
+        for name, row in stats.iterrows():
+            logger.info(
+                'module "%s": %d calls, %.2f s total, %.2f s mean, '
+                '%.2f s max', name, row.calls, row.total, row['mean'], row['max']
+            )
+
+        if journal is not None:
+            journal.remove()
+
+    def _run_sites_in_processes(self, batch, assume_clean_state, processes,
+                                journal=None):
+        logger.info('process sites in %d parallel processes', processes)
+        # Code of modules and the context of the batch are loaded before
+        # worker processes are forked, such that they are inherited.
+        for module in self.pipeline:
+            module.load()
+        context = self._load_batch_context(batch['site_ids'])
+        tm.utils.dispose_db_engines()
+        _worker_state.update(engine=self, context=context, plot=batch['plot'])
+        pool = multiprocessing.Pool(processes)
+        try:
+            stores = list()
+            results = pool.imap_unordered(_process_site, batch['site_ids'])
+            for store, module_times in results:
+                for name, times in module_times.iteritems():
+                    self._module_times[name].extend(times)
+                stores.append(store)
+                if len(stores) == processes:
+                    self._save_pipeline_outputs(
+                        stores, assume_clean_state,
+                        batch.get('representations'), journal
+                    )
+                    stores = list()
+            if stores:
+                self._save_pipeline_outputs(
+                    stores, assume_clean_state, batch.get('representations'),
+                    journal
+                )
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            _worker_state.clear()
+
+    def _run_sites_in_threads(self, batch, assume_clean_state,
+                              journal=None):
+        inputs = Queue(maxsize=1)
+        outputs = Queue(maxsize=1)
+        errors = list()
+
+        def load():
+            try:
+                context = self._load_batch_context(batch['site_ids'])
+                for site_id in batch['site_ids']:
+                    logger.info('load input for site %d', site_id)
+                    inputs.put(self._load_pipeline_input(site_id, context))
+            except Exception as error:
+                inputs.put(error)
+            inputs.put(None)
+
+        def save():
+            while True:
+                store = outputs.get()
+                if store is None:
+                    break
+                if errors:
+                    # Keep consuming to not block the pipeline, which stops
+                    # once it notices the error.
+                    continue
+                try:
+                    logger.info('save output for site %d', store['site_id'])
+                    self._save_pipeline_outputs(
+                        store, assume_clean_state,
+                        batch.get('representations'), journal
+                    )
+                except Exception as error:
+                    errors.append(error)
+
+        loader = Thread(target=load)
+        loader.daemon = True
+        loader.start()
+        writer = Thread(target=save)
+        writer.daemon = True
+        writer.start()
+        try:
+            while True:
+                store = inputs.get()
+                if store is None:
+                    break
+                if isinstance(store, Exception):
+                    raise store
+                if errors:
+                    break
+                site_id = store['site_id']
+                logger.info('process site %d', site_id)
+                store = self._run_pipeline(store, site_id, batch['plot'])
+                # Handles of segmented objects are reused by the modules for
+                # the next site and must therefore be copied.
+                outputs.put({
+                    'site_id': site_id,
+                    'objects': copy.deepcopy(store['objects'])
+                })
+        finally:
+            outputs.put(None)
+            writer.join()
+        if errors:
+            raise errors[0]
 
     def collect_job_output(self, batch):
         '''Computes the optimal representation of each
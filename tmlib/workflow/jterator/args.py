@@ -29,8 +29,21 @@ class JteratorBatchArguments(BatchArguments):
     )
 
     batch_size = Argument(
-        type=int, help='number of sites that should be processed per job',
-        default=100, flag='batch-size', short_flag='b'
+        type=int, default=100, flag='batch-size', short_flag='b', auto=True,
+        help='''
+            number of sites that should be processed per job
+            ("auto" determines the number from runtimes of the previous
+            submission)
+        '''
+    )
+
+    processes = Argument(
+        type=int, default=1,
+        help='''
+            number of processes that should be used to process sites of a
+            batch in parallel within a job (should not exceed the number of
+            cores requested per job)
+        '''
     )
 
 
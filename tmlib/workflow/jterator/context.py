@@ -0,0 +1,273 @@
+# TmLibrary - TissueMAPS library for distibuted image analysis routines.
+# Copyright (C) 2016  Markus D. Herrmann, University of Zurich and Robin Hafen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import logging
+import collections
+import numpy as np
+
+import tmlib.models as tm
+from tmlib.image import ChannelImage
+from tmlib.metadata import ChannelImageMetadata
+from tmlib.readers import DatasetReader
+from tmlib.errors import PipelineDescriptionError
+
+logger = logging.getLogger(__name__)
+
+
+#: Description of a :class:`Site <tmlib.models.site.Site>`
+SiteDescription = collections.namedtuple(
+    'SiteDescription', [
+        'id', 'y_offset', 'x_offset', 'height', 'width',
+        'top_residue', 'bottom_residue', 'left_residue', 'right_residue',
+        'tpoints', 'zplanes'
+    ]
+)
+
+#: Description of a :class:`ChannelImageFile <tmlib.models.file.ChannelImageFile>`
+ImageFileDescription = collections.namedtuple(
+    'ImageFileDescription', [
+        'id', 'site_id', 'channel_id', 'cycle_id', 'tpoint', 'zplane',
+        'location', 'y_shift', 'x_shift'
+    ]
+)
+
+
+class BatchContext(object):
+
+    '''In-memory context for loading the input of an image analysis pipeline
+    for all sites of a batch.
+
+    All database records required for the batch are resolved upfront with a
+    small number of set-based queries rather than querying them separately
+    for each site.
+    '''
+
+    def __init__(self, experiment_id, site_ids, channel_input, objects_input):
+        '''
+        Parameters
+        ----------
+        experiment_id: int
+            ID of the processed experiment
+        site_ids: List[int]
+            IDs of the :class:`Site <tmlib.models.site.Site>` of the batch
+        channel_input: List[tmlib.workflow.jterator.description.PipelineChannelInputDescription]
+            description of channels that serve as input for the pipeline
+        objects_input: List[tmlib.workflow.jterator.description.PipelineObjectInputDescription]
+            description of objects that serve as input for the pipeline
+        '''
+        self.experiment_id = experiment_id
+        self.site_ids = list(site_ids)
+        #: Dict[int, tmlib.workflow.jterator.context.SiteDescription]
+        self.sites = dict()
+        #: Dict[str, numpy.dtype]
+        self.dtypes = dict()
+        #: Dict[str, tmlib.image.IllumstatsContainer]
+        self.illumstats = dict()
+        self._image_files = collections.defaultdict(list)
+        self._segmentations = collections.defaultdict(list)
+        self._load(channel_input, objects_input)
+
+    def _load(self, channel_input, objects_input):
+        logger.info('load context for %d sites', len(self.site_ids))
+        with tm.utils.ExperimentSession(self.experiment_id) as session:
+            # Offsets of wells and plates are cached on the instances, which
+            # are shared by all sites of the batch within the session.
+            sites = session.query(tm.Site).\
+                filter(tm.Site.id.in_(self.site_ids)).\
+                all()
+            records = session.query(
+                    tm.ChannelImageFile.site_id,
+                    tm.ChannelImageFile.tpoint,
+                    tm.ChannelImageFile.zplane
+                ).\
+                filter(tm.ChannelImageFile.site_id.in_(self.site_ids)).\
+                distinct().\
+                all()
+            tpoints = collections.defaultdict(set)
+            zplanes = collections.defaultdict(set)
+            for r in records:
+                tpoints[r.site_id].add(r.tpoint)
+                zplanes[r.site_id].add(r.zplane)
+            for site in sites:
+                y_offset, x_offset = site.aligned_offset
+                self.sites[site.id] = SiteDescription(
+                    id=site.id, y_offset=y_offset, x_offset=x_offset,
+                    height=site.aligned_height, width=site.aligned_width,
+                    top_residue=site.top_residue,
+                    bottom_residue=site.bottom_residue,
+                    left_residue=site.left_residue,
+                    right_residue=site.right_residue,
+                    tpoints=sorted(tpoints[site.id]),
+                    zplanes=sorted(zplanes[site.id])
+                )
+
+            channel_names = [ch.name for ch in channel_input]
+            channels = session.query(tm.Channel).\
+                filter(tm.Channel.name.in_(channel_names)).\
+                all()
+            channels = {c.name: c for c in channels}
+            for ch in channel_input:
+                if ch.name not in channels:
+                    raise PipelineDescriptionError(
+                        'Channel "%s" does not exist.' % ch.name
+                    )
+                bit_depth = channels[ch.name].bit_depth
+                if bit_depth == 16:
+                    self.dtypes[ch.name] = np.uint16
+                elif bit_depth == 8:
+                    self.dtypes[ch.name] = np.uint8
+
+            correct_names = [ch.name for ch in channel_input if ch.correct]
+            if correct_names:
+                stats_files = session.query(tm.IllumstatsFile).\
+                    join(tm.Channel).\
+                    filter(tm.Channel.name.in_(correct_names)).\
+                    all()
+                stats_files = {f.channel.name: f for f in stats_files}
+                for name in correct_names:
+                    if name not in stats_files:
+                        raise PipelineDescriptionError(
+                            'No illumination statistics file found for '
+                            'channel "%s"' % name
+                        )
+                    logger.info(
+                        'load illumination statistics for channel "%s"', name
+                    )
+                    self.illumstats[name] = stats_files[name].get()
+
+            shifts = session.query(
+                    tm.SiteShift.site_id, tm.SiteShift.cycle_id,
+                    tm.SiteShift.y, tm.SiteShift.x
+                ).\
+                filter(tm.SiteShift.site_id.in_(self.site_ids)).\
+                all()
+            shifts = {(s.site_id, s.cycle_id): (s.y, s.x) for s in shifts}
+            channel_ids = {c.id: c.name for c in channels.itervalues()}
+            image_files = session.query(tm.ChannelImageFile).\
+                filter(
+                    tm.ChannelImageFile.site_id.in_(self.site_ids),
+                    tm.ChannelImageFile.channel_id.in_(channel_ids.keys())
+                ).\
+                all()
+            for f in image_files:
+                y_shift, x_shift = shifts.get((f.site_id, f.cycle_id), (0, 0))
+                # NOTE: Accessing the location loads the parent channel from
+                # the identity map without issuing another query.
+                self._image_files[(f.site_id, channel_ids[f.channel_id])].append(
+                    ImageFileDescription(
+                        id=f.id, site_id=f.site_id, channel_id=f.channel_id,
+                        cycle_id=f.cycle_id, tpoint=f.tpoint, zplane=f.zplane,
+                        location=f.location, y_shift=y_shift, x_shift=x_shift
+                    )
+                )
+
+            object_names = [obj.name for obj in objects_input]
+            if object_names:
+                mapobject_types = session.query(tm.MapobjectType.name).\
+                    filter(tm.MapobjectType.name.in_(object_names)).\
+                    all()
+                mapobject_types = {t.name for t in mapobject_types}
+            for obj in objects_input:
+                if obj.name not in mapobject_types:
+                    raise PipelineDescriptionError(
+                        'Mapobject type "%s" does not exist.' % obj.name
+                    )
+                logger.info('load segmentations of objects "%s"', obj.name)
+                layers = session.query(
+                        tm.SegmentationLayer.id,
+                        tm.SegmentationLayer.tpoint,
+                        tm.SegmentationLayer.zplane
+                    ).\
+                    join(tm.MapobjectType).\
+                    filter(tm.MapobjectType.name == obj.name).\
+                    all()
+                layers = {l.id: (l.tpoint, l.zplane) for l in layers}
+                if not layers:
+                    # Objects of the type haven't been segmented (yet).
+                    continue
+                segmentations = session.query(
+                        tm.MapobjectSegmentation.partition_key,
+                        tm.MapobjectSegmentation.segmentation_layer_id,
+                        tm.MapobjectSegmentation.label,
+                        tm.MapobjectSegmentation.geom_polygon
+                    ).\
+                    filter(
+                        tm.MapobjectSegmentation.segmentation_layer_id.in_(
+                            layers.keys()
+                        ),
+                        tm.MapobjectSegmentation.partition_key.in_(
+                            self.site_ids
+                        )
+                    ).\
+                    order_by(tm.MapobjectSegmentation.mapobject_id).\
+                    all()
+                for s in segmentations:
+                    t, z = layers[s.segmentation_layer_id]
+                    key = (s.partition_key, obj.name, t, z)
+                    self._segmentations[key].append((s.label, s.geom_polygon))
+
+    def get_images(self, site_id, channel_name):
+        '''Gets the images of a channel for a given site.
+
+        Parameters
+        ----------
+        site_id: int
+            ID of the :class:`Site <tmlib.models.site.Site>`
+        channel_name: str
+            name of the :class:`Channel <tmlib.models.channel.Channel>`
+
+        Returns
+        -------
+        Generator[tmlib.image.ChannelImage]
+            image for each time point and z-plane
+        '''
+        site = self.sites[site_id]
+        for f in self._image_files[(site_id, channel_name)]:
+            logger.info('load image %d', f.id)
+            metadata = ChannelImageMetadata(
+                channel_id=f.channel_id, site_id=f.site_id,
+                tpoint=f.tpoint, zplane=f.zplane, cycle_id=f.cycle_id
+            )
+            metadata.bottom_residue = site.bottom_residue
+            metadata.top_residue = site.top_residue
+            metadata.left_residue = site.left_residue
+            metadata.right_residue = site.right_residue
+            metadata.y_shift = f.y_shift
+            metadata.x_shift = f.x_shift
+            with DatasetReader(f.location) as reader:
+                array = reader.read('array')
+            yield ChannelImage(array, metadata)
+
+    def get_segmentations(self, site_id, objects_name, tpoint, zplane):
+        '''Gets segmentations of objects for a given site.
+
+        Parameters
+        ----------
+        site_id: int
+            ID of the :class:`Site <tmlib.models.site.Site>`
+        objects_name: str
+            name of the
+            :class:`MapobjectType <tmlib.models.mapobject.MapobjectType>`
+        tpoint: int
+            time point
+        zplane: int
+            z-plane
+
+        Returns
+        -------
+        List[Tuple[Union[int, geoalchemy2.elements.WKBElement]]]
+            label and polygon geometry for each segmented object
+        '''
+        return self._segmentations[(site_id, objects_name, tpoint, zplane)]
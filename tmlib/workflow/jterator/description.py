@@ -427,9 +427,9 @@ class PipelineObjectOutputDescription(object):
     :class:`MapobjectType <tmlib.models.mapobject.MapobjectType>`.
     '''
 
-    __slots__ = ('_name', '_as_polygons')
+    __slots__ = ('_name', '_representation')
 
-    def __init__(self, name, as_polygons=True):
+    def __init__(self, name, as_polygons=True, representation=None):
         '''
         Parameters
         ----------
@@ -439,9 +439,24 @@ class PipelineObjectOutputDescription(object):
             whether objects should be represented as polygons
             (if ``False`` only centroid coordinates will be stored;
             default: ``True``)
+        representation: str, optional
+            geometric representation of objects
+            (options: ``{"polygons", "bboxes", "centroids", "features"}``);
+            takes precedence over `as_polygons` (default: ``None``)
+
+        Note
+        ----
+        Representations differ in the cost of computing them:
+        polygons require tracing the contour of each object, bounding boxes
+        and centroids are computed for all objects at once and objects
+        represented as "features" are persisted without any geometry, e.g.
+        when they only serve as input for downstream tools.
         '''
         self.name = name
-        self.as_polygons = as_polygons
+        if representation is None:
+            self.as_polygons = as_polygons
+        else:
+            self.representation = representation
 
     @property
     def name(self):
@@ -454,25 +469,43 @@ class PipelineObjectOutputDescription(object):
             raise TypeError('Attribute "name" must have type basestring.')
         self._name = str(value)
 
+    @property
+    def representation(self):
+        '''str: geometric representation of objects'''
+        return self._representation
+
+    @representation.setter
+    def representation(self, value):
+        if value not in handles.OBJECT_REPRESENTATIONS:
+            raise PipelineDescriptionError(
+                'Attribute "representation" must be one of the following: '
+                '"%s"' % '", "'.join(handles.OBJECT_REPRESENTATIONS)
+            )
+        self._representation = str(value)
+
     @property
     def as_polygons(self):
         '''bool: whether object should be represented as polygons'''
-        return self._as_polygons
+        return self._representation in {'polygons', 'bboxes'}
 
     @as_polygons.setter
     def as_polygons(self, value):
         if not isinstance(value, bool):
             raise TypeError('Attribute "as_polygons" must have type bool.')
-        self._as_polygons = value
+        self._representation = 'polygons' if value else 'centroids'
 
     def to_dict(self):
-        '''Returns attributes "name" and "as_polygons" as key-value pairs.
+        '''Returns attributes "name", "as_polygons" and "representation"
+        as key-value pairs.
 
         Returns
         -------
         dict
         '''
-        return {'name': self.name, 'as_polygons': self.as_polygons}
+        return {
+            'name': self.name, 'as_polygons': self.as_polygons,
+            'representation': self.representation
+        }
 
 
 class PipelineModuleDescription(object):
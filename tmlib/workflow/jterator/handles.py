@@ -28,7 +28,6 @@ import sys
 import json
 import numpy as np
 import pandas as pd
-import mahotas as mh
 import cv2
 import skimage
 import logging
@@ -42,11 +41,22 @@ from abc import abstractmethod
 
 from tmlib.utils import same_docstring_as
 from tmlib.utils import assert_type
-from tmlib.image import SegmentationImage
+from tmlib.image import SegmentationImage, LabelIndex
 import jtlib.utils
 
 logger = logging.getLogger(__name__)
 
+#: Tuple[str]: geometric representations of segmented objects that can be
+#: persisted, in order of decreasing cost; objects represented as "features"
+#: are persisted without any geometry
+OBJECT_REPRESENTATIONS = ('polygons', 'bboxes', 'centroids', 'features')
+
+
+def _format_wkt(template, coordinates):
+    # Formatting plain integers is considerably faster than creating a
+    # geometry object for each segmented object and serializing it.
+    return np.array([template % tuple(c) for c in coordinates.tolist()])
+
 
 class Handle(object):
 
@@ -415,13 +425,91 @@ class SegmentedObjects(LabelImage):
         '''
         super(SegmentedObjects, self).__init__(name, key, help)
         self._features = collections.defaultdict(list)
+        self._measurements = None
+        self._labels = None
+        self._label_indices = dict()
         self.save = False
-        self.represent_as_polygons = True
+        self.representation = 'polygons'
+
+    @property
+    def value(self):
+        '''numpy.ndarray[numpy.int32]: pixels/voxels array
+
+        Note
+        ----
+        Assigning a new array invalidates the cached label index. The array
+        must not be modified in place.
+        '''
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        LabelImage.value.fset(self, value)
+        self._labels = None
+        self._label_indices = dict()
 
     @property
     def labels(self):
         '''List[int]: unique object identifier labels'''
-        return np.unique(self.value[self.value > 0]).astype(int).tolist()
+        if self._labels is None:
+            counts = np.bincount(self.value.ravel())
+            self._labels = (np.flatnonzero(counts[1:]) + 1).tolist()
+        return self._labels
+
+    def get_label_index(self, t, z):
+        '''Gets the index of objects for a given pixel plane.
+
+        Parameters
+        ----------
+        t: int
+            zero-based time point index
+        z: int
+            zero-based z-plane index
+
+        Returns
+        -------
+        tmlib.image.LabelIndex
+            sorted labels, bounding boxes, pixel counts and border status
+            of objects in the plane
+
+        Note
+        ----
+        The index is computed only once per plane and cached until a new
+        :attr:`value <tmlib.workflow.jterator.handles.SegmentedObjects.value>`
+        is assigned.
+        '''
+        if (t, z) not in self._label_indices:
+            array = self.value
+            if array.ndim == 2:
+                plane = array
+            elif array.ndim == 3:
+                plane = array[:, :, z]
+            else:
+                plane = array[:, :, z, t]
+            self._label_indices[(t, z)] = LabelIndex(plane)
+        return self._label_indices[(t, z)]
+
+    def _calculate_centroids(self, t, z, plane, y_offset, x_offset):
+        # Coordinates of all pixels are summed per label in a single pass
+        # over the plane rather than computing the center of mass for each
+        # object separately.
+        index = self.get_label_index(t, z)
+        labels = index.labels
+        height, width = plane.shape
+        flat = plane.ravel()
+        n = index.counts.shape[0]
+        y_sums = np.bincount(
+            flat, weights=np.repeat(np.arange(height), width), minlength=n
+        )
+        x_sums = np.bincount(
+            flat, weights=np.tile(np.arange(width), height), minlength=n
+        )
+        counts = index.counts[labels].astype(float)
+        centroids = np.empty((len(labels), 2), dtype=float)
+        centroids[:, 0] = -(y_sums[labels] / counts + y_offset)
+        centroids[:, 1] = x_sums[labels] / counts + x_offset
+        # Truncate towards zero like the builtin "int" function.
+        return (labels, centroids.astype(np.int64))
 
     def iter_points(self, y_offset, x_offset):
         '''Iterates over point representations of segmented objects.
@@ -440,20 +528,93 @@ class SegmentedObjects(LabelImage):
         -------
         Generator[Tuple[Union[int, shapely.geometry.point.Point]]]
             time point, z-plane, label and point geometry
+
+        See also
+        --------
+        :meth:`tmlib.workflow.jterator.handles.SegmentedObjects.iter_centroids`
         '''
         logger.debug('calculate centroids for objects of type "%s"', self.key)
-        points = dict()
         for (t, z), plane in self.iter_planes():
-            centroids = mh.center_of_mass(plane, labels=plane)
-            centroids[:, 1] += x_offset
-            centroids[:, 0] += y_offset
-            centroids[:, 0] *= -1
-            for label in self.labels:
-                y = int(centroids[label, 0])
-                x = int(centroids[label, 1])
+            labels, centroids = self._calculate_centroids(
+                t, z, plane, y_offset, x_offset
+            )
+            for label, (y, x) in zip(labels, centroids):
                 point = shapely.geometry.Point(x, y)
                 yield (t, z, label, point)
 
+    def iter_centroids(self, y_offset, x_offset):
+        '''Iterates over point representations of segmented objects plane
+        by plane. In contrast to
+        :meth:`iter_points <tmlib.workflow.jterator.handles.SegmentedObjects.iter_points>`
+        centroids of all objects of a plane are provided at once as
+        *WKT* strings, which can be directly ingested into the database
+        without creating a geometry object for each segmented object.
+
+        Parameters
+        ----------
+        y_offset: int
+            global vertical offset that needs to be subtracted from
+            *y*-coordinates (*y*-axis is inverted)
+        x_offset: int
+            global horizontal offset that needs to be added to x-coordinates
+
+        Returns
+        -------
+        Generator[Tuple[Union[int, numpy.ndarray]]]
+            time point, z-plane, labels and *WKT* point representation of the
+            centroid of each labeled object
+        '''
+        logger.debug('calculate centroids for objects of type "%s"', self.key)
+        for (t, z), plane in self.iter_planes():
+            labels, centroids = self._calculate_centroids(
+                t, z, plane, y_offset, x_offset
+            )
+            wkts = _format_wkt('POINT(%d %d)', centroids[:, ::-1])
+            yield (t, z, labels, wkts)
+
+    def iter_bounding_boxes(self, y_offset, x_offset):
+        '''Iterates over bounding box representations of segmented objects
+        plane by plane. Bounding boxes are a cheap alternative to
+        polygons, since they don't require tracing the contour of each object.
+
+        Parameters
+        ----------
+        y_offset: int
+            global vertical offset that needs to be subtracted from
+            *y*-coordinates (*y*-axis is inverted)
+        x_offset: int
+            global horizontal offset that needs to be added to x-coordinates
+
+        Returns
+        -------
+        Generator[Tuple[Union[int, numpy.ndarray]]]
+            time point, z-plane, labels as well as *WKT* polygon representation
+            of the bounding box and *WKT* point representation of the centroid
+            of each labeled object
+        '''
+        logger.debug(
+            'calculate bounding boxes for objects of type "%s"', self.key
+        )
+        for (t, z), plane in self.iter_planes():
+            labels, centroids = self._calculate_centroids(
+                t, z, plane, y_offset, x_offset
+            )
+            index = self.get_label_index(t, z)
+            bboxes = np.array(
+                [index.bbox(label) for label in labels], dtype=np.int64
+            ).reshape(-1, 4)
+            bboxes[:, :2] = -(bboxes[:, :2] + y_offset)
+            bboxes[:, 2:] += x_offset
+            y0, y1, x0, x1 = bboxes.T
+            polygons = _format_wkt(
+                'POLYGON((%d %d,%d %d,%d %d,%d %d,%d %d))',
+                np.column_stack([
+                    x0, y0, x1, y0, x1, y1, x0, y1, x0, y0
+                ])
+            )
+            points = _format_wkt('POINT(%d %d)', centroids[:, ::-1])
+            yield (t, z, labels, polygons, points)
+
     def iter_polygons(self, y_offset, x_offset):
         '''Iterates over polygon representations of segmented objects.
         The coordinates of the polygon contours are relative to the global map,
@@ -475,7 +636,9 @@ class SegmentedObjects(LabelImage):
         logger.debug('calculate polygons for objects type "%s"', self.key)
         for (t, z), plane in self.iter_planes():
             img = SegmentationImage(plane)
-            for label, geometry in img.extract_polygons(y_offset, x_offset):
+            index = self.get_label_index(t, z)
+            polygons = img.extract_polygons(y_offset, x_offset, index)
+            for label, geometry in polygons:
                 yield (t, z, label, geometry)
 
     def add_polygons(self, polygons, y_offset, x_offset, dimensions):
@@ -500,18 +663,26 @@ class SegmentedObjects(LabelImage):
         -------
         numpy.ndarray[numpy.int32]
             label image
+
+        Note
+        ----
+        The C-contiguous volume is allocated once. Polygons of each plane are
+        rasterized into a single reused plane buffer, which is then copied
+        into the volume, such that the squeezed volume passed to modules
+        doesn't need to be copied.
         '''
-        zstacks = list()
-        for poly in polygons:
-            zplanes = list()
-            for p in poly:
-                image = SegmentationImage.create_from_polygons(
-                    p, y_offset, x_offset, dimensions
-                )
-                zplanes.append(image.array)
-            array = np.stack(zplanes, axis=-1)
-            zstacks.append(array)
-        self.value = np.stack(zstacks, axis=-1)
+        n_tpoints = len(polygons)
+        n_zplanes = len(polygons[0]) if n_tpoints > 0 else 0
+        volume = np.zeros(
+            tuple(dimensions) + (n_zplanes, n_tpoints), dtype=np.int32
+        )
+        plane = np.zeros(dimensions, dtype=np.int32)
+        for t, zpolygons in enumerate(polygons):
+            for z, p in enumerate(zpolygons):
+                plane[:] = 0
+                SegmentationImage.fill_polygons(plane, p, y_offset, x_offset)
+                volume[:, :, z, t] = plane
+        self.value = volume
         return self.value
 
     @property
@@ -521,35 +692,11 @@ class SegmentedObjects(LabelImage):
         '''
         mapping = dict()
         for (t, z), plane in self.iter_planes():
-            for label, is_border in self._find_border_objects(plane).iteritems():
-                mapping[(t, z, label)] = bool(is_border)
+            index = self.get_label_index(t, z)
+            for label in index.labels:
+                mapping[(t, z, label)] = index.is_border(label)
         return mapping
 
-    @staticmethod
-    def _find_border_objects(img):
-        '''Finds the objects at the border of a labeled image.
-
-        Parameters
-        ----------
-        img: numpy.ndarray[int32]
-            labeled pixels array
-
-        Returns
-        -------
-        Dict[int: bool]
-            ``True`` if an object lies at the border of the `img` and
-            ``False`` otherwise
-        '''
-        edges = [np.unique(img[0, :]),   # first row
-                 np.unique(img[-1, :]),  # last row
-                 np.unique(img[:, 0]),   # first col
-                 np.unique(img[:, -1])]  # last col
-
-        # Count only unique ids and remove 0 since it signals 'empty space'
-        border_ids = list(reduce(set.union, map(set, edges)).difference({0}))
-        object_ids = np.unique(img[img != 0])
-        return {o: True if o in border_ids else False for o in object_ids}
-
     @property
     def save(self):
         '''bool: whether objects should be saved'''
@@ -562,30 +709,39 @@ class SegmentedObjects(LabelImage):
         self._save = value
 
     @property
-    def represent_as_polygons(self):
-        '''bool: whether objects should be represented as polygons'''
-        return self._represent_as_polygons
-
-    @represent_as_polygons.setter
-    def represent_as_polygons(self, value):
-        if not isinstance(value, bool):
-            raise TypeError(
-                'Attribute "represent_as_polygons" must have type bool.'
+    def representation(self):
+        '''str: geometric representation of objects when they are saved
+        (options: ``{"polygons", "bboxes", "centroids", "features"}``)
+        '''
+        return self._representation
+
+    @representation.setter
+    def representation(self, value):
+        if value not in OBJECT_REPRESENTATIONS:
+            raise ValueError(
+                'Attribute "representation" must be one of the following: '
+                '"%s"' % '", "'.join(OBJECT_REPRESENTATIONS)
             )
-        self._represent_as_polygons = value
+        self._representation = value
 
     @property
     def measurements(self):
         '''List[pandas.DataFrame]: features extracted for
         segmented objects at each time point
+
+        Note
+        ----
+        Measurements are stored as separate column blocks, which are only
+        concatenated once upon first access after a measurement was added.
         '''
-        if self._features:
-            values = list()
-            for t in sorted(self._features.keys()):
-                values.append(self._features[t])
-            return [pd.concat(v, axis=1) for v in values]
-        else:
+        if not self._features:
             return [pd.DataFrame()]
+        if self._measurements is None:
+            self._measurements = [
+                pd.concat(self._features[t], axis=1, copy=False)
+                for t in sorted(self._features.keys())
+            ]
+        return self._measurements
 
     @measurements.setter
     def measurements(self, value):
@@ -594,6 +750,7 @@ class SegmentedObjects(LabelImage):
                 'Argument "measurements" must have type list.'
             )
         self._features = collections.defaultdict(list)
+        self._measurements = None
         for i, v in enumerate(value):
             if not isinstance(v, pd.DataFrame):
                 raise TypeError(
@@ -609,53 +766,50 @@ class SegmentedObjects(LabelImage):
         ----------
         measurement: tmlib.workflow.jterator.handles.Measurement
             measured features for each segmented object
+
+        Note
+        ----
+        Values are aligned to
+        :attr:`labels <tmlib.workflow.jterator.handles.SegmentedObjects.labels>`:
+        duplicate rows are dropped (keeping the first), rows of unknown
+        objects are removed and ``NaN`` values are added for missing objects.
         '''
         if not isinstance(measurement, Measurement):
             raise TypeError(
                 'Argument "measurement" must have type '
                 'tmlib.workflow.jterator.handles.Measurement.'
             )
+        labels = pd.Index(self.labels)
         for t, val in enumerate(measurement.value):
-            if len(val.index) < len(self.labels):
-                logger.warn(
-                    'missing values for object type "%s" at time point %d',
-                    self.key, t
-                )
-                for label in self.labels:
-                    if label not in val.index:
-                        logger.warn(
-                            'add NaN values for missing object #%d', label
-                        )
-                        val.loc[label, :] = np.NaN
-                val.sort_index(inplace=True)
-            elif len(val.index) > len(self.labels):
-                if len(np.unique(val.index)) < len(val.index):
-                    logger.warn(
-                        'duplicate values for "%s" at time point %d',
-                        measurement.name, t
-                    )
-                    logger.info('remove duplicates and keep first')
-                    val = val[~val.index.duplicated(keep='first')]
-                else:
-                    logger.warn(
-                        'too many values for object type "%s" at time point %d',
-                        self.key, t
-                    )
-                    for i in val.index:
-                        if i not in self.labels:
-                            logger.warn('remove values for object #%d', i)
-                            val.drop(i, inplace=True)
-            if np.any(val.index.values != np.array(self.labels)):
-                raise ValueError(
-                    'Labels of objects for "%s" at time point %d do not match!'
-                    % (measurement.name, t)
-                )
             if len(np.unique(val.columns)) != len(val.columns):
                 raise ValueError(
                     'Column names of "%s" at time point %d must be unique.'
                     % (measurement.name, t)
                 )
-            self._features[t].append(val)
+            if val.index.equals(labels):
+                self._features[t].append(val)
+                continue
+            duplicated = val.index.duplicated(keep='first')
+            if np.any(duplicated):
+                logger.warn(
+                    'remove %d duplicate values for "%s" at time point %d '
+                    'and keep first', np.sum(duplicated), measurement.name, t
+                )
+                val = val[~duplicated]
+            n_missing = len(labels.difference(val.index))
+            if n_missing > 0:
+                logger.warn(
+                    'add NaN values for %d missing objects of type "%s" at '
+                    'time point %d', n_missing, self.key, t
+                )
+            n_extra = len(val.index.difference(labels))
+            if n_extra > 0:
+                logger.warn(
+                    'remove values for %d unknown objects of type "%s" at '
+                    'time point %d', n_extra, self.key, t
+                )
+            self._features[t].append(val.reindex(labels))
+        self._measurements = None
 
     def __str__(self):
         return '<SegmentedObjects(name=%r, key=%r)>' % (self.name, self.key)
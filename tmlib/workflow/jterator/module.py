@@ -66,7 +66,7 @@ class ImageAnalysisModule(object):
     pipeline.
     '''
 
-    def __init__(self, name, source_file, handles):
+    def __init__(self, name, source_file, handles, code_cache=None):
         '''
         Parameters
         ----------
@@ -76,12 +76,27 @@ class ImageAnalysisModule(object):
             name or path to program file that should be executed
         handles: tmlib.workflow.jterator.description.HandleDescriptions
             description of module input/output as provided
+        code_cache: dict, optional
+            cache for loaded module code that may be shared between modules
+            of a pipeline (default: ``None``)
+
+        Note
+        ----
+        Loaded code is cached per source file and modification time,
+        such that the source file is only parsed again when it was changed.
         '''
         self.name = name
         self.source_file = source_file
         self.handles = handles
         self.outputs = dict()
         self.persistent_store = dict()
+        if code_cache is None:
+            code_cache = dict()
+        self._code_cache = code_cache
+
+    def _get_cache_key(self):
+        mtime = os.path.getmtime(self.source_file)
+        return (self.language, self.source_file, mtime)
 
     def build_figure_filename(self, figures_dir, job_id):
         '''Builds name of figure file into which module will write figure
@@ -119,17 +134,22 @@ class ImageAnalysisModule(object):
         logger.debug(
             'import module "%s" from source file: %s', self.source_file
         )
-        logger.debug(
-            'add module source file to Matlab path: "%s"', self.source_file
-        )
-        engine.eval(
-            'addpath(\'{0}\');'.format(os.path.dirname(self.source_file))
-        )
-        engine.eval('version = {0}.VERSION'.format(module_name))
+        key = self._get_cache_key()
+        version = self._code_cache.get(key)
+        if version is None:
+            logger.debug(
+                'add module source file to Matlab path: "%s"', self.source_file
+            )
+            engine.eval(
+                'addpath(\'{0}\');'.format(os.path.dirname(self.source_file))
+            )
+            engine.eval('version = {0}.VERSION'.format(module_name))
+            # NOTE: Matlab doesn't add imported classes to the workspace. It
+            # access the "VERSION" property, we need to assign it to a
+            # variable first.
+            version = engine.get('version')
+            self._code_cache[key] = version
         function_call_format_string = '[{outputs}] = {name}.main({inputs});'
-        # NOTE: Matlab doesn't add imported classes to the workspace. It access
-        # the "VERSION" property, we need to assign it to a variable first.
-        version = engine.get('version')
         if version != self.handles.version:
             raise PipelineRunError(
                 'Version of source and handles is not the same.'
@@ -164,13 +184,22 @@ class ImageAnalysisModule(object):
 
         return self.handles.output
 
+    def _load_py_module(self):
+        module_name = os.path.splitext(os.path.basename(self.source_file))[0]
+        key = self._get_cache_key()
+        module = self._code_cache.get(key)
+        if module is None:
+            logger.debug(
+                'import module "%s" from source file: %s',
+                module_name, self.source_file
+            )
+            module = imp.load_source(module_name, self.source_file)
+            self._code_cache[key] = module
+        return module
+
     def _exec_py_module(self):
         module_name = os.path.splitext(os.path.basename(self.source_file))[0]
-        logger.debug(
-            'import module "%s" from source file: %s',
-            module_name, self.source_file
-        )
-        module = imp.load_source(module_name, self.source_file)
+        module = self._load_py_module()
         if module.VERSION != self.handles.version:
             raise PipelineRunError(
                 'Version of source and handles is not the same.'
@@ -204,6 +233,28 @@ class ImageAnalysisModule(object):
 
         return self.handles.output
 
+    def _load_r_module(self):
+        try:
+            import rpy2.robjects
+        except ImportError:
+            raise ImportError(
+                'R module cannot be run, because '
+                '"rpy2" package is not installed.'
+            )
+        module_name = os.path.splitext(os.path.basename(self.source_file))[0]
+        key = self._get_cache_key()
+        module = self._code_cache.get(key)
+        if module is None:
+            logger.debug(
+                'import module "%s" from source file: %s',
+                module_name, self.source_file
+            )
+            logger.debug('source module: "%s"', self.source_file)
+            rpy2.robjects.r('source("{0}")'.format(self.source_file))
+            module = rpy2.robjects.r[module_name]
+            self._code_cache[key] = module
+        return module
+
     def _exec_r_module(self):
         try:
             import rpy2.robjects
@@ -215,13 +266,7 @@ class ImageAnalysisModule(object):
                 'R module cannot be run, because '
                 '"rpy2" package is not installed.'
             )
-        module_name = os.path.splitext(os.path.basename(self.source_file))[0]
-        logger.debug(
-            'import module "%s" from source file: %s', self.source_file
-        )
-        logger.debug('source module: "%s"', self.source_file)
-        rpy2.robjects.r('source("{0}")'.format(self.source_file))
-        module = rpy2.robjects.r[module_name]
+        module = self._load_r_module()
         version = module.get('VERSION')[0]
         if version != self.handles.version:
             raise PipelineRunError(
@@ -443,6 +488,22 @@ class ImageAnalysisModule(object):
                 store['pipe'][handle.key] = handle.value
         return store
 
+    def load(self):
+        '''Loads the code of the module into the cache without executing it.
+        This allows code to be loaded once before processes are forked, for
+        example.
+
+        Note
+        ----
+        Code of Matlab modules is loaded by the Matlab engine upon the first
+        call of
+        :meth:`run <tmlib.workflow.jterator.module.ImageAnalysisModule.run>`.
+        '''
+        if self.language == 'Python':
+            self._load_py_module()
+        elif self.language == 'R':
+            self._load_r_module()
+
     def run(self, engine=None):
         '''Executes a module, i.e. evaluate the corresponding function with
         the keyword arguments provided by
@@ -0,0 +1,479 @@
+# TmLibrary - TissueMAPS library for distibuted image analysis routines.
+# Copyright (C) 2016  Markus D. Herrmann, University of Zurich and Robin Hafen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''Execution of workflow jobs on the local machine.
+
+Instead of submitting each job as a separate program to a cluster, jobs are
+executed by a pool of worker processes on the machine that monitors the
+submission. Each workflow step has its own pool of worker processes, which
+are reused by subsequent jobs of the step, such that the step's modules are
+imported and database engines are created only once per process. All pools
+share the cores and memory of the machine.
+'''
+import os
+import sys
+import time
+import resource
+import logging
+import importlib
+import itertools
+import multiprocessing
+
+import gc3libs
+import gc3libs.core
+import gc3libs.exceptions
+from gc3libs import Run
+from gc3libs.backends import LRMS
+from gc3libs.quantity import Duration
+from gc3libs.quantity import Memory
+
+import tmlib.models as tm
+from tmlib.log import configure_logging
+
+logger = logging.getLogger(__name__)
+
+#: str: name of the local resource
+LOCAL_RESOURCE_NAME = 'tmaps_local'
+
+
+def _get_cli_class(step_name):
+    module = importlib.import_module('tmlib.workflow.%s.cli' % step_name)
+    return getattr(module, step_name.capitalize())
+
+
+def _initialize_worker(step_name):
+    # Executed once in each forked worker process of a step.
+    reload(sys)
+    sys.setdefaultencoding('utf-8')
+    configure_logging()
+    tm.utils.set_pool_size(1)
+    _get_cli_class(step_name)
+
+
+def _reset_peak_memory():
+    # Resets the peak resident set size of the process (Linux only).
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def _get_peak_memory():
+    # Peak resident set size of the process in kilobytes (Linux only).
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (IOError, OSError):
+        pass
+    return None
+
+
+def _execute_job(arguments, stdout_filename, stderr_filename):
+    # Executed in a worker process. Standard output and error of the job are
+    # redirected at the level of file descriptors, such that output of
+    # compiled libraries ends up in the log files of the job as well.
+    start_time = time.time()
+    start_usage = resource.getrusage(resource.RUSAGE_SELF)
+    # Worker processes are reused, hence the peak memory of previous jobs
+    # needs to be discarded.
+    is_memory_reset = _reset_peak_memory()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = (os.dup(1), os.dup(2))
+    with open(stdout_filename, 'w') as stdout, \
+            open(stderr_filename, 'w') as stderr:
+        os.dup2(stdout.fileno(), 1)
+        os.dup2(stderr.fileno(), 2)
+        try:
+            cli_class = _get_cli_class(arguments[0])
+            cli_args = cli_class._parser.parse_args(arguments[1:])
+            exitcode = cli_class.execute(cli_args)
+        except SystemExit as error:
+            # Raised by the parser upon invalid arguments.
+            exitcode = error.code if isinstance(error.code, int) else 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            for fd in saved_fds:
+                os.close(fd)
+    end_usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        'exitcode': exitcode,
+        'duration': time.time() - start_time,
+        'cpu_time': (
+            end_usage.ru_utime - start_usage.ru_utime +
+            end_usage.ru_stime - start_usage.ru_stime
+        ),
+        'memory': _get_peak_memory() if is_memory_reset else None
+    }
+
+
+def get_host_memory():
+    '''Determines the amount of physical memory of the local machine.
+
+    Returns
+    -------
+    int
+        memory in megabytes
+    '''
+    n_pages = os.sysconf('SC_PHYS_PAGES')
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    return int(n_pages * page_size / 1024**2)
+
+
+class LocalLrms(LRMS):
+
+    '''Resource backend for *GC3Pie* that executes jobs in pools of
+    worker processes on the local machine.
+
+    Jobs are only started when the cores and memory they requested are
+    available on the machine. Requests that exceed the capacity of the
+    machine are reduced to the capacity, i.e. such jobs are executed
+    one after another. Jobs of different steps may run at the same time in
+    separate pools, which are closed once the step has neither queued nor
+    running jobs left.
+
+    Note
+    ----
+    The state of jobs is only known to the process that executes them.
+    Jobs that were submitted by a previous process are reported as lost.
+    '''
+
+    def __init__(self, name, cores=None, memory=None, **extra_args):
+        '''
+        Parameters
+        ----------
+        name: str
+            name of the resource
+        cores: int, optional
+            number of cores that may be used (defaults to the number of
+            cores of the machine)
+        memory: int, optional
+            memory in megabytes that may be used (defaults to the physical
+            memory of the machine)
+        **extra_args: dict, optional
+            additional attributes of the resource
+        '''
+        if cores is None:
+            cores = multiprocessing.cpu_count()
+        if memory is None:
+            memory = get_host_memory()
+        LRMS.__init__(
+            self, name, architecture=[Run.Arch.X86_64],
+            max_cores=cores, max_cores_per_job=sys.maxint,
+            max_memory_per_core=Memory(sys.maxint, Memory.MB),
+            max_walltime=Duration('365 days'),
+            **extra_args
+        )
+        self.enabled = True
+        self.total_memory = memory
+        self.used_cores = 0
+        self.used_memory = 0
+        self._pools = dict()
+        self._queued = dict()
+        self._jobs = dict()
+        self._killed = set()
+        self._job_ids = itertools.count(1)
+
+    def _get_allocation(self, app):
+        cores = min(app.requested_cores or 1, self.max_cores)
+        if app.requested_memory is not None:
+            memory = int(app.requested_memory.amount(Memory.MB))
+        else:
+            memory = 0
+        memory = min(memory, self.total_memory)
+        return (cores, memory)
+
+    def _get_pool(self, step_name):
+        if step_name not in self._pools:
+            logger.info(
+                'start %d worker processes for step "%s"',
+                self.max_cores, step_name
+            )
+            # Connections of the parent process must not be shared with
+            # the forked worker processes.
+            tm.utils.dispose_db_engines()
+            self._pools[step_name] = multiprocessing.Pool(
+                self.max_cores, _initialize_worker, (step_name, )
+            )
+        return self._pools[step_name]
+
+    def _close_pool(self, step_name):
+        # Worker processes are only kept as long as the step has jobs that
+        # wait for resources or are executed, such that schedulers may
+        # alternate between steps without forking workers over and over.
+        if self._queued.get(step_name):
+            return
+        if any(job[3] == step_name for job in self._jobs.itervalues()):
+            return
+        self._queued.pop(step_name, None)
+        pool = self._pools.pop(step_name, None)
+        if pool is not None:
+            logger.debug('close worker processes of step "%s"', step_name)
+            pool.close()
+            pool.join()
+
+    def submit_job(self, app):
+        '''Starts execution of a job if enough cores and memory are
+        available.
+
+        Parameters
+        ----------
+        app: tmlib.workflow.jobs.WorkflowStepJob
+            job
+
+        Raises
+        ------
+        gc3libs.exceptions.LRMSSkipSubmissionToNextIteration
+            when the job cannot be started at the moment
+        '''
+        arguments = [str(a) for a in app.arguments]
+        step_name = arguments[0]
+        queued = self._queued.setdefault(step_name, set())
+        cores, memory = self._get_allocation(app)
+        if (self.used_cores + cores > self.max_cores or
+                self.used_memory + memory > self.total_memory):
+            queued.add(app.jobname)
+            raise gc3libs.exceptions.LRMSSkipSubmissionToNextIteration(
+                'Not enough resources available for job "%s".' % app.jobname
+            )
+        queued.discard(app.jobname)
+        pool = self._get_pool(step_name)
+        stdout_filename = os.path.join(app.output_dir, app.stdout)
+        stderr_filename = os.path.join(app.output_dir, app.stderr)
+        result = pool.apply_async(
+            _execute_job, (arguments, stdout_filename, stderr_filename)
+        )
+        job_id = '%d.%d' % (os.getpid(), next(self._job_ids))
+        self._jobs[job_id] = (result, cores, memory, step_name)
+        self.used_cores += cores
+        self.used_memory += memory
+        app.execution.lrms_jobid = job_id
+        logger.debug('started job "%s" locally', app.jobname)
+        return app
+
+    def update_job_state(self, app):
+        '''Updates the state of a job and releases its resources upon
+        termination.
+
+        Parameters
+        ----------
+        app: tmlib.workflow.jobs.WorkflowStepJob
+            job
+
+        Returns
+        -------
+        gc3libs.Run.State
+            state of the job
+
+        Raises
+        ------
+        gc3libs.exceptions.UnknownJob
+            when the job was not executed by this process
+        '''
+        job_id = app.execution.lrms_jobid
+        if job_id not in self._jobs:
+            raise gc3libs.exceptions.UnknownJob(
+                'Job "%s" is not executed by this process.' % app.jobname
+            )
+        result, cores, memory, step_name = self._jobs[job_id]
+        if job_id in self._killed:
+            self._killed.remove(job_id)
+            del self._jobs[job_id]
+            self.used_cores -= cores
+            self.used_memory -= memory
+            app.execution.returncode = (Run.Signals.RemoteKill, -1)
+            app.execution.state = Run.State.TERMINATING
+            return app.execution.state
+        if not result.ready():
+            app.execution.state = Run.State.RUNNING
+            return app.execution.state
+        del self._jobs[job_id]
+        self.used_cores -= cores
+        self.used_memory -= memory
+        self._close_pool(step_name)
+        try:
+            stats = result.get()
+        except Exception as error:
+            logger.error(
+                'execution of job "%s" failed: %s', app.jobname, str(error)
+            )
+            app.execution.returncode = (Run.Signals.RemoteError, -1)
+        else:
+            app.execution.returncode = (0, stats['exitcode'])
+            app.execution.duration = Duration(
+                int(stats['duration']), Duration.s
+            )
+            app.execution.used_cpu_time = Duration(
+                int(stats['cpu_time']), Duration.s
+            )
+            if stats['memory'] is not None:
+                app.execution.max_used_memory = Memory(
+                    stats['memory'], Memory.KiB
+                )
+        app.execution.state = Run.State.TERMINATING
+        return app.execution.state
+
+    def cancel_job(self, app):
+        '''Cancels a job.
+
+        Since a running job cannot be interrupted individually, all worker
+        processes of the job's step are terminated. Other jobs of the step
+        that were running at the time are reported as killed.
+
+        Parameters
+        ----------
+        app: tmlib.workflow.jobs.WorkflowStepJob
+            job
+        '''
+        for queued in self._queued.itervalues():
+            queued.discard(app.jobname)
+        job_id = app.execution.lrms_jobid
+        if job_id not in self._jobs:
+            return
+        result, cores, memory, step_name = self._jobs.pop(job_id)
+        self.used_cores -= cores
+        self.used_memory -= memory
+        if not result.ready():
+            logger.info(
+                'terminate worker processes of step "%s" to cancel job',
+                step_name
+            )
+            self._terminate_pool(step_name)
+        else:
+            self._close_pool(step_name)
+
+    def _terminate_pool(self, step_name):
+        pool = self._pools.pop(step_name, None)
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        self._killed.update(
+            job_id for job_id, job in self._jobs.iteritems()
+            if job[3] == step_name
+        )
+
+    def get_results(self, app, download_dir, overwrite=False,
+                    changed_only=True):
+        # Log files are written directly into the output directory.
+        pass
+
+    def get_resource_status(self):
+        self.free_slots = self.max_cores - self.used_cores
+        self.user_run = len(self._jobs)
+        self.user_queued = 0
+        self.queued = 0
+        return self
+
+    def free(self, app):
+        pass
+
+    def peek(self, app, remote_filename, local_file, offset=0, size=None):
+        '''Copies part of an output file of a job.
+
+        Parameters
+        ----------
+        app: tmlib.workflow.jobs.WorkflowStepJob
+            job
+        remote_filename: str
+            name of the file relative to the output directory of the job
+        local_file: Union[file, str]
+            file object or path of the file the data should be written to
+        offset: int, optional
+            position in bytes at which reading should start (default: ``0``)
+        size: int, optional
+            number of bytes that should be copied (default: until the end of
+            the file)
+        '''
+        filename = os.path.join(app.output_dir, remote_filename)
+        with open(filename, 'rb') as f:
+            f.seek(offset)
+            data = f.read() if size is None else f.read(size)
+        if hasattr(local_file, 'write'):
+            local_file.write(data)
+        else:
+            with open(local_file, 'wb') as f:
+                f.write(data)
+
+    def validate_data(self, data_file_list=None):
+        return True
+
+    def close(self):
+        '''Terminates the worker processes of all steps.'''
+        for step_name in self._pools.keys():
+            self._terminate_pool(step_name)
+        self._queued = dict()
+        self._jobs = dict()
+        self._killed = set()
+
+
+class LocalConfiguration(object):
+
+    '''Minimal configuration for creating a :class:`gc3libs.core.Core`
+    that only knows the local resource.
+    '''
+
+    def __init__(self, lrms):
+        '''
+        Parameters
+        ----------
+        lrms: tmlib.workflow.local.LocalLrms
+            local resource
+        '''
+        self.lrms = lrms
+        self.auto_enable_auth = False
+
+    def make_resources(self, ignore_errors=True):
+        return {self.lrms.name: self.lrms}
+
+
+def create_local_engine(store, cores=None, memory=None):
+    '''Creates an `Engine` that executes jobs on the local machine.
+
+    Parameters
+    ----------
+    store: gc3libs.persistence.store.Store
+        GC3Pie store object
+    cores: int, optional
+        number of cores that may be used (defaults to the number of cores of
+        the machine)
+    memory: int, optional
+        memory in megabytes that may be used (defaults to the physical
+        memory of the machine)
+
+    Returns
+    -------
+    gc3libs.core.Engine
+        engine
+    '''
+    lrms = LocalLrms(LOCAL_RESOURCE_NAME, cores, memory)
+    logger.debug(
+        'create GC3Pie engine for local execution with %d cores and %d MB',
+        lrms.max_cores, lrms.total_memory
+    )
+    core = gc3libs.core.Core(LocalConfiguration(lrms))
+    # Jobs that don't fit remain in state NEW, hence the number of submitted
+    # jobs needs not be limited further.
+    engine = gc3libs.core.Engine(
+        core, store=store, forget_terminated=True
+    )
+    engine.retrieve_overwrites = True
+    return engine
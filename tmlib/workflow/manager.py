@@ -64,7 +64,8 @@ class WorkflowManager(WorkflowSubmissionManager):
 
         ''' % __version__
 
-    def submit(self, monitoring_depth, monitoring_interval, force=False):
+    def submit(self, monitoring_depth, monitoring_interval, force=False,
+            local=False):
         '''Creates a workflow, submits it to the cluster and monitors its
         progress.
 
@@ -76,6 +77,9 @@ class WorkflowManager(WorkflowSubmissionManager):
             query status of jobs every `monitoring_interval` seconds
         force: bool, opional
             whether inactivated stages and steps should be submitted anyways
+        local: bool, optional
+            whether jobs should be executed on the local machine rather than
+            submitted to the cluster
         '''
         self._print_logo()
         logger.info('submit workflow')
@@ -98,7 +102,7 @@ class WorkflowManager(WorkflowSubmissionManager):
         store = create_gc3pie_sql_store()
         store.save(workflow)
         self.update_submission(workflow)
-        engine = create_gc3pie_engine(store)
+        engine = create_gc3pie_engine(store, local)
         logger.info('submit and monitor jobs')
         try:
             self.submit_jobs(
@@ -117,7 +121,7 @@ class WorkflowManager(WorkflowSubmissionManager):
         except:
             raise
 
-    def resubmit(self, monitoring_depth, stage):
+    def resubmit(self, monitoring_depth, stage, local=False):
         '''Resumits a previously created workflow to the cluster and monitors
         its status.
 
@@ -127,6 +131,9 @@ class WorkflowManager(WorkflowSubmissionManager):
             number of child tasks that should be monitored
         stage: str
             stage at which workflow should be submitted
+        local: bool, optional
+            whether jobs should be executed on the local machine rather than
+            submitted to the cluster
         '''
         self._print_logo()
         store = create_gc3pie_sql_store()
@@ -143,7 +150,7 @@ class WorkflowManager(WorkflowSubmissionManager):
         except IndexError:
             raise WorkflowDescriptionError('Unknown stage "%s".' % stage)
         logger.info('resubmit workflow at stage #%d "%s"', start_index, stage)
-        engine = create_gc3pie_engine(store)
+        engine = create_gc3pie_engine(store, local)
         logger.info('resubmit and monitor jobs')
         try:
             self.submit_jobs(
@@ -237,6 +244,10 @@ class WorkflowManager(WorkflowSubmissionManager):
             '--force', '-f', action='store_true',
             help='also submit inactivated stages and steps'
         )
+        submit_parser.add_argument(
+            '--local', action='store_true',
+            help='execute jobs on the local machine'
+        )
 
         resubmit_help = '''resubmit a previously created workflow to the
             cluster and monitor its status
@@ -255,6 +266,10 @@ class WorkflowManager(WorkflowSubmissionManager):
             '--stage', '-s', type=str, required=True,
             help='stage at which workflow should be resubmitted'
         )
+        resubmit_parser.add_argument(
+            '--local', action='store_true',
+            help='execute jobs on the local machine'
+        )
         return parser
 
     @classmethod
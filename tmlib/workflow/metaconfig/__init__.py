@@ -42,8 +42,6 @@ import inspect
 import logging
 
 from tmlib import __version__
-from tmlib.workflow.metaconfig.base import MetadataReader
-from tmlib.workflow.metaconfig.base import MetadataHandler
 
 logger = logging.getLogger(__name__)
 
@@ -143,6 +141,7 @@ def metadata_reader_factory(microscope_type):
     Union[classobj, None]
         metadata reader class in case one is implemented
     '''
+    from tmlib.workflow.metaconfig.base import MetadataReader
     module = import_microscope_type_module(microscope_type)
     reader_cls = None
     for k, v in vars(module).iteritems():
@@ -178,6 +177,7 @@ def metadata_handler_factory(microscope_type):
         when the `miroscope_type`-specific module does not implement a handler
         class
     '''
+    from tmlib.workflow.metaconfig.base import MetadataHandler
     module = import_microscope_type_module(microscope_type)
     handler_cls = None
     for k, v in vars(module).iteritems():
@@ -91,8 +91,11 @@ class MetadataExtractor(WorkflowStepAPI):
                 microscope_image_file_ids = [
                     f.id for f in microscope_image_files
                 ]
+                batch_size = self.resolve_batch_size(
+                    args.batch_size, len(microscope_image_file_ids)
+                )
                 batches = self._create_batches(
-                    microscope_image_file_ids, args.batch_size
+                    microscope_image_file_ids, batch_size
                 )
 
                 for file_ids in batches:
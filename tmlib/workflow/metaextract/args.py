@@ -24,8 +24,12 @@ from tmlib.workflow import register_step_submission_args
 class MetaextractBatchArguments(BatchArguments):
 
     batch_size = Argument(
-        type=int, help='number of images that should be processed per job',
-        default=100, flag='batch-size', short_flag='b'
+        type=int, default=100, flag='batch-size', short_flag='b', auto=True,
+        help='''
+            number of images that should be processed per job
+            ("auto" determines the number from runtimes of the previous
+            submission)
+        '''
     )
 
 
@@ -13,7 +13,6 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
-import time
 import datetime
 import logging
 import gc3libs
@@ -22,6 +21,8 @@ import tmlib.models as tm
 from tmlib.utils import same_docstring_as
 from tmlib.submission import SubmissionManager
 from tmlib.workflow.utils import get_task_status_recursively
+from tmlib.workflow.utils import TaskStatusMonitor
+from tmlib.workflow.utils import TaskEventListener
 from tmlib.workflow.utils import print_task_status
 from tmlib.workflow.utils import log_task_failure
 
@@ -102,13 +103,22 @@ class WorkflowSubmissionManager(SubmissionManager):
             recursion depth for job monitoring, i.e. in which detail subtasks
             in the task tree should be monitored (default: ``1``)
         monitoring_interval: int, optional
-            seconds to wait between monitoring iterations (default: ``10``)
+            maximal number of seconds to wait between monitoring iterations
+            (default: ``10``)
 
         Returns
         -------
         dict
             information about each job
 
+        Note
+        ----
+        Jobs notify about their termination (see
+        :func:`notify_task_event <tmlib.workflow.utils.notify_task_event>`),
+        such that the next iteration starts without waiting for the full
+        `monitoring_interval`. Only tasks that changed are re-read for
+        reporting the status.
+
         Warning
         -------
         This method is intended for interactive use via the command line only.
@@ -126,30 +136,33 @@ class WorkflowSubmissionManager(SubmissionManager):
         # periodically check the status of submitted jobs
         t_submitted = datetime.datetime.now()
 
+        monitor = TaskStatusMonitor(jobs.persistent_id, monitoring_depth)
         break_next = False
-        while True:
+        with TaskEventListener(self.experiment_id) as listener:
+            while True:
 
-            time.sleep(monitoring_interval)
-            logger.debug('wait for %d seconds', monitoring_interval)
+                logger.debug(
+                    'wait for at most %d seconds', monitoring_interval
+                )
+                listener.wait(monitoring_interval)
 
-            t_elapsed = datetime.datetime.now() - t_submitted
-            logger.info('elapsed time: %s', str(t_elapsed))
+                t_elapsed = datetime.datetime.now() - t_submitted
+                logger.info('elapsed time: %s', str(t_elapsed))
 
-            logger.info('progress...')
-            engine.progress()
+                logger.info('progress...')
+                engine.progress()
 
-            status_data = get_task_status_recursively(
-                jobs.persistent_id, monitoring_depth
-            )
-            print_task_status(status_data)
+                status_data = monitor.update()
+                print_task_status(status_data)
 
-            if break_next:
-                break
+                if break_next:
+                    break
 
-            if (jobs.execution.state == gc3libs.Run.State.TERMINATED or
-                    jobs.execution.state == gc3libs.Run.State.STOPPED):
-                break_next = True
-                engine.progress()  # one more iteration to update status_data
+                if (jobs.execution.state == gc3libs.Run.State.TERMINATED or
+                        jobs.execution.state == gc3libs.Run.State.STOPPED):
+                    break_next = True
+                    # one more iteration to update status_data
+                    engine.progress()
 
         status_data = get_task_status_recursively(jobs.persistent_id)
         log_task_failure(status_data, logger)
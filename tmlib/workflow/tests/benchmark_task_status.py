@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# TmLibrary - TissueMAPS library for distibuted image analysis routines.
+# Copyright (C) 2016  Markus D. Herrmann, University of Zurich and Robin Hafen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''Benchmark for querying the status of a synthetic workflow task tree.
+
+A tree of tasks that mimics a submitted workflow (workflow > stages > steps >
+phases > jobs) is inserted into the ``tasks`` table of the configured
+database, the status of the tree is queried repeatedly via
+:func:`get_task_status_recursively <tmlib.workflow.utils.get_task_status_recursively>`
+and the inserted rows are deleted afterwards.
+
+Usage::
+
+    python benchmark_task_status.py --steps 10 --jobs 5000 --repeat 3
+'''
+import time
+import logging
+import argparse
+
+import gc3libs
+
+import tmlib.models as tm
+from tmlib.workflow.utils import get_task_status_recursively
+
+logger = logging.getLogger(__name__)
+
+
+def _add_task(session, parent_id, name, type, is_collection, state):
+    task = tm.Task(
+        name=name, type=type, is_collection=is_collection, state=state,
+        parent_id=parent_id, exitcode=0, time=None, memory=None, cpu_time=None
+    )
+    session.add(task)
+    session.flush()
+    return task.id
+
+
+def create_task_tree(n_steps, n_jobs):
+    '''Creates a synthetic workflow task tree.
+
+    Parameters
+    ----------
+    n_steps: int
+        number of workflow steps
+    n_jobs: int
+        number of run jobs per step
+
+    Returns
+    -------
+    Tuple[int, List[int]]
+        ID of the root task and IDs of all created tasks
+    '''
+    terminated = gc3libs.Run.State.TERMINATED
+    running = gc3libs.Run.State.RUNNING
+    ids = list()
+    with tm.utils.MainSession() as session:
+        root_id = _add_task(
+            session, None, 'benchmark', 'Workflow', True, running
+        )
+        ids.append(root_id)
+        stage_id = _add_task(
+            session, root_id, 'stage', 'WorkflowStage', True, running
+        )
+        ids.append(stage_id)
+        for i in xrange(n_steps):
+            step_id = _add_task(
+                session, stage_id, 'step%d' % i, 'WorkflowStep', True, running
+            )
+            phase_id = _add_task(
+                session, step_id, 'step%d_run' % i, 'RunPhase', True, running
+            )
+            ids.extend([step_id, phase_id])
+            jobs = [
+                tm.Task(
+                    name='step%d_run_%.7d' % (i, j + 1), type='RunJob',
+                    is_collection=False, parent_id=phase_id, exitcode=0,
+                    state=terminated if j % 2 == 0 else running
+                )
+                for j in xrange(n_jobs)
+            ]
+            session.add_all(jobs)
+            session.flush()
+            ids.extend([t.id for t in jobs])
+    return (root_id, ids)
+
+
+def delete_task_tree(ids):
+    '''Deletes the tasks of a synthetic task tree.
+
+    Parameters
+    ----------
+    ids: List[int]
+        IDs of the tasks
+    '''
+    with tm.utils.MainSession() as session:
+        session.query(tm.Task).\
+            filter(tm.Task.id.in_(ids)).\
+            delete(synchronize_session=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark querying the status of a task tree.'
+    )
+    parser.add_argument(
+        '--steps', type=int, default=10, help='number of workflow steps'
+    )
+    parser.add_argument(
+        '--jobs', type=int, default=5000, help='number of jobs per step'
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='number of repetitions'
+    )
+    parser.add_argument(
+        '--depth', type=int, default=None, help='recursion depth'
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    logger.info(
+        'create task tree with %d steps and %d jobs per step',
+        args.steps, args.jobs
+    )
+    root_id, ids = create_task_tree(args.steps, args.jobs)
+    try:
+        for i in xrange(args.repeat):
+            start = time.time()
+            status = get_task_status_recursively(root_id, args.depth)
+            logger.info(
+                'queried status of %d tasks in %.3f s (%.1f%% done)',
+                len(ids), time.time() - start, status['percent_done']
+            )
+    finally:
+        logger.info('delete task tree')
+        delete_task_tree(ids)
+
+
+if __name__ == '__main__':
+    main()
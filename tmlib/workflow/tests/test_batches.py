@@ -0,0 +1,35 @@
+import os
+
+from tmlib.workflow.batches import JobJournal
+
+
+def test_job_journal_round_trip(tmpdir):
+    journal = JobJournal(str(tmpdir.join('step_run_0000001.journal')))
+    assert not journal.exists
+    assert journal.get_items() == set()
+    journal.start()
+    assert journal.exists
+    journal.commit([1, 'a'])
+    journal.commit([(2, 3, 4)])
+    assert journal.get_items() == {1, 'a', (2, 3, 4)}
+
+
+def test_job_journal_ignores_truncated_line(tmpdir):
+    journal = JobJournal(str(tmpdir.join('step_run_0000001.journal')))
+    journal.commit([1, [2, 3]])
+    with open(journal.filename, 'a') as f:
+        # The job got killed while writing the next item.
+        f.write('[4, ')
+    assert journal.get_items() == {1, (2, 3)}
+    journal.start()
+    journal.commit([5])
+    assert journal.get_items() == {1, (2, 3), 5}
+
+
+def test_job_journal_remove(tmpdir):
+    journal = JobJournal(str(tmpdir.join('step_run_0000001.journal')))
+    journal.commit([1])
+    journal.remove()
+    assert not os.path.exists(journal.filename)
+    assert journal.get_items() == set()
+    journal.remove()
@@ -0,0 +1,43 @@
+import pytest
+
+from tmlib.workflow.dependencies import WorkflowDependencies
+from tmlib.workflow.dependencies import get_workflow_dependencies
+from tmlib.workflow.dependencies import _workflow_register
+
+
+def _create_dependencies(stages, inter_stage_dependencies):
+    return type('TestDependencies', (WorkflowDependencies, ), {
+        '__type__': 'test_dependencies',
+        'STAGES': stages,
+        'STAGE_MODES': {name: 'sequential' for name in stages},
+        'STEPS_PER_STAGE': {name: [] for name in stages},
+        'INTER_STAGE_DEPENDENCIES': inter_stage_dependencies,
+        'INTRA_STAGE_DEPENDENCIES': {}
+    })
+
+
+def test_stage_dependencies_independent_stages():
+    try:
+        cls = _create_dependencies(
+            ['a', 'b', 'c'], {'b': {'a'}, 'c': {'a'}}
+        )
+        assert get_workflow_dependencies('test_dependencies') is cls
+    finally:
+        _workflow_register.pop('test_dependencies', None)
+
+
+def test_stage_dependencies_unknown_stage():
+    with pytest.raises(ValueError):
+        _create_dependencies(['a', 'b'], {'b': {'x'}})
+    assert 'test_dependencies' not in _workflow_register
+
+
+def test_stage_dependencies_out_of_order():
+    with pytest.raises(ValueError):
+        _create_dependencies(['a', 'b'], {'a': {'b'}})
+    assert 'test_dependencies' not in _workflow_register
+
+
+def test_stage_dependencies_self_dependency():
+    with pytest.raises(ValueError):
+        _create_dependencies(['a', 'b'], {'b': {'b'}})
@@ -0,0 +1,110 @@
+# TmLibrary - TissueMAPS library for distibuted image analysis routines.
+# Copyright (C) 2016  Markus D. Herrmann, University of Zurich and Robin Hafen
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''Regression tests for the startup time of workflow step command line
+interfaces.
+
+Each job of a workflow runs ``<step> <experiment_id> run`` in a new Python
+process. Modules are therefore imported in a fresh interpreter and the tests
+check which modules got loaded on the way and how long it took. Import time
+is measured after :mod:`tmlib.models`, which every job requires, has been
+imported in the same interpreter, such that the budget only covers modules
+that are specific to the step.
+'''
+import sys
+import json
+import subprocess
+
+import pytest
+
+#: float: maximal time in seconds for importing the modules of a step in
+#: addition to the time for importing :mod:`tmlib.models`
+MAX_IMPORT_TIME = 2.0
+
+STEPS = [
+    'metaextract', 'metaconfig', 'imextract', 'corilla', 'align',
+    'illuminati', 'jterator'
+]
+
+#: Set[str]: modules that no step requires for the "run" phase
+UNUSED_MODULES = {'sklearn', 'tmlib.tools'}
+
+_IMPORT_SCRIPT = '''
+import sys
+import json
+import time
+import importlib
+importlib.import_module(sys.argv[1])
+start = time.time()
+for name in sys.argv[2:]:
+    importlib.import_module(name)
+duration = time.time() - start
+sys.stdout.write(json.dumps({
+    'duration': duration, 'modules': sorted(sys.modules.keys())
+}))
+'''
+
+
+def _import_modules(*names):
+    output = subprocess.check_output(
+        [sys.executable, '-c', _IMPORT_SCRIPT, 'tmlib.models'] + list(names)
+    )
+    result = json.loads(output.splitlines()[-1])
+    return (result['duration'], set(result['modules']))
+
+
+def _import_modules_lazily(*names):
+    # Imports modules without importing tmlib.models first.
+    output = subprocess.check_output(
+        [sys.executable, '-c', _IMPORT_SCRIPT] + list(names)
+    )
+    result = json.loads(output.splitlines()[-1])
+    return set(result['modules'])
+
+
+def _is_loaded(name, modules):
+    return any(m == name or m.startswith(name + '.') for m in modules)
+
+
+@pytest.mark.parametrize('step_name', STEPS)
+def test_step_import_time(step_name):
+    duration, modules = _import_modules(
+        'tmlib.workflow.%s.cli' % step_name,
+        'tmlib.workflow.%s.api' % step_name
+    )
+    assert duration < MAX_IMPORT_TIME
+    for name in UNUSED_MODULES:
+        assert not _is_loaded(name, modules), name
+    for name in STEPS:
+        if name == step_name:
+            continue
+        assert 'tmlib.workflow.%s.api' % name not in modules, name
+
+
+def test_metaextract_import_without_image_libraries():
+    modules = _import_modules_lazily(
+        'tmlib.workflow.metaextract.cli', 'tmlib.workflow.metaextract.api'
+    )
+    for name in {'pandas', 'cv2', 'skimage', 'mahotas', 'javabridge'}:
+        assert not _is_loaded(name, modules), name
+
+
+def test_workflow_package_import_is_lazy():
+    modules = _import_modules_lazily('tmlib.workflow')
+    assert 'tmlib.workflow.workflow' not in modules
+    assert 'tmlib.models' not in modules
+    import tmlib.workflow
+    from tmlib.workflow.workflow import Workflow
+    assert tmlib.workflow.Workflow is Workflow
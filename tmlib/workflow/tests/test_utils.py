@@ -0,0 +1,121 @@
+import collections
+from datetime import timedelta
+
+import gc3libs
+from gc3libs.quantity import MB, seconds
+
+from tmlib.workflow.utils import fair_share_scheduler
+from tmlib.workflow.utils import get_task_resource_usage
+
+_Task = collections.namedtuple('_Task', ['name', 'step_name'])
+
+_Resource = collections.namedtuple('_Resource', ['name'])
+
+
+def _schedule(tasks):
+    resources = [_Resource('localhost')]
+    return [index for index, name in fair_share_scheduler(tasks, resources)]
+
+
+def test_fair_share_scheduler_interleaves_steps():
+    tasks = [
+        _Task('imextract_run_1', 'imextract'),
+        _Task('imextract_run_2', 'imextract'),
+        _Task('imextract_run_3', 'imextract'),
+        _Task('corilla_run_1', 'corilla'),
+        _Task('corilla_run_2', 'corilla')
+    ]
+    order = _schedule(tasks)
+    assert [tasks[i].name for i in order] == [
+        'imextract_run_1', 'corilla_run_1',
+        'imextract_run_2', 'corilla_run_2',
+        'imextract_run_3'
+    ]
+
+
+def test_fair_share_scheduler_single_step():
+    tasks = [_Task('align_run_%d' % i, 'align') for i in range(3)]
+    assert _schedule(tasks) == [0, 1, 2]
+
+
+class _Execution(object):
+
+    def __init__(self):
+        self.state = gc3libs.Run.State.NEW
+        self.timestamp = dict()
+
+    def terminate(self, timestamp, duration, memory):
+        self.state = gc3libs.Run.State.TERMINATED
+        self.timestamp[self.state] = timestamp
+        self.duration = duration * seconds
+        self.used_cpu_time = duration * seconds
+        self.max_used_memory = memory * MB
+
+
+class _Job(object):
+
+    def __init__(self, persistent_id):
+        self.persistent_id = persistent_id
+        self.execution = _Execution()
+
+
+class _Collection(object):
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+
+
+def test_resource_usage_roll_up():
+    jobs = [_Job(1), _Job(2), _Job(3)]
+    collection = _Collection(jobs)
+    jobs[0].execution.terminate(1, 10, 100)
+    jobs[1].execution.terminate(2, 20, 300)
+    usage = get_task_resource_usage(collection)
+    assert usage.time == timedelta(seconds=30)
+    assert usage.cpu_time == timedelta(seconds=30)
+    assert usage.memory == 300
+    jobs[2].execution.terminate(3, 5, 200)
+    usage = get_task_resource_usage(collection)
+    assert usage.time == timedelta(seconds=35)
+    assert usage.memory == 300
+
+
+def test_resource_usage_roll_up_nested():
+    jobs = [_Job(1), _Job(2)]
+    collection = _Collection([_Collection(jobs[:1]), _Collection(jobs[1:])])
+    jobs[0].execution.terminate(1, 10, 100)
+    jobs[1].execution.terminate(2, 20, 300)
+    usage = get_task_resource_usage(collection)
+    assert usage.time == timedelta(seconds=30)
+    assert usage.memory == 300
+
+
+def test_resource_usage_roll_up_reset_on_resubmit():
+    jobs = [_Job(1), _Job(2)]
+    collection = _Collection(jobs)
+    jobs[0].execution.terminate(1, 10, 100)
+    jobs[1].execution.terminate(2, 20, 300)
+    assert get_task_resource_usage(collection).memory == 300
+    # The second job gets resubmitted and its previous usage is discarded.
+    jobs[1].execution = _Execution()
+    usage = get_task_resource_usage(collection)
+    assert usage.time == timedelta(seconds=10)
+    assert usage.memory == 100
+    jobs[1].execution.terminate(3, 5, 200)
+    usage = get_task_resource_usage(collection)
+    assert usage.time == timedelta(seconds=15)
+    assert usage.memory == 200
+
+
+def test_resource_usage_roll_up_reset_on_replaced_tasks():
+    jobs = [_Job(1), _Job(2)]
+    collection = _Collection(jobs)
+    jobs[0].execution.terminate(1, 10, 100)
+    jobs[1].execution.terminate(2, 20, 300)
+    assert get_task_resource_usage(collection).memory == 300
+    job = _Job(3)
+    job.execution.terminate(3, 5, 50)
+    collection.tasks = [job]
+    usage = get_task_resource_usage(collection)
+    assert usage.time == timedelta(seconds=5)
+    assert usage.memory == 50
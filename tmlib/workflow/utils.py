@@ -13,14 +13,20 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+import json
 import logging
-import datetime
-import numpy as np
+import collections
+import sqlalchemy
+import sqlalchemy.orm
 from prettytable import PrettyTable
 from datetime import datetime
 from datetime import timedelta
 
 import gc3libs
+import gc3libs.core
+import gc3libs.exceptions
+from gc3libs.core import MatchMaker
 from gc3libs.quantity import Memory
 from gc3libs.session import Session
 from gc3libs.url import Url
@@ -28,36 +34,136 @@ from gc3libs.persistence.sql import make_sqlstore
 
 import tmlib.models as tm
 from tmlib import cfg
+from tmlib.workflow.local import create_local_engine
 
 logger = logging.getLogger(__name__)
 
+#: str: name of the PostgreSQL channel for notifications about jobs
+TASK_EVENT_CHANNEL = 'tmaps_task_events'
 
-def _get_task_time(task, attr):
-    def get_recursive(_task, duration):
-        if hasattr(_task, 'tasks'):
-            if len(_task.tasks) > 0:
-                duration += np.sum([
-                    get_recursive(t, duration) for t in _task.tasks
-                ])
-        else:
-            if hasattr(_task.execution, attr):
-                duration += getattr(_task.execution, attr).to_timedelta()
-        return duration
-    return get_recursive(task, timedelta())
-
-
-def _get_task_memory(task, attr):
-    def get_recursive(_task, memory):
-        if hasattr(_task, 'tasks'):
-            if len(_task.tasks) > 0:
-                memory += np.sum([
-                    get_recursive(t, memory) for t in _task.tasks
-                ])
-        else:
-            if hasattr(_task.execution, attr):
-                memory += getattr(_task.execution, attr).amount(Memory.MB)
-        return memory
-    return get_recursive(task, 0)
+
+#: Resources used by a task; *time* and *cpu_time* are summed and *memory*
+#: is the maximum over all jobs of a task collection
+TaskResourceUsage = collections.namedtuple(
+    'TaskResourceUsage', ['time', 'cpu_time', 'memory']
+)
+
+
+def _get_job_resource_usage(job):
+    execution = job.execution
+    duration = getattr(execution, 'duration', None)
+    cpu_time = getattr(execution, 'used_cpu_time', None)
+    memory = getattr(execution, 'max_used_memory', None)
+    return TaskResourceUsage(
+        time=duration.to_timedelta() if duration is not None else timedelta(),
+        cpu_time=(
+            cpu_time.to_timedelta() if cpu_time is not None else timedelta()
+        ),
+        memory=memory.amount(Memory.MB) if memory is not None else 0
+    )
+
+
+class _ResourceUsageRollUp(object):
+
+    '''Resources used by the terminated subtasks of a task collection.
+
+    The usage of a subtask is added once, when it is found to be terminated,
+    and is not looked at again afterwards. Only subtasks that are still
+    being processed are asked for their usage upon each update. The roll-up
+    is stored on the collection and thus pickled together with it.
+    '''
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        # Maps the ID of a terminated subtask to the time it terminated
+        self.accounted = dict()
+        self.time = timedelta()
+        self.cpu_time = timedelta()
+        self.memory = 0
+
+    def update(self, subtasks):
+        '''Updates the roll-up with the usage of newly terminated subtasks.
+
+        Parameters
+        ----------
+        subtasks: List[gc3libs.Task]
+            current subtasks of the collection
+
+        Returns
+        -------
+        tmlib.workflow.utils.TaskResourceUsage
+            usage of all subtasks, including the ones that didn't terminate
+            yet
+        '''
+        terminated = gc3libs.Run.State.TERMINATED
+        time = timedelta()
+        cpu_time = timedelta()
+        memory = 0
+        keys = set()
+        for task in subtasks:
+            key = getattr(task, 'persistent_id', id(task))
+            keys.add(key)
+            if task.execution.state == terminated:
+                terminated_at = task.execution.timestamp.get(terminated)
+            else:
+                terminated_at = None
+            if key in self.accounted:
+                if self.accounted[key] == terminated_at:
+                    continue
+                # The subtask got resubmitted since it was accounted for.
+                # Its previous usage cannot be taken back (memory is a
+                # maximum), so the roll-up is built up again from scratch.
+                logger.debug('reset resource usage of task collection')
+                self._reset()
+                return self.update(subtasks)
+            usage = get_task_resource_usage(task)
+            if terminated_at is not None:
+                self.accounted[key] = terminated_at
+                self.time += usage.time
+                self.cpu_time += usage.cpu_time
+                self.memory = max(self.memory, usage.memory)
+            else:
+                time += usage.time
+                cpu_time += usage.cpu_time
+                memory = max(memory, usage.memory)
+        if not keys.issuperset(self.accounted):
+            # Subtasks have been replaced, e.g. upon resubmission of a
+            # workflow step.
+            logger.debug('reset resource usage of task collection')
+            self._reset()
+            return self.update(subtasks)
+        return TaskResourceUsage(
+            time=self.time + time, cpu_time=self.cpu_time + cpu_time,
+            memory=max(self.memory, memory)
+        )
+
+
+def get_task_resource_usage(task):
+    '''Gets the resources used by a task. For a task collection, the usage
+    is rolled up over all its subtasks and maintained incrementally, i.e.
+    subtasks that terminated before are not visited again.
+
+    Parameters
+    ----------
+    task: gc3libs.Task
+        individual task or task collection
+
+    Returns
+    -------
+    tmlib.workflow.utils.TaskResourceUsage
+        wall time, CPU time and maximal memory (in MB)
+    '''
+    if not hasattr(task, 'tasks'):
+        return _get_job_resource_usage(task)
+    # Collections that were pickled before the roll-up got introduced don't
+    # have the attribute.
+    roll_up = getattr(task, '_resource_usage', None)
+    if roll_up is None:
+        roll_up = _ResourceUsageRollUp()
+        task._resource_usage = roll_up
+    return roll_up.update(task.tasks)
 
 
 def create_gc3pie_sql_store():
@@ -86,11 +192,11 @@ def create_gc3pie_sql_store():
             table_columns['exitcode']:
                 lambda task: task.execution.exitcode,
             table_columns['time']:
-                lambda task: _get_task_time(task, 'duration'),
+                lambda task: get_task_resource_usage(task).time,
             table_columns['memory']:
-                lambda task: _get_task_memory(task, 'max_used_memory'),
+                lambda task: get_task_resource_usage(task).memory,
             table_columns['cpu_time']:
-                lambda task: _get_task_time(task, 'used_cpu_time'),
+                lambda task: get_task_resource_usage(task).cpu_time,
             table_columns['submission_id']:
                 lambda task: task.submission_id,
             table_columns['parent_id']:
@@ -127,7 +233,7 @@ def create_gc3pie_session(location, store):
     return Session(location, store=store)
 
 
-def create_gc3pie_engine(store):
+def create_gc3pie_engine(store, local=False):
     '''Creates an `Engine` instance for submitting jobs for parallel
     processing.
 
@@ -135,24 +241,93 @@ def create_gc3pie_engine(store):
     ----------
     store: gc3libs.persistence.store.Store
         GC3Pie store object
+    local: bool, optional
+        whether jobs should be executed by a pool of worker processes on the
+        local machine rather than on the configured resource
+        (default: ``False``)
 
     Returns
     -------
     gc3libs.core.Engine
         engine
+
+    See also
+    --------
+    :func:`tmlib.workflow.local.create_local_engine`
     '''
-    logger.debug('create GC3Pie engine')
-    n = cfg.resource.max_cores * 2
-    logger.debug('set maximum number of submitted jobs to %d', n)
-    engine = gc3libs.create_engine(
-        store=store, max_in_flight=n, max_submitted=n, forget_terminated=True
-    )
-    # Put all output files in the same directory
-    logger.debug('store stdout/stderr in common output directory')
-    engine.retrieve_overwrites = True
+    if local:
+        engine = create_local_engine(store)
+    else:
+        logger.debug('create GC3Pie engine')
+        n = cfg.resource.max_cores * 2
+        logger.debug('set maximum number of submitted jobs to %d', n)
+        engine = gc3libs.create_engine(
+            store=store, max_in_flight=n, max_submitted=n,
+            forget_terminated=True
+        )
+        # Put all output files in the same directory
+        logger.debug('store stdout/stderr in common output directory')
+        engine.retrieve_overwrites = True
+    engine.scheduler = fair_share_scheduler
     return engine
 
 
+@gc3libs.core.scheduler
+def fair_share_scheduler(tasks, resources, matchmaker=MatchMaker()):
+    '''Scheduling policy that submits new jobs of concurrently processed
+    workflow steps in turns.
+
+    With the default first-come first-serve policy, jobs of a step that
+    gets submitted while another step is being processed would only be
+    submitted once all jobs of the other step have been submitted. Jobs of
+    the individual steps are instead interleaved, such that each step gets
+    an equal share of the limited number of jobs the engine can have in
+    flight.
+
+    Parameters
+    ----------
+    tasks: List[gc3libs.Task]
+        tasks that should be submitted
+    resources: List[gc3libs.backends.LRMS]
+        available resources
+    matchmaker: gc3libs.core.MatchMaker, optional
+        object for selecting compatible resources
+
+    See also
+    --------
+    :func:`gc3libs.core.first_come_first_serve`
+    '''
+    queues = collections.OrderedDict()
+    for index, task in enumerate(tasks):
+        step_name = getattr(task, 'step_name', None)
+        queues.setdefault(step_name, collections.deque()).append(index)
+    order = list()
+    while queues:
+        for step_name in queues.keys():
+            order.append(queues[step_name].popleft())
+            if not queues[step_name]:
+                del queues[step_name]
+    for index in order:
+        task = tasks[index]
+        compatible_resources = matchmaker.filter(task, resources)
+        if not compatible_resources:
+            logger.warning('no compatible resources for task "%s"', task)
+            continue
+        targets = matchmaker.rank(task, compatible_resources)
+        for target in targets:
+            try:
+                yield (index, target.name)
+            except gc3libs.exceptions.LRMSSkipSubmissionToNextIteration:
+                break
+            except Exception as error:
+                logger.debug(
+                    'ignore error in submitting task "%s": %s',
+                    task, str(error)
+                )
+            else:
+                break
+
+
 def format_stats_data(stats):
     '''For each task state (and pseudo-state like ``ok`` or
     ``failed``), two values are returned: the count of managed
@@ -266,6 +441,79 @@ def format_task_data(name, type, created_at, updated_at, state, exitcode,
     return data
 
 
+def build_task_status_tree(tasks, task_id, recursion_depth=None,
+        id_encoder=None):
+    '''Assembles status information for a task and recursively for its
+    subtasks from a flat list of task records.
+
+    Parameters
+    ----------
+    tasks: List[tuple]
+        named tuples with attributes "id", "parent_id", "depth", "name",
+        "type", "created_at", "updated_at", "state", "exitcode", "memory",
+        "time", "cpu_time" and "is_collection" for the task and its subtasks
+    task_id: int
+        ID of the highest level task
+    recursion_depth: int, optional
+        recursion depth for subtasks; by default data of all subtasks
+        will be included (default: ``None``)
+    id_encoder: function, optional
+        function that encodes task IDs
+
+    Returns
+    -------
+    dict
+        information about each task and its subtasks; subtasks that exceed
+        `recursion_depth` are represented by ``None``
+
+    See also
+    --------
+    :func:`tmlib.workflow.utils.get_task_status_recursively`
+    '''
+    records = dict()
+    children = collections.defaultdict(list)
+    for t in sorted(tasks, key=lambda t: t.id):
+        records[t.id] = t
+        if t.parent_id is not None:
+            children[t.parent_id].append(t)
+
+    def get_info(task, i):
+        if recursion_depth is not None:
+            if i > recursion_depth:
+                return
+
+        data = format_task_data(
+            task.name, task.type, task.created_at, task.updated_at,
+            task.state, task.exitcode, task.memory, task.time, task.cpu_time
+        )
+        data['id'] = task.id
+        if id_encoder is not None:
+            data['id'] = id_encoder(data['id'])
+
+        if task.is_collection:
+            subtasks = children[task.id]
+            done = float(sum(
+                1 for t in subtasks if t.state == gc3libs.Run.State.TERMINATED
+            ))
+            if len(subtasks) > 0:
+                data['percent_done'] = done / len(subtasks) * 100
+            else:
+                data['percent_done'] = 0
+            data['n_subtasks'] = len(subtasks)
+            data['subtasks'] = [get_info(t, i+1) for t in subtasks]
+        else:
+            if task.state == gc3libs.Run.State.TERMINATED:
+                data['percent_done'] = 100
+            else:
+                data['percent_done'] = 0
+            data['n_subtasks'] = 0
+            data['subtasks'] = []
+
+        return data
+
+    return get_info(records[task_id], 0)
+
+
 def get_task_status_recursively(task_id, recursion_depth=None, id_encoder=None):
     '''Provides status information for each task and recursively for subtasks.
 
@@ -284,77 +532,228 @@ def get_task_status_recursively(task_id, recursion_depth=None, id_encoder=None):
     dict
         information about each task and its subtasks
 
+    Note
+    ----
+    The whole tree of tasks is retrieved with a single recursive query
+    and assembled in memory.
+
     See also
     --------
     :func:`tmlib.workflow.utils.format_task_data`
+    :func:`tmlib.workflow.utils.build_task_status_tree`
     '''
     logger.debug('get task status recursively')
-    def get_info(task_id_, i):
+    records = _query_task_tree(task_id, recursion_depth)
+    return build_task_status_tree(
+        records, task_id, recursion_depth, id_encoder
+    )
 
-        data = dict()
-        if recursion_depth is not None:
-            if i > recursion_depth:
-                return
 
-        with tm.utils.MainSession() as session:
-            task = session.query(
-                tm.Task.name, tm.Task.type,
-                tm.Task.created_at, tm.Task.updated_at, tm.Task.state,
-                tm.Task.exitcode, tm.Task.memory, tm.Task.time,
-                tm.Task.cpu_time, tm.Task.is_collection
+def _query_task_tree(task_id, recursion_depth=None, updated_since=None):
+    columns = [
+        'id', 'parent_id', 'name', 'type', 'created_at', 'updated_at',
+        'state', 'exitcode', 'memory', 'time', 'cpu_time', 'is_collection'
+    ]
+    with tm.utils.MainSession() as session:
+        tree = session.query(
+                *[getattr(tm.Task, c) for c in columns] +
+                [sqlalchemy.literal(0).label('depth')]
+            ).\
+            filter(tm.Task.id == task_id).\
+            cte(name='tree', recursive=True)
+        parents = sqlalchemy.orm.aliased(tree, name='parents')
+        tasks = sqlalchemy.orm.aliased(tm.Task, name='subtasks')
+        subtasks = session.query(
+                *[getattr(tasks, c) for c in columns] +
+                [(parents.c.depth + 1).label('depth')]
             ).\
-            filter_by(id=task_id_).\
-            one()
+            filter(tasks.parent_id == parents.c.id)
+        if recursion_depth is not None:
+            # Children of tasks at the maximal depth are required to
+            # compute the progress of their parents.
+            subtasks = subtasks.filter(parents.c.depth <= recursion_depth)
+        tree = tree.union_all(subtasks)
+        query = session.query(tree)
+        if updated_since is not None:
+            query = query.filter(tree.c.updated_at >= updated_since)
+        return query.all()
 
-            data = format_task_data(
-                task.name, task.type, task.created_at, task.updated_at,
-                task.state, task.exitcode,
-                task.memory, task.time, task.cpu_time
-            )
 
-        data['id'] = task_id_
-        if id_encoder is not None:
-            data['id'] = id_encoder(data['id'])
+class TaskStatusMonitor(object):
 
-        if task.is_collection:
-            done = 0.0
-            with tm.utils.MainSession() as session:
-                subtasks = session.query(
-                    tm.Task.id,
-                    tm.Task.name, tm.Task.type,
-                    tm.Task.created_at, tm.Task.updated_at, tm.Task.state,
-                    tm.Task.exitcode, tm.Task.memory, tm.Task.time,
-                    tm.Task.cpu_time, tm.Task.is_collection
-                ).\
-                filter_by(parent_id=task_id_).\
-                order_by(tm.Task.id).\
-                all()
-
-                subtask_ids = []
-                for t in subtasks:
-                    subtask_ids.append(t.id)
-                    if t.state == gc3libs.Run.State.TERMINATED:
-                        done += 1
-                if len(subtasks) > 0:
-                    data['percent_done'] = done / len(subtasks) * 100
-                else:
-                    data['percent_done'] = 0
+    '''Class for repeatedly retrieving the status of a task and its subtasks,
+    where only tasks that changed since the previous update are re-read from
+    the database.
+    '''
 
-            data['n_subtasks'] = len(subtasks)
-            data['subtasks'] = [get_info(tid, i+1) for tid in subtask_ids]
+    def __init__(self, task_id, recursion_depth=None, id_encoder=None):
+        '''
+        Parameters
+        ----------
+        task_id: int
+            ID of the highest level task
+        recursion_depth: int, optional
+            recursion depth for subtask querying; by default
+            data of all subtasks will be queried (default: ``None``)
+        id_encoder: function, optional
+            function that encodes task IDs
+        '''
+        self.task_id = task_id
+        self.recursion_depth = recursion_depth
+        self.id_encoder = id_encoder
+        self._records = dict()
+        self._updated_at = None
+
+    def update(self):
+        '''Re-reads tasks that changed since the last update.
+
+        Returns
+        -------
+        dict
+            information about each task and its subtasks
+
+        See also
+        --------
+        :func:`tmlib.workflow.utils.get_task_status_recursively`
+        '''
+        records = _query_task_tree(
+            self.task_id, self.recursion_depth, self._updated_at
+        )
+        logger.debug('%d tasks changed since last update', len(records))
+        for r in records:
+            self._records[r.id] = r
+            if self._updated_at is None or r.updated_at > self._updated_at:
+                self._updated_at = r.updated_at
+        return build_task_status_tree(
+            self._records.values(), self.task_id, self.recursion_depth,
+            self.id_encoder
+        )
 
-        else:
-            if task.state == gc3libs.Run.State.TERMINATED:
-                data['percent_done'] = 100
-            else:
-                data['percent_done'] = 0
 
-            data['n_subtasks'] = 0
-            data['subtasks'] = []
+def notify_task_event(experiment_id, name):
+    '''Notifies listeners that a job of an experiment has finished
+    processing, such that monitoring processes don't have to wait for the
+    next polling interval.
 
-        return data
+    Parameters
+    ----------
+    experiment_id: int
+        ID of the processed experiment
+    name: str
+        name of the job
 
-    return get_info(task_id, 0)
+    Note
+    ----
+    Failure to send the notification is logged but otherwise ignored, since
+    submissions are also monitored via polling.
+
+    See also
+    --------
+    :class:`tmlib.workflow.utils.TaskEventListener`
+    '''
+    payload = json.dumps({'experiment_id': experiment_id, 'name': name})
+    try:
+        with tm.utils.MainConnection() as connection:
+            connection.notify(TASK_EVENT_CHANNEL, payload)
+    except Exception as error:
+        logger.warn('notification about job "%s" failed: %s', name, error)
+
+
+class TaskEventListener(object):
+
+    '''Context manager for waiting on notifications about jobs of an
+    experiment (see :func:`tmlib.workflow.utils.notify_task_event`).
+
+    Falls back to plain waiting in case no connection could be established
+    to listen for notifications.
+
+    Examples
+    --------
+    >>> with TaskEventListener(experiment_id) as listener:
+    ...     listener.wait(10)
+    '''
+
+    def __init__(self, experiment_id, grace_period=1):
+        '''
+        Parameters
+        ----------
+        experiment_id: int
+            ID of the processed experiment
+        grace_period: float, optional
+            seconds to wait for further notifications after a notification
+            was received, such that jobs that terminate at about the same
+            time are handled together and the batch system had time to
+            register the termination (default: ``1``)
+        '''
+        self.experiment_id = experiment_id
+        self.grace_period = grace_period
+        self._connection = None
+
+    def __enter__(self):
+        try:
+            connection = tm.utils.MainConnection()
+            connection.__enter__()
+        except Exception as error:
+            logger.warn(
+                'listening for job notifications failed - poll instead: %s',
+                error
+            )
+            return self
+        try:
+            connection.listen(TASK_EVENT_CHANNEL)
+        except Exception as error:
+            logger.warn(
+                'listening for job notifications failed - poll instead: %s',
+                error
+            )
+            connection.__exit__(None, None, None)
+            return self
+        self._connection = connection
+        return self
+
+    def __exit__(self, except_type, except_value, except_trace):
+        if self._connection is not None:
+            try:
+                self._connection.unlisten(TASK_EVENT_CHANNEL)
+            finally:
+                self._connection.__exit__(None, None, None)
+                self._connection = None
+
+    def _is_relevant(self, notification):
+        try:
+            payload = json.loads(notification.payload)
+        except ValueError:
+            return False
+        return payload.get('experiment_id') == self.experiment_id
+
+    def wait(self, timeout):
+        '''Waits until a job of the experiment notifies or `timeout` expired.
+
+        Parameters
+        ----------
+        timeout: float
+            maximal number of seconds to wait
+
+        Returns
+        -------
+        bool
+            whether a notification was received
+        '''
+        if self._connection is None:
+            time.sleep(timeout)
+            return False
+        end = time.time() + timeout
+        notified = False
+        while True:
+            remaining = end - time.time()
+            if remaining <= 0:
+                break
+            notifications = self._connection.wait_for_notifications(remaining)
+            if any([self._is_relevant(n) for n in notifications]):
+                logger.debug('received job notification')
+                notified = True
+                end = min(end, time.time() + self.grace_period)
+        return notified
 
 
 def print_task_status(task_info):
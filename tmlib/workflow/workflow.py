@@ -35,7 +35,7 @@ from tmlib.workflow.description import WorkflowStageDescription
 from tmlib.errors import WorkflowTransitionError
 from tmlib.readers import YamlReader
 from tmlib.workflow.jobs import (
-    InitJob, CollectJob, RunPhase, InitPhase, CollectPhase
+    InitJob, CollectJob, RunPhase, SingleRunPhase, InitPhase, CollectPhase
 )
 
 logger = logging.getLogger(__name__)
@@ -116,6 +116,7 @@ class WorkflowStep(AbortOnError, SequentialTaskCollection, State):
         self.parent_id = parent_id
         self.persistent_id = _idfactory.new(self)
         self.description = description
+        self.upstream_step_name = None
         self._current_task = 0
 
     def initialize(self):
@@ -265,6 +266,19 @@ class WorkflowStep(AbortOnError, SequentialTaskCollection, State):
             memory=self.description.submission_args.memory,
             cores=self.description.submission_args.cores
         )
+        if self.upstream_step_name is not None:
+            if isinstance(self.run_phase, SingleRunPhase):
+                dependencies = self._api_instance.get_run_job_dependencies(
+                    self.upstream_step_name
+                )
+                self.run_phase.set_dependencies(
+                    self.upstream_step_name, dependencies
+                )
+            else:
+                logger.warn(
+                    'step "%s" can\'t stream from step "%s", since it has '
+                    'multiple "run" phases', self.name, self.upstream_step_name
+                )
 
     def _create_collect_phase(self):
         '''Creates the job collection for "collect" phase.'''
@@ -578,6 +592,11 @@ class Workflow(SequentialTaskCollection, State):
 
     '''A *workflow* represents a computational pipeline that gets dynamically
     assembled from individual *stages* based on a user provided description.
+
+    Stages are generally processed one after another. However, a subsequent
+    stage gets already submitted while the current stage is still being
+    processed, when all stages it depends on are done (see
+    :attr:`INTER_STAGE_DEPENDENCIES <tmlib.workflow.dependencies.WorkflowDependencies.INTER_STAGE_DEPENDENCIES>`).
     '''
 
     def __init__(self, experiment_id, verbosity, submission_id, user_name,
@@ -622,6 +641,8 @@ class Workflow(SequentialTaskCollection, State):
         self.parent_id = None
         self.persistent_id = _idfactory.new(self)
         self._current_task = 0
+        # Indices of stages that have been submitted ahead of the current one
+        self._ahead_stages = list()
         self._add_stages()
         # Update the first stage and its first step to start the workflow
         self.update_stage(0)
@@ -732,6 +753,154 @@ class Workflow(SequentialTaskCollection, State):
         else:
             self.tasks[index]._update_all_steps()
 
+    def _is_stage_ready(self, index):
+        names = self.description.dependencies.INTER_STAGE_DEPENDENCIES.get(
+            self.description.stages[index].name, set()
+        )
+        for i, stage_description in enumerate(self.description.stages):
+            if stage_description.name not in names:
+                continue
+            # Stages that precede the current one are done, otherwise the
+            # workflow would have been terminated.
+            if i < self._current_task:
+                continue
+            if i == self._current_task:
+                if self._get_streamed_step_name(index) is not None:
+                    continue
+            if i in self._ahead_stages:
+                stage = self.tasks[i]
+                if stage.is_terminated and stage.execution.returncode == 0:
+                    continue
+            return False
+        return True
+
+    def _get_streamed_step_name(self, index):
+        # A stage can be submitted while the current stage is still being
+        # processed in case the steps of the stage stream from the last step
+        # of the current stage and the "run" jobs of that step already exist.
+        if index != self._current_task + 1:
+            return None
+        current_description = self.description.stages[self._current_task]
+        if current_description.mode != 'sequential':
+            return None
+        upstream_step_name = current_description.steps[-1].name
+        stage_description = self.description.stages[index]
+        if stage_description.mode == 'sequential':
+            step_descriptions = stage_description.steps[:1]
+        else:
+            step_descriptions = stage_description.steps
+        streaming = self.description.dependencies.STREAMING_DEPENDENCIES
+        for step_description in step_descriptions:
+            if streaming.get(step_description.name) != upstream_step_name:
+                return None
+        stage = self.tasks[self._current_task]
+        if stage._current_task != stage.n_steps - 1:
+            return None
+        step = stage.tasks[stage._current_task]
+        # The "run" jobs are created upon completion of the "init" phase.
+        if step._current_task is None or step._current_task < 1:
+            return None
+        return upstream_step_name
+
+    def _submit_independent_stages(self, resubmit=False, targets=None,
+                                   **extra_args):
+        for index in range(self._current_task + 1, self.n_stages):
+            if index in self._ahead_stages:
+                continue
+            if not self._is_stage_ready(index):
+                continue
+            upstream_step_name = self._get_streamed_step_name(index)
+            if upstream_step_name is None:
+                logger.info(
+                    'submit stage "%s" of workflow "%s" ahead of time, since '
+                    'it doesn\'t depend on the stages that are currently '
+                    'processed', self.description.stages[index].name,
+                    self.name
+                )
+            else:
+                logger.info(
+                    'submit stage "%s" of workflow "%s" ahead of time, since '
+                    'it streams from step "%s"',
+                    self.description.stages[index].name, self.name,
+                    upstream_step_name
+                )
+            self.update_stage(index)
+            stage = self.tasks[index]
+            if upstream_step_name is not None:
+                dependencies = self.description.dependencies
+                streaming = dependencies.STREAMING_DEPENDENCIES
+                for step in stage.tasks:
+                    if streaming.get(step.name) == upstream_step_name:
+                        step.upstream_step_name = upstream_step_name
+            stage.attach(self._controller)
+            stage.submit(resubmit, targets, **extra_args)
+            self._ahead_stages.append(index)
+
+    def submit(self, resubmit=False, targets=None, **extra_args):
+        '''Submits the current stage as well as subsequent stages whose
+        dependencies are already done.
+
+        Returns
+        -------
+        gc3libs.Run.State
+        '''
+        if self._current_task in self._ahead_stages:
+            # The stage has already been submitted ahead of time.
+            self._ahead_stages.remove(self._current_task)
+            self.execution.state = gc3libs.Run.State.RUNNING
+            self.changed = True
+        else:
+            super(Workflow, self).submit(resubmit, targets, **extra_args)
+        if not self.is_terminated:
+            self._submit_independent_stages(resubmit, targets, **extra_args)
+        return self.execution.state
+
+    def update_state(self, **extra_args):
+        '''Updates the state of the current stage as well as of stages that
+        have been submitted ahead of time.
+
+        Returns
+        -------
+        gc3libs.Run.State
+        '''
+        for index in self._ahead_stages:
+            stage = self.tasks[index]
+            stage.update_state(**extra_args)
+            if stage.is_terminated and stage.execution.returncode != 0:
+                logger.info(
+                    'terminating workflow "%s", since stage "%s" failed',
+                    self.name, stage.name
+                )
+                self.kill(**extra_args)
+                self.execution.returncode = stage.execution.returncode
+                return self.execution.state
+        if self.is_running:
+            # Stages that stream from the current stage become ready while
+            # the current stage is being processed.
+            self._submit_independent_stages(resubmit=True)
+        return super(Workflow, self).update_state(**extra_args)
+
+    def attach(self, controller):
+        '''Uses the given controller for the current stage as well as for
+        stages that have been submitted ahead of time.
+        '''
+        for index in self._ahead_stages:
+            self.tasks[index].attach(controller)
+        super(Workflow, self).attach(controller)
+
+    def kill(self, **extra_args):
+        '''Kills the current stage as well as stages that have been
+        submitted ahead of time.
+        '''
+        for index in self._ahead_stages:
+            self.tasks[index].kill(**extra_args)
+        super(Workflow, self).kill(**extra_args)
+
+    def redo(self, *args, **kwargs):
+        '''Resubmits the workflow starting at a given stage.'''
+        self._ahead_stages = list()
+        return super(Workflow, self).redo(*args, **kwargs)
+
     def next(self, done):
         '''Progresses to next stage.
 
@@ -752,6 +921,8 @@ class Workflow(SequentialTaskCollection, State):
         # collection to the state of the last processed task.
         self.execution.returncode = self.tasks[done].execution.returncode
         if self.execution.returncode != 0:
+            for index in self._ahead_stages:
+                self.tasks[index].kill()
             return gc3libs.Run.State.TERMINATED
         if self.is_stopped:
             return gc3libs.Run.State.TERMINATED
@@ -773,7 +944,8 @@ class Workflow(SequentialTaskCollection, State):
                         next_stage_name, self.name, done+2, self.n_stages 
                     )
                 )
-                self.update_stage(done+1)
+                if done+1 not in self._ahead_stages:
+                    self.update_stage(done+1)
                 return gc3libs.Run.State.RUNNING
             except Exception as error:
                 logger.error('transition to next stage failed: %s', error)
@@ -17,9 +17,7 @@ import sys
 import os
 import re
 import h5py
-import cv2
 import numpy as np
-import pandas as pd
 import logging
 import lxml.etree
 import json
@@ -203,6 +201,7 @@ class ImageWriter(Writer):
             raise TypeError('Data must have type numpy.ndarray.')
         if data.ndim > 2:
             raise ValueError('Only 2D arrays are supported.')
+        import cv2
         binary = cv2.imencode(os.path.splitext(self.filename)[1], data)[1]
         self._stream.write(binary)
 
@@ -225,6 +224,7 @@ class DataTableWriter(Writer):
         self.truncate = truncate
 
     def __enter__(self):
+        import pandas as pd
         logger.debug('open file: %s', self.filename)
         if self.truncate:
             self._stream = pd.HDFStore(self.filename, 'w')